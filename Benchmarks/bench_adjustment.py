@@ -0,0 +1,114 @@
+"""
+Benchmark of imdb_top_250_adjustment.adjust_dataframe against the previous row by row implementation.
+Random movie frames from 20 to 1M rows, adjusted ratings of both implementations are compared per title.
+
+Run from the repository root:
+
+python -m Benchmarks.bench_adjustment --rows 20 1000 100000 1000000 --variants 20
+
+The second table compares scoring N rule set variants in one batched pass ( imdb_rules.evaluate_rule_sets )
+with N separate adjust_dataframe runs.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import imdb_top_250_adjustment
+import imdb_rules
+import config as c
+
+
+def adjust_dataframe_legacy(p_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Previous implementation of adjust_dataframe: two sorts, per row Oscars adjustment and intermediate copies.
+    """
+    l_max_votes = p_df.sort_values('rating', ascending=False).head(20).max(axis=0)['votes']
+    p_df['review_penalty'] = ((l_max_votes - p_df['votes']) // 100000 * -0.1)
+    p_df['oscars_adjustment'] = [imdb_top_250_adjustment.oscars_adjustment(x) for x in p_df['oscars']]
+    p_df['adjusted_rating'] = round(p_df['rating'] + p_df['review_penalty'] + p_df['oscars_adjustment'], 1)
+    l_df = p_df.drop("oscars_adjustment", axis='columns')
+    l_df = l_df.drop("review_penalty", axis='columns')
+    sorted_df = l_df.sort_values('adjusted_rating', ascending=False).reindex().reset_index(drop=True)
+    sorted_df.index += 1
+    sorted_df.insert(loc=0, column='rank', value=sorted_df.index)
+    sorted_df['rank'] = sorted_df.index
+    return sorted_df
+
+
+def random_movies(p_rows: int, p_seed: int = 42) -> pd.DataFrame:
+    """
+    :param p_rows: int
+        Number of movies.
+    :param p_seed: int
+        Seed of the random generator.
+    :return: pandas.DataFrame
+        Movie frame with unique names and ratings, votes and Oscars in realistic ranges.
+        The 20 best ratings are unique, so both implementations pick the same benchmark movie for the penalty.
+    """
+    l_random = np.random.default_rng(p_seed)
+    l_rating = np.round(l_random.uniform(1, 8, p_rows), 1)
+    l_rating[:20] = np.round(np.linspace(10, 8.1, 20), 1)[:p_rows]
+    return pd.DataFrame({'name': [f'Movie {i}' for i in range(p_rows)],
+                         'release_date': 'N/A',
+                         'rating': l_rating,
+                         'votes': l_random.integers(1000, 3000000, p_rows),
+                         'oscars': l_random.choice(15, p_rows, p=[0.7] + [0.3 / 14] * 14)})
+
+
+def best_of(p_function, p_df: pd.DataFrame, p_repeat: int) -> tuple:
+    l_times = []
+    for _ in range(p_repeat):
+        l_df = p_df.copy()  # The legacy implementation modifies its input
+        l_start = time.perf_counter()
+        l_result = p_function(l_df)
+        l_times.append(time.perf_counter() - l_start)
+    return min(l_times), l_result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", required=False, nargs='+', type=int, default=[20, 1000, 100000, 1000000],
+                        help="Frame sizes to benchmark, default=20 1000 100000 1000000")
+    parser.add_argument("--variants", required=False, default=20, type=int,
+                        help="Number of rule set variants scored in the batch benchmark, default=20")
+    parser.add_argument("--repeat", required=False, default=3, type=int,
+                        help="Number of timed rounds, the best is reported, default=3")
+    input_args = parser.parse_args()
+
+    print(f'{"rows":>10}{"legacy ms":>12}{"vectorized ms":>15}{"speedup":>10}')
+
+    for l_rows in input_args.rows:
+        l_df = random_movies(l_rows)
+
+        l_legacy_time, l_legacy = best_of(adjust_dataframe_legacy, l_df, input_args.repeat)
+        l_new_time, l_new = best_of(lambda x: imdb_top_250_adjustment.adjust_dataframe(x, p_log_level='WARNING'),
+                                    l_df, input_args.repeat)
+
+        # Ties may be ranked differently, the adjusted rating of every title must match
+        pd.testing.assert_series_equal(l_legacy.set_index('name')['adjusted_rating'].sort_index(),
+                                       l_new.set_index('name')['adjusted_rating'].sort_index())
+
+        print(f'{l_rows:>10}{l_legacy_time * 1000:>12.2f}{l_new_time * 1000:>15.2f}'
+              f'{l_legacy_time / l_new_time:>9.1f}x')
+
+    # Variants of the default rule set sharing the benchmark votes, differing in penalty points and award tiers
+    l_default = c.adjustment_rule_sets['default']
+    l_variants = [imdb_rules.RuleSet(p_name=f'variant_{i}',
+                                     p_spec={**l_default,
+                                             'vote_penalty': {**l_default['vote_penalty'], 'points': -0.05 * (1 + i % 4)},
+                                             'awards': [{**l_default['awards'][0],
+                                                         'values': [0, 0.3, 0.5, 1, 1 + 0.1 * (i // 4)]}]})
+                  for i in range(input_args.variants)]
+
+    print(f'\n{"rows":>10}{"separate ms":>14}{"batched ms":>12}{"speedup":>10}  ( {input_args.variants} rule sets )')
+
+    for l_rows in input_args.rows:
+        l_df = random_movies(l_rows)
+
+        l_separate_time, _ = best_of(lambda x: [imdb_top_250_adjustment.adjust_dataframe(x, 'WARNING', l_rule_set)
+                                                for l_rule_set in l_variants], l_df, input_args.repeat)
+        l_batch_time, _ = best_of(lambda x: imdb_rules.evaluate_rule_sets(x, l_variants, 'WARNING'),
+                                  l_df, input_args.repeat)
+
+        print(f'{l_rows:>10}{l_separate_time * 1000:>14.2f}{l_batch_time * 1000:>12.2f}'
+              f'{l_separate_time / l_batch_time:>9.1f}x')
@@ -0,0 +1,82 @@
+"""
+Memory benchmark of the fetch and parse pipeline on lists of growing length, served by the local stand-in server.
+Measures the peak memory allocated during a run ( tracemalloc, pages parsed in process ), with and without
+stopping the downloads after the needed sections. The peak follows the number of pages in flight ( fetch workers
+and queue size ), the length of the list only adds the bookkeeping of each title ( about 1 KiB ).
+
+Run from the repository root:
+
+python -m Benchmarks.bench_memory --titles 100 400 1600 --max_workers 8
+"""
+import argparse
+import time
+import tracemalloc
+from functools import partial
+import config as c
+import imdb_http_client
+import imdb_pipeline
+import imdb_scraper
+from Benchmarks.standin_server import StandInServer
+
+
+def bench_run(p_titles: int, p_max_workers: int, p_queue_size: int, p_stop_after_sections: bool) -> dict:
+    """
+    Scrapes a list of p_titles movies from the stand-in server under tracemalloc.
+    :param p_titles: int
+        Number of movies on the list.
+    :param p_max_workers: int
+        Number of pages downloaded in parallel.
+    :param p_queue_size: int
+        Maximum number of downloaded pages waiting for the parser.
+    :param p_stop_after_sections: bool
+        Stop reading a page once the application JSON and the awards item were read.
+    :return: dict
+        Peak memory in total and per fetch worker in KiB, bytes read per page, pages per second
+    """
+    l_stop_after_sections = c.stop_after_sections
+    c.stop_after_sections = p_stop_after_sections
+
+    with StandInServer(p_titles=p_titles) as l_server:
+        l_client = imdb_http_client.HttpClient(p_requests_per_second=0, p_log_level='ERROR')
+        l_parse = partial(imdb_scraper.extract_imdb_data, p_log_level='ERROR')
+
+        tracemalloc.start()
+        l_start = time.perf_counter()
+        try:
+            for _ in imdb_pipeline.iter_pipeline(p_url_list=l_server.title_urls(), p_parse_function=l_parse,
+                                                 p_client=l_client, p_max_workers=p_max_workers,
+                                                 p_queue_size=p_queue_size, p_in_process=True, p_log_level='ERROR'):
+                pass  # Results are dropped, only the pages in flight are measured
+            l_elapsed = time.perf_counter() - l_start
+            l_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            c.stop_after_sections = l_stop_after_sections
+            l_client.close()
+
+    return {'titles': p_titles,
+            'stop_after_sections': p_stop_after_sections,
+            'peak_kib': round(l_peak / 1024),
+            'peak_kib_per_worker': round(l_peak / 1024 / p_max_workers),
+            'kib_per_page': round(l_client.stats.summary()['bytes'] / 1024 / p_titles),
+            'pages_per_second': round(p_titles / l_elapsed, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", required=False, default=[100, 400, 1600], type=int, nargs='+',
+                        help="Lengths of the scraped lists, default=100 400 1600")
+    parser.add_argument("--max_workers", required=False, default=c.max_workers, type=int,
+                        help=f"Number of pages downloaded in parallel, default={c.max_workers}")
+    parser.add_argument("--queue_size", required=False, default=c.parse_queue_size, type=int,
+                        help=f"Maximum number of pages waiting for the parser, default={c.parse_queue_size}")
+    input_args = parser.parse_args()
+
+    print(f'{"titles":>8}{"early stop":>12}{"peak KiB":>12}{"KiB/worker":>12}{"KiB/page":>10}{"pages/s":>10}')
+
+    for l_titles in input_args.titles:
+        for l_stop in (False, True):
+            l_result = bench_run(p_titles=l_titles, p_max_workers=input_args.max_workers,
+                                 p_queue_size=input_args.queue_size, p_stop_after_sections=l_stop)
+            print(f'{l_result["titles"]:>8}{str(l_result["stop_after_sections"]):>12}{l_result["peak_kib"]:>12}'
+                  f'{l_result["peak_kib_per_worker"]:>12}{l_result["kib_per_page"]:>10}{l_result["pages_per_second"]:>10}')
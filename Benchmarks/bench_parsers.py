@@ -0,0 +1,67 @@
+"""
+Benchmark of the movie page parser backends on the saved pages in Tests/.
+Measures parse time per page and peak memory allocated while parsing a page.
+
+Run from the repository root:
+
+python -m Benchmarks.bench_parsers --repeat 5
+"""
+import argparse
+import glob
+import time
+import tracemalloc
+import imdb_parser
+import imdb_scraper
+
+
+def bench_backend(p_backend: str, p_pages: list, p_repeat: int) -> dict:
+    """
+    Parses every page p_repeat times with the backend, then once more under tracemalloc.
+    :param p_backend: str
+        Name of the backend, one of imdb_parser.PARSER_BACKENDS.
+    :param p_pages: list
+        Page contents as bytes.
+    :param p_repeat: int
+        Number of timed rounds.
+    :return: dict
+        Mean and best parse time per page in milliseconds, peak memory per page in KiB
+    """
+    l_times = []
+    for _ in range(p_repeat):
+        for l_page in p_pages:
+            l_start = time.perf_counter()
+            imdb_scraper.extract_imdb_data(p_content=l_page, p_log_level='ERROR', p_parser=p_backend)
+            l_times.append(time.perf_counter() - l_start)
+
+    l_peaks = []
+    for l_page in p_pages:
+        tracemalloc.start()
+        imdb_scraper.extract_imdb_data(p_content=l_page, p_log_level='ERROR', p_parser=p_backend)
+        l_peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {'backend': p_backend,
+            'mean_ms': round(sum(l_times) / len(l_times) * 1000, 2),
+            'best_ms': round(min(l_times) * 1000, 2),
+            'peak_kib': round(max(l_peaks) / 1024, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", required=False, default=3, type=int,
+                        help="Number of timed rounds over the saved pages, default=3")
+    parser.add_argument("--pages", required=False, default='Tests/title*.txt',
+                        help="Glob of the saved pages, default='Tests/title*.txt'")
+    input_args = parser.parse_args()
+
+    l_pages = []
+    for l_file_name in sorted(glob.glob(input_args.pages)):
+        with open(l_file_name, "rb") as binary_file:
+            l_pages.append(binary_file.read())
+
+    print(f'{len(l_pages)} pages, {sum(len(x) for x in l_pages) // len(l_pages) // 1024} KiB on average')
+    print(f'{"backend":<10}{"mean ms":>10}{"best ms":>10}{"peak KiB":>12}')
+
+    for l_backend in imdb_parser.PARSER_BACKENDS:
+        l_result = bench_backend(p_backend=l_backend, p_pages=l_pages, p_repeat=input_args.repeat)
+        print(f'{l_result["backend"]:<10}{l_result["mean_ms"]:>10}{l_result["best_ms"]:>10}{l_result["peak_kib"]:>12}')
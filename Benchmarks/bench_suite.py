@@ -0,0 +1,265 @@
+"""
+Reproducible benchmark suite, results are appended to a JSON lines file keyed by git commit.
+
+* end_to_end - imdb_scraper.extract_imdb_top_250_data against the local stand-in server ( Benchmarks/standin_server )
+  with injected latency and errors, no response cache
+* replay     - imdb_scraper.extract_imdb_top_250_data replayed from a recorded archive ( imdb_transport ),
+  without network, server or rate limit, with the stage timings of the run
+* parse      - imdb_scraper.extract_imdb_data per recorded page, for every parser backend
+* adjust     - imdb_top_250_adjustment.adjust_dataframe from 20 to 1M rows
+
+Every metric is compared with the last stored result of the same benchmark on another commit,
+changes above the threshold are flagged as regressions.
+
+Run from the repository root:
+
+python -m Benchmarks.bench_suite --suites end_to_end replay parse adjust --repeat 3
+
+The replay benchmark records the stand-in server once per run, or replays a fixed archive given with --archive
+( recorded with imdb-top-250 scrape --record ), which keeps its input identical across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import imdb_http_client
+import imdb_lists
+import imdb_metrics
+import imdb_parser
+import imdb_scraper
+import imdb_top_250_adjustment
+from Benchmarks.standin_server import StandInServer, load_pages
+from Benchmarks.bench_parsers import bench_backend
+from Benchmarks.bench_adjustment import random_movies, best_of
+
+RESULTS_FILE = 'Benchmarks/results.jsonl'
+
+# Metrics compared between commits, and those of them where a higher value is better,
+# stage timings of the replay benchmark ( stage_<name>_ms ) are compared as well
+COMPARED_METRICS = {'wall_seconds', 'titles_per_second', 'mean_ms', 'best_ms', 'peak_kib'}
+HIGHER_IS_BETTER = {'titles_per_second'}
+
+
+def git_commit() -> tuple:
+    """
+    :return: tuple
+        ( commit hash, True if the working tree has uncommitted changes ), ( 'unknown', False ) outside of git
+    """
+    try:
+        l_commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout
+        l_status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                  capture_output=True, text=True, check=True).stdout
+        return l_commit.strip(), bool(l_status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def bench_end_to_end(p_repeat: int, p_max_workers: int, p_parser: str, p_latency: float, p_error_rate: float,
+                     p_titles: int = 250) -> dict:
+    """
+    Best of p_repeat full scrapes of the stand-in list of p_titles movies, 100 on a list page.
+    :return: dict
+        Wall time, titles per second, requests and retries of the best run
+    """
+    l_best = None
+    for _ in range(p_repeat):
+        with StandInServer(p_titles=p_titles, p_page_size=100, p_latency=p_latency, p_jitter=p_latency,
+                           p_error_rate=p_error_rate) as l_server:
+            l_source = imdb_lists.ListSource(name='standin', url=l_server.list_url, max_pages=p_titles // 100 + 1)
+            l_client = imdb_http_client.HttpClient(p_requests_per_second=0, p_retry_wait=0.01, p_log_level='ERROR')
+            try:
+                l_start = time.perf_counter()
+                l_df = imdb_scraper.extract_imdb_top_250_data(p_log_level='ERROR', p_max_workers=p_max_workers,
+                                                              p_client=l_client, p_parser=p_parser,
+                                                              p_source=l_source)
+                l_elapsed = time.perf_counter() - l_start
+            finally:
+                l_client.close()
+
+        l_summary = l_client.stats.summary()
+        if l_best is None or l_elapsed < l_best['wall_seconds']:
+            l_best = {'titles': len(l_df),
+                      'wall_seconds': round(l_elapsed, 4),
+                      'titles_per_second': round(len(l_df) / l_elapsed, 2),
+                      'requests': l_summary['requests'],
+                      'retries': l_summary['retries']}
+
+    return l_best
+
+
+def record_standin(p_file: str, p_titles: int, p_max_workers: int) -> imdb_lists.ListSource:
+    """
+    Records a scrape of the stand-in list of p_titles movies, 100 on a list page, into the archive p_file.
+    """
+    with StandInServer(p_titles=p_titles, p_page_size=100) as l_server:
+        l_source = imdb_lists.ListSource(name='standin', url=l_server.list_url, max_pages=p_titles // 100 + 1)
+        l_client = imdb_http_client.create_client(p_record_file=p_file, p_log_level='ERROR')
+        try:
+            imdb_scraper.extract_imdb_top_250_data(p_log_level='ERROR', p_max_workers=p_max_workers,
+                                                   p_client=l_client, p_source=l_source)
+        finally:
+            l_client.close()  # Writes the archive
+
+    return l_source
+
+
+def bench_replay(p_repeat: int, p_max_workers: int, p_parser: str, p_titles: int = 250, p_archive: str = None) -> dict:
+    """
+    Best of p_repeat scrapes replayed from an archive, parsed in process, so only the code of the commit is timed.
+    :param p_archive: str
+        Archive recorded with --record, list source from config.list_source. The stand-in server is recorded
+        into a temporary archive when not given.
+    :return: dict
+        Wall time, titles per second and the total time of every stage of the best run in milliseconds
+    """
+    with tempfile.TemporaryDirectory() as l_dir:
+        if p_archive is None:
+            p_archive = os.path.join(l_dir, 'standin.zip')
+            l_source = record_standin(p_file=p_archive, p_titles=p_titles, p_max_workers=p_max_workers)
+        else:
+            l_source = imdb_lists.get_list_source()
+
+        l_best = None
+        for _ in range(p_repeat):
+            l_client = imdb_http_client.create_client(p_replay_file=p_archive, p_log_level='ERROR')
+            l_metrics = imdb_metrics.start_run()
+            try:
+                l_start = time.perf_counter()
+                l_df = imdb_scraper.extract_imdb_top_250_data(p_log_level='ERROR', p_max_workers=p_max_workers,
+                                                              p_client=l_client, p_parser=p_parser,
+                                                              p_in_process=True, p_source=l_source)
+                l_elapsed = time.perf_counter() - l_start
+            finally:
+                l_client.close()
+
+            if l_best is None or l_elapsed < l_best['wall_seconds']:
+                l_best = {'titles': len(l_df),
+                          'wall_seconds': round(l_elapsed, 4),
+                          'titles_per_second': round(len(l_df) / l_elapsed, 2)}
+                l_best.update({f'stage_{k}_ms': round(v['total'] * 1000, 2)
+                               for k, v in sorted(l_metrics.report(p_client=l_client)['stages'].items())})
+
+    return l_best
+
+
+def run_suites(p_suites: list, p_repeat: int, p_args: argparse.Namespace) -> list:
+    """
+    :return: list
+        ( benchmark name, parameters, metrics ) tuples
+    """
+    l_results = []
+
+    if 'end_to_end' in p_suites:
+        l_params = {'titles': p_args.titles, 'max_workers': p_args.max_workers, 'parser': p_args.parser,
+                    'latency': p_args.latency, 'error_rate': p_args.error_rate}
+        l_results.append(('end_to_end', l_params,
+                          bench_end_to_end(p_repeat=p_repeat, p_max_workers=p_args.max_workers, p_parser=p_args.parser,
+                                           p_latency=p_args.latency, p_error_rate=p_args.error_rate,
+                                           p_titles=p_args.titles)))
+
+    if 'replay' in p_suites:
+        l_params = {'titles': p_args.titles, 'max_workers': p_args.max_workers, 'parser': p_args.parser,
+                    'archive': p_args.archive}
+        l_results.append(('replay', l_params,
+                          bench_replay(p_repeat=p_repeat, p_max_workers=p_args.max_workers, p_parser=p_args.parser,
+                                       p_titles=p_args.titles, p_archive=p_args.archive)))
+
+    if 'parse' in p_suites:
+        l_pages = load_pages()
+        for l_backend in imdb_parser.PARSER_BACKENDS:
+            l_metrics = bench_backend(p_backend=l_backend, p_pages=l_pages, p_repeat=p_repeat)
+            del l_metrics['backend']
+            l_results.append(('parse', {'backend': l_backend, 'pages': len(l_pages)}, l_metrics))
+
+    if 'adjust' in p_suites:
+        for l_rows in p_args.rows:
+            l_seconds, _ = best_of(lambda x: imdb_top_250_adjustment.adjust_dataframe(x, 'ERROR'),
+                                   random_movies(l_rows), p_repeat)
+            l_results.append(('adjust', {'rows': l_rows}, {'best_ms': round(l_seconds * 1000, 3)}))
+
+    return l_results
+
+
+def load_results(p_file: str) -> list:
+    if not os.path.isfile(p_file):
+        return []
+
+    with open(p_file, 'r', encoding='utf-8') as l_file:
+        return [json.loads(x) for x in l_file if x.strip()]
+
+
+def previous_result(p_history: list, p_benchmark: str, p_params: dict, p_commit: str):
+    """
+    :return: dict
+        Latest stored result of the benchmark with the same parameters on another commit, None if there is none
+    """
+    for l_result in reversed(p_history):
+        if l_result['benchmark'] == p_benchmark and l_result['params'] == p_params and l_result['commit'] != p_commit:
+            return l_result
+
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suites", required=False, nargs='+', default=['end_to_end', 'replay', 'parse', 'adjust'],
+                        choices=['end_to_end', 'replay', 'parse', 'adjust'], help="Benchmarks to run, default: all")
+    parser.add_argument("--repeat", required=False, default=3, type=int,
+                        help="Number of timed rounds, the best is reported, default=3")
+    parser.add_argument("--titles", required=False, default=250, type=int,
+                        help="Movies on the stand-in list of the end to end benchmark, default=250")
+    parser.add_argument("--max_workers", required=False, default=8, type=int,
+                        help="Fetch workers of the end to end benchmark, default=8")
+    parser.add_argument("--parser", required=False, default='fast', choices=list(imdb_parser.PARSER_BACKENDS),
+                        help="Parser backend of the end to end benchmark, default='fast'")
+    parser.add_argument("--latency", required=False, default=0.05, type=float,
+                        help="Stand-in server latency in seconds ( plus the same random jitter ), default=0.05")
+    parser.add_argument("--error_rate", required=False, default=0.05, type=float,
+                        help="Share of stand-in server 503 responses, default=0.05")
+    parser.add_argument("--archive", required=False, default=None,
+                        help="Archive replayed by the replay benchmark, default: a fresh recording of the stand-in list")
+    parser.add_argument("--rows", required=False, nargs='+', type=int, default=[20, 1000, 100000, 1000000],
+                        help="Frame sizes of the adjust benchmark, default=20 1000 100000 1000000")
+    parser.add_argument("--results", required=False, default=RESULTS_FILE,
+                        help=f"JSON lines file the results are appended to, default='{RESULTS_FILE}'")
+    parser.add_argument("--threshold", required=False, default=0.1, type=float,
+                        help="Relative change flagged as regression, default=0.1")
+    input_args = parser.parse_args()
+
+    l_commit, l_dirty = git_commit()
+    l_history = load_results(input_args.results)
+
+    l_results = run_suites(p_suites=input_args.suites, p_repeat=input_args.repeat, p_args=input_args)
+
+    with open(input_args.results, 'a', encoding='utf-8') as l_file:
+        for l_benchmark, l_params, l_metrics in l_results:
+            l_file.write(json.dumps({'commit': l_commit,
+                                     'dirty': l_dirty,
+                                     'time': datetime.now().isoformat(timespec='seconds'),
+                                     'python': platform.python_version(),
+                                     'machine': platform.node(),
+                                     'benchmark': l_benchmark,
+                                     'params': l_params,
+                                     'metrics': l_metrics}) + '\n')
+
+    print(f'Commit {l_commit[:10]}{" ( dirty )" if l_dirty else ""}, results appended to {input_args.results}')
+
+    for l_benchmark, l_params, l_metrics in l_results:
+        l_previous = previous_result(p_history=l_history, p_benchmark=l_benchmark, p_params=l_params,
+                                     p_commit=l_commit)
+        print(f'\n{l_benchmark} {l_params}' + (f', compared to {l_previous["commit"][:10]}' if l_previous else ''))
+
+        for l_name, l_value in l_metrics.items():
+            l_line = f'  {l_name:<28}{l_value:>14}'
+
+            l_old = l_previous['metrics'].get(l_name) if l_previous else None
+            if l_old and (l_name in COMPARED_METRICS or l_name.startswith('stage_')):
+                l_change = (l_value - l_old) / l_old
+                l_worse = -l_change if l_name in HIGHER_IS_BETTER else l_change
+                l_line += f'{l_change:>+10.1%}' + ('  REGRESSION' if l_worse > input_args.threshold else '')
+
+            print(l_line)
@@ -0,0 +1,213 @@
+"""
+Local stand-in for IMDB serving recorded pages, for benchmarks and tests without network access.
+
+The list ( /list/top/, pages with ?page=<n> ) links p_titles movies, every movie page ( /title/tt<n>/ ) is one of
+the recorded pages. Like the real site, a page number past the end returns the last page again.
+Latency, server errors ( 503 ) and throttling ( 429 with Retry-After ) can be injected with a fixed random seed.
+
+Standalone, serving until Ctrl+C:
+
+python -m Benchmarks.standin_server --titles 250 --latency 0.05 --error_rate 0.02
+"""
+import argparse
+import glob
+import json
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+LIST_PATH = '/list/top/'
+FIRST_TITLE_ID = 9000001  # Synthetic title IDs, tt9000001 ...
+
+
+class _Server(ThreadingHTTPServer):
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return  # Clients stop reading a page early and close the connection
+        super().handle_error(request, client_address)
+
+
+def load_pages(p_pattern: str = 'Tests/title*.txt') -> list:
+    """
+    :param p_pattern: str
+        Glob of the recorded movie pages.
+    :return: list
+        Page contents as bytes
+    """
+    l_pages = []
+    for l_file_name in sorted(glob.glob(p_pattern)):
+        with open(l_file_name, "rb") as binary_file:
+            l_pages.append(binary_file.read())
+
+    return l_pages
+
+
+class StandInServer:
+    """
+    Threaded HTTP server with the list and movie pages, started on a free local port.
+    Use as a context manager or call start() / stop().
+    """
+
+    def __init__(self, p_pages: list = None, p_titles: int = 250, p_latency: float = 0.0, p_jitter: float = 0.0,
+                 p_error_rate: float = 0.0, p_throttle_rate: float = 0.0, p_retry_after: float = 1, p_seed: int = 42,
+                 p_port: int = 0, p_page_size: int = None):
+        """
+        :param p_pages: list
+            Recorded movie pages as bytes, the pages in Tests/ when not given.
+        :param p_titles: int
+            Number of movies on the list page.
+        :param p_latency: float
+            Seconds every response is delayed by.
+        :param p_jitter: float
+            Maximum random extra delay in seconds.
+        :param p_error_rate: float
+            Share of movie page requests answered with 503.
+        :param p_throttle_rate: float
+            Share of movie page requests answered with 429 and a Retry-After header.
+        :param p_retry_after: float
+            Retry-After seconds of the 429 responses.
+        :param p_seed: int
+            Seed of the injected latency and errors.
+        :param p_port: int
+            Port to listen on, a free port when 0.
+        :param p_page_size: int
+            Movies per list page, every movie on one page when not given.
+        """
+        self.pages = p_pages if p_pages is not None else load_pages()
+        self.titles = p_titles
+        self.latency = p_latency
+        self.jitter = p_jitter
+        self.error_rate = p_error_rate
+        self.throttle_rate = p_throttle_rate
+        self.retry_after = p_retry_after
+
+        self._random = random.Random(p_seed)
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'throttled': 0}
+
+        l_items = [{'position': i + 1, 'url': f'/title/tt{FIRST_TITLE_ID + i}/'} for i in range(p_titles)]
+        l_page_size = p_page_size or max(1, p_titles)
+        self.list_pages = [f'<html><script type="application/ld+json">'
+                           f'{json.dumps({"about": {"itemListElement": l_items[i:i + l_page_size]}})}'
+                           f'</script></html>'.encode() for i in range(0, max(1, p_titles), l_page_size)]
+
+        self._server = _Server(('127.0.0.1', p_port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    @property
+    def list_url(self) -> str:
+        return f'{self.base_url}{LIST_PATH}'
+
+    def title_urls(self) -> list:
+        """
+        :return: list
+            Movie page URLs in list order
+        """
+        return [f'{self.base_url}/title/tt{FIRST_TITLE_ID + i}/' for i in range(self.titles)]
+
+    def _draw(self) -> tuple:
+        with self._lock:
+            return self._random.random(), self._random.random() * self.jitter
+
+    def _count(self, p_counter: str):
+        with self._lock:
+            self.counters[p_counter] += 1
+
+    def respond(self, p_path: str) -> tuple:
+        """
+        :param p_path: str
+            Request path.
+        :return: tuple
+            ( status code, extra headers, body )
+        """
+        self._count('requests')
+        l_draw, l_jitter = self._draw()
+
+        if self.latency or l_jitter:
+            time.sleep(self.latency + l_jitter)
+
+        l_parts = urlsplit(p_path)
+        if l_parts.path == LIST_PATH:
+            l_page = int(parse_qs(l_parts.query).get('page', ['1'])[0])
+            return 200, {}, self.list_pages[min(max(l_page, 1), len(self.list_pages)) - 1]
+
+        if not p_path.startswith('/title/tt'):
+            return 404, {}, b''
+
+        if l_draw < self.throttle_rate:
+            self._count('throttled')
+            return 429, {'Retry-After': str(self.retry_after)}, b''
+
+        if l_draw < self.throttle_rate + self.error_rate:
+            self._count('errors')
+            return 503, {}, b''
+
+        l_title = int(p_path.split('/')[2][2:]) - FIRST_TITLE_ID
+        return 200, {}, self.pages[l_title % len(self.pages)]
+
+    def _handler_class(self):
+        l_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real site
+
+            def do_GET(self):
+                l_status, l_headers, l_body = l_server.respond(self.path)
+                self.send_response(l_status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(l_body)))
+                for l_name, l_value in l_headers.items():
+                    self.send_header(l_name, l_value)
+                self.end_headers()
+                self.wfile.write(l_body)
+
+            def log_message(self, format, *args):
+                pass  # Quiet, benchmarks measure the client
+
+        return Handler
+
+    def start(self) -> 'StandInServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'StandInServer':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", required=False, default=250, type=int, help="Movies on the list page, default=250")
+    parser.add_argument("--latency", required=False, default=0.0, type=float, help="Response delay in seconds")
+    parser.add_argument("--jitter", required=False, default=0.0, type=float, help="Maximum random extra delay")
+    parser.add_argument("--error_rate", required=False, default=0.0, type=float, help="Share of 503 responses")
+    parser.add_argument("--throttle_rate", required=False, default=0.0, type=float, help="Share of 429 responses")
+    parser.add_argument("--page_size", required=False, default=None, type=int, help="Movies per list page")
+    parser.add_argument("--port", required=False, default=8250, type=int, help="Port to listen on, default=8250")
+    input_args = parser.parse_args()
+
+    with StandInServer(p_titles=input_args.titles, p_latency=input_args.latency, p_jitter=input_args.jitter,
+                       p_error_rate=input_args.error_rate, p_throttle_rate=input_args.throttle_rate,
+                       p_port=input_args.port, p_page_size=input_args.page_size) as l_server:
+        print(f'Serving the list page on {l_server.list_url}')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -1,11 +1,43 @@
 import imdb_scraper
 import imdb_top_250_adjustment
+import imdb_fetcher
+import imdb_http_client
 import unittest
+from unittest import mock
+import requests
+import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 import json
 from Tests import test_data
 import os
+import sys
+import subprocess
+import logging
+import threading
+import time
+import asyncio
+import tempfile
+import sqlite3
+import imdb_cache
+import imdb_parser
+import imdb_pipeline
+import imdb_incremental
+import imdb_records
+import imdb_rules
+import imdb_writers
+import imdb_store
+import imdb_metrics
+import imdb_lists
+import imdb_checkpoint
+import imdb_service
+import imdb_awards
+import imdb_logs
+import imdb_batch
+import imdb_transport
+from Benchmarks.standin_server import StandInServer
+from datetime import datetime
+import config as c
 
 
 class TestIMDBScraper(unittest.TestCase):
@@ -116,5 +148,1092 @@ class TestIMDBScraper(unittest.TestCase):
 
         os.remove(l_file_name)
 
+
+class TestIMDBAdjustment(unittest.TestCase):
+
+    def test_vectorized_oscars_adjustments(self):
+
+        l_oscars = [x['oscars'] for x in test_data.test_data['oscars_adjustments']]
+
+        l_expected = [imdb_top_250_adjustment.oscars_adjustment(p_num_of_oscars=x) for x in l_oscars]
+
+        assert list(imdb_top_250_adjustment.oscars_adjustments(l_oscars)) == l_expected, \
+            'Vectorized adjustments do not match oscars_adjustment'
+
+        with self.assertRaises(Exception):
+            imdb_top_250_adjustment.oscars_adjustments([1, -1])
+
+    def test_top_rated_max_votes(self):
+
+        l_rating = np.array([9.0, 8.0, 8.0, 8.0, 7.0])
+        l_votes = np.array([10, 20, 30, 40, 50])
+
+        # Two of the three movies tied at the last place are taken, in their original order
+        assert imdb_rules.top_rated_max_votes(l_rating, l_votes, p_top=3) == 30, \
+            'Wrong benchmark movie chosen among ties'
+
+    def test_rule_sets_batch(self):
+
+        l_df = pd.DataFrame(test_data.test_data['dataframe_adjustments'],
+                            columns=["name", "release_date", "rating", "votes", "oscars"])
+
+        l_rule_sets = imdb_rules.compile_rule_sets({
+            'default': c.adjustment_rule_sets['default'],
+            'no_penalty': {'awards': [{'column': 'oscars', 'bounds': [1], 'values': [0, 1]}]},
+            'log_votes': {'vote_penalty': {'type': 'log', 'points': -1}}})
+
+        l_batch = imdb_rules.evaluate_rule_sets(p_df=l_df, p_rule_sets=list(l_rule_sets.values()))
+
+        assert list(l_batch['default']) == [8.8, 8.7, 7.7, 6.7, 4.6], 'Default rule set does not match the adjustment'
+        assert list(l_batch['no_penalty']) == [9, 9.5, 8.2, 6.7, 4.2], 'Award only rule set is wrong'
+        assert list(l_batch['log_votes']) == [8.3, 8.3, 7.1, 5.7, 2.8], 'Log vote penalty is wrong'
+
+        for l_name, l_rule_set in l_rule_sets.items():  # Batched result equals evaluating the rule set alone
+            pd.testing.assert_series_equal(l_batch[l_name],
+                                           imdb_rules.evaluate_rule_sets(p_df=l_df, p_rule_sets=[l_rule_set])[l_name])
+
+        with self.assertRaises(ValueError):
+            imdb_rules.compile_rule_sets({'broken': {'vote_penalty': {'type': 'quadratic'}}})
+
+        # One default for a missing vote penalty and for a penalty without a type: step, no points unless given
+        l_defaults = imdb_rules.compile_rule_sets({'missing': {}, 'untyped': {'vote_penalty': {'points': -0.1}}})
+        self.assertEqual(('step', 0), (l_defaults['missing'].penalty_type, l_defaults['missing'].penalty_points))
+        self.assertEqual('step', l_defaults['untyped'].penalty_type)
+        self.assertEqual(list(l_batch['default']),
+                         list(imdb_rules.evaluate_rule_sets(p_df=l_df, p_rule_sets=[imdb_rules.RuleSet(
+                             'untyped', dict(c.adjustment_rule_sets['default'],
+                                             vote_penalty={'step': 100000, 'points': -0.1}))])['untyped']))
+
+    def test_adjust_dataframe_keeps_input(self):
+
+        l_df = pd.DataFrame(test_data.test_data['dataframe_adjustments'],
+                            columns=["name", "release_date", "rating", "votes", "oscars"])
+        l_copy = l_df.copy()
+
+        imdb_top_250_adjustment.adjust_dataframe(p_df=l_df)
+
+        pd.testing.assert_frame_equal(l_df, l_copy)
+
+    def test_results_keep_the_decimals_of_the_rule_set(self):
+
+        l_df = pd.DataFrame(test_data.test_data['dataframe_adjustments'], columns=imdb_records.MOVIE_COLUMNS)
+        l_df.insert(loc=0, column='title_id', value=[x['title_id'] for x in test_data.test_data['movie_byte_files']])
+
+        with tempfile.TemporaryDirectory() as l_temp_dir, \
+                mock.patch.dict(c.adjustment_rule_sets, {'cents': dict(c.adjustment_rule_sets['default'],
+                                                                       vote_penalty={'step': 100000, 'points': -0.013},
+                                                                       decimals=2)}):
+            l_file = imdb_top_250_adjustment.adjust_and_write(p_df=l_df, p_log_level='WARNING', p_rule_set='cents',
+                                                              p_output_file=os.path.join(l_temp_dir, 'cents.csv'),
+                                                              p_dataset_dir=None, p_store_file=None)
+
+            self.assertEqual([8.97, 8.79, 7.7, 6.7, 4.69], imdb_writers.read_dataframe(l_file)['adjusted_rating'].tolist())
+
+
+class TestIMDBWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame(test_data.test_data['dataframe_to_csv'],
+                               columns=["rank", "name", "release_date", "rating", "votes", "oscars", "adjusted_rating"])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_formats_round_trip(self):
+
+        for l_format in [x for x in imdb_writers.WRITERS if imdb_writers.writer_available(x)]:
+            l_file = os.path.join(self.temp_dir.name, f'out.{imdb_writers.file_extension(l_format)}')
+            imdb_writers.write_dataframe(p_df=self.df, p_file=l_file, p_format=l_format)
+
+            pd.testing.assert_frame_equal(self.df, imdb_writers.WRITERS[l_format][2](l_file), check_dtype=False)
+
+    def test_write_does_not_clobber(self):
+
+        l_file = os.path.join(self.temp_dir.name, 'out.csv')
+        imdb_writers.write_dataframe(p_df=self.df, p_file=l_file)
+
+        with self.assertRaises(Exception):
+            imdb_writers.write_dataframe(p_df=self.df.head(1), p_file=l_file)
+
+        imdb_writers.write_dataframe(p_df=self.df.head(1), p_file=l_file, p_overwrite=True)
+
+        self.assertEqual(1, len(pd.read_csv(l_file, sep=';')))
+        self.assertEqual(['out.csv'], os.listdir(self.temp_dir.name))  # No temporary files left behind
+
+    def test_partitioned_append(self):
+
+        l_runs = [datetime(2022, 1, 1, 12), datetime(2022, 2, 1, 12), datetime(2022, 3, 1, 12)]
+        for l_run in l_runs:
+            imdb_writers.append_partition(p_df=self.df, p_dataset_dir=self.temp_dir.name, p_run_time=l_run,
+                                          p_format='ndjson')
+
+        l_df = imdb_writers.read_dataset(p_dataset_dir=self.temp_dir.name, p_format='ndjson',
+                                         p_since=datetime(2022, 1, 15))
+
+        self.assertEqual(l_runs[1:], sorted(set(l_df['run_ts'].dt.to_pydatetime())))
+        self.assertEqual(2 * len(self.df), len(l_df))
+
+
+class TestIMDBStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = imdb_store.SnapshotStore(p_db_file=os.path.join(self.temp_dir.name, 'history.db'))
+
+        l_df = pd.DataFrame(test_data.test_data['dataframe_adjustments'],
+                            columns=["name", "release_date", "rating", "votes", "oscars"])
+        l_df.insert(loc=0, column='title_id', value=[x['title_id'] for x in test_data.test_data['movie_byte_files']])
+        self.df = l_df
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_runs_are_deduplicated_and_queryable(self):
+
+        l_first = imdb_top_250_adjustment.adjust_dataframe(p_df=self.df)
+        self.store.add_run(p_df=l_first, p_run_time=1000)
+        self.store.add_run(p_df=l_first, p_run_time=2000)  # Unchanged run, only extends the versions
+
+        l_changed = self.df.copy()
+        l_changed.loc[l_changed['title_id'] == 'tt0015864', 'votes'] += 300000  # Moves the title up
+        l_third = imdb_top_250_adjustment.adjust_dataframe(p_df=l_changed)
+        l_third_run = self.store.add_run(p_df=l_third, p_run_time=3000)
+
+        l_versions = self.store._connection.execute('SELECT COUNT(*) FROM title_versions').fetchone()[0]
+        self.assertLess(l_versions, 3 * len(self.df))
+
+        l_history = self.store.title_history('tt0015864')
+        self.assertEqual([1, 2, 3], l_history['run_id'].tolist())
+        self.assertEqual(self.df['votes'][1] + 300000, l_history['votes'].iloc[-1])
+
+        self.assertEqual([2, 3], self.store.title_history('tt0015864', p_since=1500)['run_id'].tolist())
+
+        pd.testing.assert_frame_equal(l_third[['title_id', 'rank']].reset_index(drop=True),
+                                      self.store.records_at(l_third_run)[['title_id', 'rank']])
+
+        l_deltas = self.store.rank_deltas().set_index('title_id')
+        l_ranks = l_first.set_index('title_id')['rank']
+        self.assertEqual(l_ranks['tt0015864'] - l_third.set_index('title_id')['rank']['tt0015864'],
+                         l_deltas['rank_delta']['tt0015864'])
+        self.assertGreater(l_deltas['rank_delta']['tt0015864'], 0)
+
+    def test_runs_are_chained_per_list_and_rule_set(self):
+
+        l_first = imdb_top_250_adjustment.adjust_dataframe(p_df=self.df)
+        l_other = l_first.copy()
+        l_other['rank'] = l_other['rank'].max() + 1 - l_other['rank']  # Same titles, reversed on another list
+
+        l_first_run = self.store.add_run(p_df=l_first, p_source='list_a')
+        l_other_run = self.store.add_run(p_df=l_other, p_source='list_b')
+        self.store.add_run(p_df=l_first, p_source='list_a', p_rule_set='log_votes')
+        l_last_run = self.store.add_run(p_df=l_first, p_source='list_a')  # Unchanged, only extends list_a
+
+        l_versions = self.store._connection.execute('SELECT COUNT(*) FROM title_versions').fetchone()[0]
+        self.assertEqual(3 * len(self.df), l_versions)
+
+        for l_run_id, l_df in [(l_first_run, l_first), (l_other_run, l_other), (l_last_run, l_first)]:
+            self.assertEqual(l_df.sort_values('rank')['rank'].tolist(), self.store.records_at(l_run_id)['rank'].tolist())
+            self.assertEqual(len(self.df), len(self.store.records_at(l_run_id)))
+
+        self.assertEqual([0] * len(self.df), self.store.rank_deltas()['rank_delta'].tolist())
+        self.assertEqual([l_first_run, l_last_run],
+                         self.store.title_history('tt0015864').query('source == "list_a" and rule_set.isna()')['run_id']
+                         .tolist())
+
+    def test_concurrent_run_waits_for_the_write_lock(self):
+
+        l_first = imdb_top_250_adjustment.adjust_dataframe(p_df=self.df)
+        l_changed = self.df.copy()
+        l_changed.loc[l_changed['title_id'] == 'tt0015864', 'votes'] += 300000
+        l_second = imdb_top_250_adjustment.adjust_dataframe(p_df=l_changed)
+        self.store.add_run(p_df=l_first)
+
+        with mock.patch.object(c, 'store_busy_timeout_seconds', 0.1):
+            l_other = imdb_store.SnapshotStore(p_db_file=self.store.db_file, p_log_level='WARNING')
+        l_errors = []
+
+        class Interleaved:
+            """ Connection running a second writer between the read of the previous run and the next statement """
+
+            def __init__(self, p_connection):
+                self.connection = p_connection
+                self.previous_run_read = False
+
+            def __enter__(self):
+                return self.connection.__enter__()
+
+            def __exit__(self, *args):
+                return self.connection.__exit__(*args)
+
+            def __getattr__(self, p_name):
+                return getattr(self.connection, p_name)
+
+            def execute(self, p_sql, *args):
+                if self.previous_run_read:
+                    self.previous_run_read = False
+                    try:
+                        l_other.add_run(p_df=l_first)
+                    except sqlite3.OperationalError as oe:
+                        l_errors.append(oe)
+                self.previous_run_read = p_sql.startswith('SELECT MAX(run_id)')
+                return self.connection.execute(p_sql, *args)
+
+        self.store._connection = Interleaved(self.store._connection)
+        try:
+            l_run_id = self.store.add_run(p_df=l_second)
+        finally:
+            self.store._connection = self.store._connection.connection
+            l_other.close()
+
+        self.assertEqual(1, len(l_errors))  # The second writer could not get in between
+        self.assertEqual([1, 2], self.store.runs()['run_id'].tolist())
+        pd.testing.assert_frame_equal(l_second[['title_id', 'votes']].reset_index(drop=True),
+                                      self.store.records_at(l_run_id)[['title_id', 'votes']])
+
+
+class TestIMDBRecords(unittest.TestCase):
+
+    def test_record_is_normalized_and_columns_are_typed(self):
+
+        l_record = imdb_records.MovieRecord(2, 'https://www.imdb.com/title/tt0068646/', 'The Godfather', '1972-03-24',
+                                            '9.2', '1,900,000', 3)
+
+        self.assertEqual('tt0068646', l_record.title_id)
+        self.assertEqual(datetime(1972, 3, 24).date(), l_record.release_date)
+        self.assertEqual((9.2, 1900000, 3), (l_record.rating, l_record.votes, l_record.oscars))
+        self.assertFalse(hasattr(l_record, '__dict__'))
+
+        with self.assertRaises(ValueError):
+            imdb_records.MovieRecord(1, '/a', 'A', '24/03/1972', 9, 100, 0)
+
+        l_first = imdb_records.MovieRecord(1, 'https://www.imdb.com/title/tt0111161/', 'The Shawshank Redemption',
+                                           'N/A', 9.3, 2700000, 0)
+
+        # Records added out of list order, as streamed
+        df = imdb_records.MovieColumnBuilder().extend([l_record, l_first]).to_dataframe(p_title_ids=True, p_sort=True)
+
+        self.assertEqual(['tt0111161', 'tt0068646'], list(df['title_id']))
+        self.assertEqual(['N/A', '1972-03-24'], list(df['release_date']))
+        self.assertEqual([np.float64, np.int64, np.int64], [df[x].dtype for x in ['rating', 'votes', 'oscars']])
+
+
+class TestIMDBCli(unittest.TestCase):
+
+    def test_offline_adjust_does_not_import_http_or_html_stack(self):
+
+        with tempfile.TemporaryDirectory() as l_temp_dir:
+            l_raw_file = os.path.join(l_temp_dir, 'raw.csv')
+            imdb_writers.write_dataframe(p_df=pd.DataFrame([['tt0111161', 'The Shawshank Redemption', '1994-10-14', 9.3,
+                                                             2700000, 0],
+                                                            ['tt0068646', 'The Godfather', '1972-03-24', 9.2, 1900000, 7]],
+                                                           columns=['title_id'] + imdb_records.MOVIE_COLUMNS),
+                                         p_file=l_raw_file)
+
+            # A fresh interpreter, the test process has every module imported already
+            l_script = f"import sys, imdb_cli; " \
+                       f"imdb_cli.main(['adjust', '--input', {l_raw_file!r}, '--output', {l_temp_dir!r} + '/out.csv', " \
+                       f"'--store_file', {l_temp_dir!r} + '/history.db']); " \
+                       f"print(sorted({{'requests', 'bs4'}} & set(sys.modules)))"
+            l_result = subprocess.run([sys.executable, '-c', l_script], capture_output=True, text=True, check=True,
+                                      cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+            self.assertEqual('[]', l_result.stdout.strip())
+
+            l_adjusted = imdb_writers.read_dataframe(os.path.join(l_temp_dir, 'out.csv'))
+            self.assertEqual(['The Godfather', 'The Shawshank Redemption'], list(l_adjusted['name']))
+
+            l_store = imdb_store.SnapshotStore(p_db_file=os.path.join(l_temp_dir, 'history.db'))
+            self.assertEqual(1, len(l_store.runs()))
+            l_store.close()
+
+
+class TestIMDBAwards(unittest.TestCase):
+
+    def test_award_counts_of_pages_and_labels(self):
+
+        l_contents = []
+        for movie_data in test_data.test_data['movie_byte_files']:
+            with open(movie_data['file_name'], "rb") as binary_file:
+                l_contents.append(binary_file.read())
+
+        l_awards = imdb_awards.parse_awards_batch(l_contents + [b'<html></html>'])
+
+        self.assertEqual([x['oscars'] for x in test_data.test_data['movie_byte_files']] + [0], list(l_awards['oscars']))
+        self.assertEqual([0, 2, 0, 0, 0, 0], list(l_awards['oscar_nominations']))
+        self.assertEqual([2, 3, 6, 2, 209, 0], list(l_awards['wins']))
+        self.assertEqual([0, 3, 7, 1, 124, 0], list(l_awards['nominations']))
+
+        # Singular form, the first Oscars label counts
+        self.assertEqual(imdb_awards.AwardCounts(oscars=1, wins=4, nominations=1),
+                         imdb_awards.awards_from_labels(['Stars', 'Won 1 Oscar', 'Won 2 Oscars'], '4 wins & 1 nomination'))
+        self.assertEqual(1, imdb_scraper.extract_number_of_oscars_from_labels(['Won 1 Oscar']))
+
+
+class TestIMDBParser(unittest.TestCase):
+
+    def test_backends_match_soup_oracle(self):
+
+        for movie_data in test_data.test_data['movie_byte_files']:
+
+            with open(movie_data['file_name'], "rb") as binary_file:
+                l_bdata = binary_file.read()
+
+            l_oracle = imdb_parser.parse_page_soup(l_bdata)
+
+            for l_backend in imdb_parser.PARSER_BACKENDS:
+
+                l_page = imdb_parser.parse_page(p_content=l_bdata, p_backend=l_backend)
+
+                assert l_page == l_oracle, f'Backend "{l_backend}" differs from soup, file name: {movie_data["file_name"]}'
+
+                assert imdb_scraper.extract_imdb_data(p_content=l_bdata, p_parser=l_backend) == \
+                    [movie_data['title'], movie_data['date_published'], movie_data['rating'], movie_data['votes'],
+                     movie_data['oscars']], f'Backend "{l_backend}" extracted wrong data: {movie_data["file_name"]}'
+
+    def test_fast_backend_falls_back_to_soup(self):
+
+        # Unquoted attribute is not matched by the byte scan, the soup fallback still finds it
+        l_content = b'<html><script type=application/ld+json>{"name": "Cactus"}</script></html>'
+
+        with self.assertRaises(imdb_parser.ParseError):
+            imdb_parser.parse_page_fast(l_content)
+
+        assert imdb_parser.parse_page(p_content=l_content, p_backend='fast').json_text == '{"name": "Cactus"}', \
+            'Fast backend did not fall back to soup'
+
+
+class OfflineTestCase(unittest.TestCase):
+    """
+    Serves the captured movie pages and a list page pointing at them offline from a temporary response cache.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = imdb_cache.ResponseCache(p_cache_dir=self.temp_dir.name)
+        self.urls = []
+
+        for movie_data in test_data.test_data['movie_byte_files']:
+            with open(movie_data['file_name'], "rb") as binary_file:
+                l_url = f'https://www.imdb.com/title/{movie_data["title_id"]}/'
+                self.cache.put(l_url, binary_file.read())
+                self.urls.append(l_url)
+
+        l_list_json = json.dumps({'about': {'itemListElement': [{'position': i + 1, 'url': f'/title/{x["title_id"]}/'}
+                                                                for i, x in enumerate(
+                                                                    test_data.test_data['movie_byte_files'])]}})
+        self.cache.put(imdb_scraper.c.top_250_url,
+                       f'<html><script type="application/ld+json">{l_list_json}</script></html>'.encode())
+
+        self.client = imdb_http_client.HttpClient(p_cache=self.cache, p_offline=True)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+class TestIMDBPipeline(OfflineTestCase):
+
+    def test_process_pool_matches_in_process(self):
+
+        l_expected = [[x['title'], x['date_published'], x['rating'], x['votes'], x['oscars']]
+                      for x in test_data.test_data['movie_byte_files']]
+
+        for l_in_process in (True, False):
+            l_results = imdb_pipeline.run_pipeline(p_url_list=self.urls,
+                                                   p_parse_function=imdb_scraper.extract_imdb_data,
+                                                   p_client=self.client,
+                                                   p_parse_workers=2,
+                                                   p_queue_size=2,
+                                                   p_in_process=l_in_process)
+
+            assert l_results == l_expected, f'Pipeline results do not match, in-process: {l_in_process}'
+
+    def test_pipeline_raises_fetch_error(self):
+
+        with self.assertRaises(imdb_http_client.CacheMissError):
+            imdb_pipeline.run_pipeline(p_url_list=self.urls + ['https://www.imdb.com/title/tt9999999/'],
+                                       p_parse_function=imdb_scraper.extract_imdb_data,
+                                       p_client=self.client,
+                                       p_queue_size=1,
+                                       p_in_process=True)
+
+    def test_extract_imdb_top_250_data_offline(self):
+
+        l_df = imdb_scraper.extract_imdb_top_250_data(p_client=self.client, p_in_process=True)
+
+        assert list(l_df['name']) == [x['title'] for x in test_data.test_data['movie_byte_files']], \
+            'Extracted titles are not in list order'
+        assert list(l_df['oscars']) == [x['oscars'] for x in test_data.test_data['movie_byte_files']], \
+            'Extracted Oscars do not match'
+
+    def test_run_report_has_stage_and_title_timings(self):
+
+        l_metrics = imdb_metrics.start_run()
+
+        imdb_scraper.extract_imdb_top_250_data(p_client=self.client, p_parse_workers=2)  # Timed in parser processes
+
+        l_report = json.loads(json.dumps(l_metrics.report(p_client=self.client)))
+
+        for l_stage in ['list_fetch', 'page_fetch', 'parse', 'json_extract', 'oscar_extract']:
+            self.assertIn(l_stage, l_report['stages'])
+        self.assertEqual(len(self.urls), l_report['stages']['parse']['count'])
+
+        self.assertEqual(set(self.urls), set(l_report['titles']))
+        for l_timings in l_report['titles'].values():
+            self.assertEqual('hit', l_timings['cache'])
+            self.assertGreater(l_timings['parse'], 0)
+
+        self.assertEqual(len(self.urls) + 1, l_report['network']['cache_hits'])
+
+    def test_records_are_streamed(self):
+
+        l_records = imdb_scraper.iter_imdb_top_250_records(p_client=self.client, p_in_process=True)
+
+        l_first = next(l_records)  # Available before the rest of the list is parsed
+
+        assert isinstance(l_first, imdb_scraper.imdb_records.MovieRecord), 'Streamed item is not a MovieRecord'
+        assert l_first.url == self.urls[l_first.position - 1], 'Record position does not match its URL'
+
+        l_records.close()  # Stopping early must not hang on the remaining fetches
+
+    def test_async_records(self):
+
+        async def collect():
+            return [x async for x in imdb_scraper.aiter_imdb_top_250_records(p_client=self.client, p_in_process=True)]
+
+        l_records = asyncio.run(collect())
+
+        l_expected = sorted(x['title'] for x in test_data.test_data['movie_byte_files'])
+
+        assert sorted(x.name for x in l_records) == l_expected, 'Async records do not match'
+
+
+class TestIMDBCheckpoint(OfflineTestCase):
+
+    def test_failed_title_is_dead_lettered_and_run_resumes(self):
+
+        l_broken_url = self.urls[2]
+        with open(test_data.test_data['movie_byte_files'][2]['file_name'], "rb") as binary_file:
+            l_page = binary_file.read()
+        self.cache.put(l_broken_url, b'<html>Service Unavailable</html>')
+
+        l_checkpoint_dir = os.path.join(self.temp_dir.name, 'checkpoint')
+        l_args = {'p_checkpoint_dir': l_checkpoint_dir, 'p_max_failed_titles': 0, 'p_max_failed_ratio': 0,
+                  'p_client': self.client, 'p_in_process': True}
+
+        with self.assertRaises(imdb_checkpoint.TooManyFailuresError):
+            imdb_checkpoint.extract_imdb_top_250_data_checkpointed(**l_args)
+
+        l_checkpoint = imdb_checkpoint.Checkpoint(p_dir=l_checkpoint_dir)
+        self.assertEqual(set(self.urls) - {l_broken_url}, set(l_checkpoint.load()))
+        with open(l_checkpoint.dead_letter_file, 'r', encoding='utf-8') as l_file:
+            self.assertEqual([l_broken_url], [json.loads(x)['url'] for x in l_file])
+
+        # The page is back, the rerun fetches the list and the failed title only
+        self.cache.put(l_broken_url, l_page)
+        l_requests = len(self.client.stats.requests)
+
+        l_df = imdb_checkpoint.extract_imdb_top_250_data_checkpointed(**l_args)
+
+        self.assertEqual([c.top_250_url, l_broken_url], [x['url'] for x in self.client.stats.requests[l_requests:]])
+        self.assertEqual([x['title'] for x in test_data.test_data['movie_byte_files']], l_df['name'].tolist())
+        self.assertFalse(os.path.exists(l_checkpoint.journal_file))
+
+    def test_tolerated_failures(self):
+
+        self.cache.put(self.urls[0], b'<html></html>')
+
+        l_df = imdb_checkpoint.extract_imdb_top_250_data_checkpointed(
+            p_checkpoint_dir=os.path.join(self.temp_dir.name, 'checkpoint'), p_max_failed_titles=1,
+            p_client=self.client, p_in_process=True)
+
+        self.assertEqual(len(self.urls) - 1, len(l_df))
+        self.assertEqual(1, imdb_checkpoint.tolerated_failures(p_titles=20, p_max_failed_titles=0,
+                                                               p_max_failed_ratio=0.05))
+
+
+class TestIMDBLists(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(p_titles=250, p_page_size=100).start()
+        self.client = imdb_http_client.HttpClient(p_requests_per_second=0, p_log_level='WARNING')
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_pagination_and_position_range(self):
+
+        l_source = imdb_lists.ListSource(name='standin', url=self.server.list_url, first=95, last=210, max_pages=10)
+
+        l_links = list(imdb_lists.iter_list_links(p_source=l_source, p_client=self.client))
+
+        self.assertEqual(list(range(95, 211)), [x[0] for x in l_links])
+        self.assertEqual(self.server.title_urls()[94:210], [x[1] for x in l_links])
+        self.assertEqual(3, self.server.counters['requests'])  # Stops at the last position, no fourth page
+
+        l_all = list(imdb_lists.iter_list_links(p_source=l_source._replace(first=1, last=None), p_client=self.client))
+        self.assertEqual(250, len(l_all))  # The repeated last page ends the list
+
+    def test_shared_titles_are_scraped_once(self):
+
+        l_sources = [imdb_lists.ListSource(name='first', url=self.server.list_url, first=1, last=3),
+                     imdb_lists.ListSource(name='second', url=self.server.list_url, first=2, last=5)]
+
+        l_df = imdb_scraper.extract_imdb_lists_data(p_sources=l_sources, p_client=self.client, p_in_process=True)
+
+        self.assertEqual(['first'] * 3 + ['second'] * 4, l_df['list'].tolist())
+        self.assertEqual([1, 2, 3, 2, 3, 4, 5], l_df['position'].tolist())
+        self.assertEqual(['first', 'second'], list(l_df['list'].cat.categories))
+        self.assertEqual(['int64', 'float64', 'int64', 'int64'],
+                         [str(l_df[x].dtype) for x in ['position', 'rating', 'votes', 'oscars']])
+        self.assertEqual(l_df[l_df['list'] == 'first']['name'].tolist()[1:],
+                         l_df[l_df['list'] == 'second']['name'].tolist()[:2])
+        self.assertEqual(2 + 5, self.server.counters['requests'])  # Two list pages, five movie pages
+
+
+class TestIMDBService(unittest.TestCase):
+
+    def test_reads_are_served_from_memory_with_etag(self):
+
+        with StandInServer(p_titles=5) as l_server, tempfile.TemporaryDirectory() as l_cache_dir:
+            l_service = imdb_service.ScrapeService(p_port=0, p_cache_dir=l_cache_dir, p_in_process=True,
+                                                   p_source=imdb_lists.ListSource(name='standin', url=l_server.list_url),
+                                                   p_log_level='WARNING').start(p_schedule=False)
+            try:
+                self.assertEqual(503, requests.get(f'{l_service.url}/top').status_code)  # No scrape on read
+
+                self.assertTrue(l_service.refresh())
+                l_requests = l_server.counters['requests']
+
+                l_response = requests.get(f'{l_service.url}/top')
+                self.assertEqual(200, l_response.status_code)
+                self.assertEqual([1, 2, 3, 4, 5], [x['rank'] for x in l_response.json()['movies']])
+
+                l_etag = l_response.headers['ETag']
+                self.assertEqual(304, requests.get(f'{l_service.url}/top', headers={'If-None-Match': l_etag}).status_code)
+                self.assertEqual(l_requests, l_server.counters['requests'])  # Reads never reach IMDB
+
+                # An unchanged list keeps its ETag, a failed refresh keeps the served result
+                self.assertTrue(l_service.refresh())
+                self.assertEqual(l_etag, l_service.result.etag)
+
+                with mock.patch.object(imdb_scraper, 'extract_imdb_top_250_data', side_effect=Exception('Blocked')):
+                    self.assertFalse(l_service.refresh())
+
+                self.assertEqual(l_etag, requests.get(f'{l_service.url}/top').headers['ETag'])
+                self.assertEqual('stale', requests.get(f'{l_service.url}/health').json()['status'])
+            finally:
+                l_service.stop()
+
+
+class TestIMDBBatch(unittest.TestCase):
+
+    def test_manifest_of_lists_and_snapshots(self):
+
+        with StandInServer(p_titles=6) as l_server, tempfile.TemporaryDirectory() as l_temp_dir, \
+                mock.patch.dict(c.list_sources, {'first': {'url': l_server.list_url, 'positions': [1, 4]},
+                                                 'second': {'url': l_server.list_url, 'positions': [3, 6]}}):
+            l_raw_file = os.path.join(l_temp_dir, 'raw.csv')
+            l_store_file = os.path.join(l_temp_dir, 'history.db')
+
+            l_raw = pd.DataFrame(test_data.test_data['dataframe_adjustments'], columns=imdb_records.MOVIE_COLUMNS)
+            l_raw.insert(loc=0, column='title_id', value=[x['title_id'] for x in test_data.test_data['movie_byte_files']])
+            imdb_writers.write_dataframe(p_df=l_raw, p_file=l_raw_file)
+            imdb_top_250_adjustment.adjust_and_write(p_df=l_raw, p_output_file=os.path.join(l_temp_dir, 'run.csv'),
+                                                     p_dataset_dir=None, p_store_file=l_store_file)
+
+            l_manifest = {'output_dir': os.path.join(l_temp_dir, 'out'),
+                          'rule_sets': ['default', 'log_votes'],
+                          'jobs': [{'list': 'first'},
+                                   {'list': 'second', 'rule_sets': ['log_votes']},
+                                   {'file': l_raw_file},
+                                   {'store_run': 'all', 'store': l_store_file}]}
+
+            l_report = imdb_batch.run_batch(p_manifest=l_manifest, p_batch_workers=2, p_cache_dir=l_temp_dir,
+                                            p_parse_workers=1, p_log_level='WARNING')
+
+            self.assertEqual([], l_report['failed'])
+            self.assertEqual(['first', 'second', 'raw', 'run_1'], [x['job'] for x in l_report['jobs']])
+            self.assertEqual([4, 4, 5, 5], [x['titles'] for x in l_report['jobs']])
+            self.assertEqual(6, l_report['scrape']['titles'])  # Titles 3 and 4 of both lists are scraped once
+            self.assertEqual(['log_votes'], list(l_report['jobs'][1]['outputs']))
+            self.assertIn('adjust', l_report['jobs'][2]['stages'])
+
+            l_adjusted = imdb_writers.read_dataframe(l_report['jobs'][3]['outputs']['default']['file'])
+            pd.testing.assert_frame_equal(imdb_writers.read_dataframe(os.path.join(l_temp_dir, 'run.csv')),
+                                          l_adjusted)  # Re-adjusting a stored run reproduces its result
+
+            # Existing results are not overwritten, the job fails alone
+            l_rerun = imdb_batch.run_batch(p_manifest=dict(l_manifest, jobs=l_manifest['jobs'][2:]), p_in_process=True,
+                                           p_log_level='CRITICAL')
+            self.assertEqual(['raw', 'run_1'], l_rerun['failed'])
+
+            with self.assertRaises(ValueError):
+                imdb_batch.manifest_jobs({'jobs': [{'file': l_raw_file, 'rule_sets': ['unknown']}]})
+
+            # The rule sets of a job are evaluated in one pass and ranked like adjust_dataframe ranks them one by one
+            l_job = imdb_batch.manifest_jobs({'rule_sets': ['default', 'log_votes'], 'jobs': [{'file': l_raw_file}]})[0]
+            with mock.patch.object(imdb_rules, 'evaluate_rule_sets', wraps=imdb_rules.evaluate_rule_sets) as l_evaluate:
+                l_job_report = imdb_batch.run_job(p_job=l_job, p_output_dir=os.path.join(l_temp_dir, 'single'),
+                                                  p_log_level='WARNING')
+            l_evaluate.assert_called_once()
+            for l_rule_set, l_adjusted, _ in l_job_report['runs']:
+                pd.testing.assert_frame_equal(imdb_top_250_adjustment.adjust_dataframe(
+                    p_df=imdb_batch.read_movie_data(l_raw_file), p_rule_set=imdb_rules.get_rule_set(l_rule_set)), l_adjusted)
+
+    def test_store_is_written_by_the_parent_and_scrape_failures_stay_local(self):
+
+        with tempfile.TemporaryDirectory() as l_temp_dir, \
+                mock.patch.dict(c.list_sources, {'gone': {'url': 'https://www.imdb.com/list/ls000000000/'}}), \
+                mock.patch.object(imdb_batch, 'scrape_lists', side_effect=requests.ConnectionError('down')):
+            l_raw = pd.DataFrame(test_data.test_data['dataframe_adjustments'], columns=imdb_records.MOVIE_COLUMNS)
+            l_raw.insert(loc=0, column='title_id', value=[x['title_id'] for x in test_data.test_data['movie_byte_files']])
+            l_files = [os.path.join(l_temp_dir, f'raw_{x}.csv') for x in 'ab']
+            for l_file in l_files:
+                imdb_writers.write_dataframe(p_df=l_raw, p_file=l_file)
+
+            l_store_file = os.path.join(l_temp_dir, 'history.db')
+            l_report = imdb_batch.run_batch(p_manifest={'output_dir': os.path.join(l_temp_dir, 'out'),
+                                                        'store_file': l_store_file,
+                                                        'rule_sets': ['default', 'log_votes'],
+                                                        'jobs': [{'list': 'gone'}] + [{'file': x} for x in l_files]},
+                                            p_batch_workers=2, p_log_level='CRITICAL')
+
+            self.assertEqual(['gone'], l_report['failed'])
+            self.assertIn('ConnectionError', l_report['jobs'][0]['error'])
+            self.assertIn('store', l_report['jobs'][1]['stages'])
+            self.assertNotIn('runs', json.dumps(l_report))
+
+            # Every result is stored once, in manifest order, and reads back as written
+            l_store = imdb_store.SnapshotStore(p_db_file=l_store_file, p_log_level='WARNING')
+            try:
+                l_runs = l_store.runs()
+                self.assertEqual(['default', 'log_votes'] * 2, l_runs['rule_set'].tolist())
+                for l_run_id, l_job, l_rule_set in zip(l_runs['run_id'], [1, 1, 2, 2], l_runs['rule_set']):
+                    l_written = imdb_writers.read_dataframe(l_report['jobs'][l_job]['outputs'][l_rule_set]['file'])
+                    self.assertEqual(l_written['adjusted_rating'].tolist(),
+                                     l_store.records_at(l_run_id)['adjusted_rating'].tolist())
+            finally:
+                l_store.close()
+
+    def test_jobs_and_rule_sets_share_the_dataset(self):
+
+        with tempfile.TemporaryDirectory() as l_temp_dir, \
+                mock.patch.object(imdb_batch, 'datetime', mock.Mock(now=mock.Mock(return_value=datetime(2022, 1, 1, 12)))):
+            l_raw = pd.DataFrame(test_data.test_data['dataframe_adjustments'], columns=imdb_records.MOVIE_COLUMNS)
+            l_raw.insert(loc=0, column='title_id', value=[x['title_id'] for x in test_data.test_data['movie_byte_files']])
+            l_files = [os.path.join(l_temp_dir, f'raw_{x}.csv') for x in 'ab']
+            for l_file in l_files:
+                imdb_writers.write_dataframe(p_df=l_raw, p_file=l_file)
+
+            l_dataset_dir = os.path.join(l_temp_dir, 'dataset')
+            l_report = imdb_batch.run_batch(p_manifest={'output_dir': os.path.join(l_temp_dir, 'out'),
+                                                        'dataset_dir': l_dataset_dir,
+                                                        'rule_sets': ['default', 'log_votes'],
+                                                        'jobs': [{'file': x} for x in l_files]},
+                                            p_in_process=True, p_log_level='WARNING')
+
+            # Every result of the same second has its own part file, its rows name the job and the rule set
+            self.assertEqual([], l_report['failed'])
+            self.assertEqual(['part-raw_a-default.csv', 'part-raw_a-log_votes.csv',
+                              'part-raw_b-default.csv', 'part-raw_b-log_votes.csv'],
+                             sorted(os.listdir(os.path.join(l_dataset_dir, 'run_ts=20220101T120000'))))
+
+            l_dataset = imdb_writers.read_dataset(p_dataset_dir=l_dataset_dir)
+            self.assertEqual(4 * len(l_raw), len(l_dataset))
+            self.assertEqual({('raw_a', 'default'), ('raw_a', 'log_votes'), ('raw_b', 'default'), ('raw_b', 'log_votes')},
+                             set(zip(l_dataset['job'], l_dataset['rule_set'])))
+
+
+class TestIMDBTransport(unittest.TestCase):
+
+    def test_record_and_replay(self):
+
+        with tempfile.TemporaryDirectory() as l_temp_dir:
+            l_archive_file = os.path.join(l_temp_dir, 'run.zip')
+
+            # Record a run with failed requests, retried
+            with StandInServer(p_titles=12, p_page_size=5, p_error_rate=0.2) as l_server:
+                l_source = imdb_lists.ListSource(name='standin', url=l_server.list_url, max_pages=3)
+                l_client = imdb_http_client.HttpClient(
+                    p_requests_per_second=0, p_retry_wait=0.01, p_log_level='CRITICAL',
+                    p_transport=imdb_transport.RecordingAdapter(p_file=l_archive_file, p_log_level='WARNING'))
+                try:
+                    l_recorded = imdb_scraper.extract_imdb_top_250_data(p_log_level='CRITICAL', p_client=l_client,
+                                                                        p_in_process=True, p_title_ids=True,
+                                                                        p_source=l_source)
+                    # Bodies go to the archive on disk as they are recorded, it is completed on close
+                    l_partial = [os.path.join(l_temp_dir, x) for x in os.listdir(l_temp_dir) if x.startswith('.run.zip.')]
+                    self.assertGreater(os.path.getsize(l_partial[0]), 0)
+                    self.assertFalse(os.path.exists(l_archive_file))
+                finally:
+                    l_client.close()
+                l_client.close()  # Closing again keeps the archive
+                l_server_requests = l_server.counters['requests']
+
+            # The server is gone, every response comes from the archive, in the recorded order
+            l_archive = imdb_transport.TransportArchive.load(l_archive_file)
+            self.assertEqual(l_server_requests, len(l_archive))
+            self.assertLess(os.path.getsize(l_archive_file), sum(len(b) for x in l_archive.responses.values()
+                                                                 for _, _, b in x))
+
+            l_client = imdb_http_client.create_client(p_replay_file=l_archive_file, p_log_level='CRITICAL')
+            l_replayed = imdb_scraper.extract_imdb_top_250_data(p_log_level='CRITICAL', p_client=l_client,
+                                                                p_in_process=True, p_title_ids=True, p_source=l_source)
+            pd.testing.assert_frame_equal(l_recorded, l_replayed)
+            self.assertEqual(l_server_requests, l_client.stats.summary()['requests'] + l_client.stats.summary()['retries'])
+
+            # Unknown URLs fail at once, without retries
+            with self.assertRaises(imdb_transport.ReplayMissError):
+                l_client.get(l_source.url + '?unknown')
+            l_client.close()
+
+            with self.assertRaises(ValueError):
+                imdb_http_client.create_client(p_offline=True, p_replay_file=l_archive_file)
+
+
+class TestIMDBIncremental(OfflineTestCase):
+
+    def test_plan_refresh(self):
+
+        l_now = 1000000.0
+        l_snapshot = {'/a': (imdb_records.MovieRecord(1, '/a', 'A', 'N/A', 9, 100, 0), l_now - 60),
+                      '/b': (imdb_records.MovieRecord(2, '/b', 'B', 'N/A', 8, 100, 0), l_now - 60),
+                      '/c': (imdb_records.MovieRecord(3, '/c', 'C', 'N/A', 7, 100, 0), l_now - 2 * 60 * 60),
+                      '/x': (imdb_records.MovieRecord(4, '/x', 'X', 'N/A', 6, 100, 0), l_now - 60)}
+
+        # /a unchanged, /b moved, /c stale, /d new, /x dropped out of the list
+        l_to_scrape, l_reused = imdb_incremental.plan_refresh(p_link_list=[(1, '/a'), (3, '/b'), (2, '/c'), (4, '/d')],
+                                                              p_snapshot=l_snapshot,
+                                                              p_freshness_hours=1,
+                                                              p_now=l_now)
+
+        assert l_to_scrape == [(3, '/b'), (2, '/c'), (4, '/d')], f'Wrong titles to scrape: {l_to_scrape}'
+        assert list(l_reused) == ['/a'], f'Wrong titles reused: {list(l_reused)}'
+
+    def test_incremental_run_reuses_snapshot(self):
+
+        l_snapshot_file = os.path.join(self.temp_dir.name, 'snapshot.csv')
+
+        l_full = imdb_incremental.extract_imdb_top_250_data_incremental(p_snapshot_file=l_snapshot_file,
+                                                                        p_client=self.client,
+                                                                        p_in_process=True)
+        l_requests = self.client.stats.summary()['requests']
+
+        l_reused = imdb_incremental.extract_imdb_top_250_data_incremental(p_snapshot_file=l_snapshot_file,
+                                                                          p_client=self.client,
+                                                                          p_in_process=True)
+
+        # Only the list page is requested by the second run
+        assert self.client.stats.summary()['requests'] == l_requests + 1, 'Fresh titles were scraped again'
+
+        pd.testing.assert_frame_equal(l_full, l_reused)
+
+    def test_every_list_keeps_its_own_snapshot(self):
+
+        l_sources = [imdb_lists.ListSource(name='first', url=c.top_250_url, first=1, last=2),
+                     imdb_lists.ListSource(name='second', url=c.top_250_url, first=3, last=5)]
+
+        with mock.patch.object(c, 'snapshot_file', os.path.join(self.temp_dir.name, 'imdb_{source}_snapshot.csv')):
+            for l_source in l_sources:
+                imdb_incremental.extract_imdb_top_250_data_incremental(p_client=self.client, p_in_process=True,
+                                                                       p_source=l_source)
+            l_requests = self.client.stats.summary()['requests']
+
+            # The second list did not replace the snapshot of the first one, its titles are reused
+            l_first = imdb_incremental.extract_imdb_top_250_data_incremental(p_client=self.client, p_in_process=True,
+                                                                             p_source=l_sources[0])
+            self.assertEqual(l_requests + 1, self.client.stats.summary()['requests'])
+            self.assertEqual(2, len(l_first))
+
+            self.assertEqual([2, 3], [len(imdb_incremental.load_snapshot(p_file=imdb_incremental.snapshot_path(x)))
+                                      for x in l_sources])
+
+
+class TestIMDBFetcher(unittest.TestCase):
+
+    @staticmethod
+    def fake_response(p_url: str, p_status_code: int = 200, p_headers: dict = None) -> requests.Response:
+        l_response = requests.Response()
+        l_response.url = p_url
+        l_response.status_code = p_status_code
+        l_response.headers.update(p_headers or {})
+        l_response._content = p_url.encode()
+        return l_response
+
+    def test_fetch_pages_keeps_order_and_retries(self):
+
+        l_urls = [f'https://www.imdb.com/title/tt{i:07d}/' for i in range(10)]
+        l_failed_once = set()
+
+        def fake_get(p_url, timeout=None, headers=None):
+            if p_url.endswith('3/') and p_url not in l_failed_once:  # First attempt of one page fails
+                l_failed_once.add(p_url)
+                return self.fake_response(p_url, 503)
+            return self.fake_response(p_url)
+
+        l_client = imdb_http_client.HttpClient(p_requests_per_second=0)
+
+        with mock.patch.object(l_client.session, 'get', side_effect=fake_get), \
+                mock.patch('imdb_http_client.time.sleep'):
+            l_pages = imdb_fetcher.fetch_pages(p_url_list=l_urls, p_max_workers=4, p_client=l_client)
+
+        assert l_pages == [url.encode() for url in l_urls], 'Fetched pages are not in the order of the URL list'
+        assert len(l_failed_once) == 1, 'Failed page was not retried'
+
+        l_summary = l_client.stats.summary()
+
+        assert l_summary['requests'] == 10 and l_summary['retries'] == 1, f'Unexpected request stats: {l_summary}'
+        assert l_summary['bytes'] == sum(len(url) for url in l_urls), f'Unexpected byte counter: {l_summary}'
+
+    def test_client_backs_off_on_429(self):
+
+        l_url = 'https://www.imdb.com/title/tt0000001/'
+        l_client = imdb_http_client.HttpClient(p_requests_per_second=0, p_max_retries=2)
+
+        with mock.patch.object(l_client.session, 'get',
+                               side_effect=[self.fake_response(l_url, 429, {'Retry-After': '7'}),
+                                            self.fake_response(l_url, 500),
+                                            self.fake_response(l_url)]), \
+                mock.patch('imdb_http_client.time.sleep') as l_sleep:
+            l_response = l_client.get(l_url)
+
+        assert l_response.content == l_url.encode(), 'Response of the last attempt is not returned'
+        assert [x.args[0] for x in l_sleep.call_args_list] == [7.0, 2], 'Retry-After and backoff are not respected'
+
+    def test_client_gives_up_after_retries(self):
+
+        l_client = imdb_http_client.HttpClient(p_requests_per_second=0, p_max_retries=2)
+
+        with mock.patch.object(l_client.session, 'get', side_effect=requests.ConnectionError('down')) as l_get, \
+                mock.patch('imdb_http_client.time.sleep'):
+            with self.assertRaises(requests.ConnectionError):
+                l_client.get('https://www.imdb.com/title/tt0000001/')
+
+        assert l_get.call_count == 3, 'Request was not retried the configured number of times'
+
+        # A server asking to wait longer than the configured maximum fails the request instead of blocking a worker
+        l_busy = requests.Response()
+        l_busy.status_code = 503
+        l_busy.headers['Retry-After'] = 'Wed, 21 Oct 2099 07:28:00 GMT'
+        l_busy._content = b''
+        with mock.patch.object(l_client.session, 'get', return_value=l_busy) as l_get, \
+                mock.patch('imdb_http_client.time.sleep') as l_sleep:
+            with self.assertRaises(requests.HTTPError):
+                l_client.get('https://www.imdb.com/title/tt0000001/')
+
+        assert l_get.call_count == 1 and not l_sleep.called, 'Long Retry-After was waited for'
+
+    def test_streamed_download_stops_after_needed_sections(self):
+
+        with StandInServer(p_titles=1) as l_server:
+            l_url = l_server.title_urls()[0]
+            l_client = imdb_http_client.HttpClient(p_requests_per_second=0)
+
+            l_full = l_client.get(l_url)
+            l_partial = l_client.get(l_url, p_complete_factory=imdb_parser.SectionScanner)
+
+            # A download retried after a failed read starts with a new scanner, nothing of the failed read is carried over
+            def broken_body(chunk_size):
+                yield l_partial.content[:len(l_partial.content) // 2]
+                raise requests.exceptions.ChunkedEncodingError('reset')
+
+            l_broken = mock.MagicMock(status_code=200, headers={}, iter_content=broken_body)
+            l_scanners = []
+            with mock.patch.object(l_client.session, 'get',
+                                   side_effect=[l_broken, requests.Session().get(l_url, stream=True)]), \
+                    mock.patch('imdb_http_client.time.sleep'):
+                l_retried = l_client.get(l_url, p_complete_factory=lambda: l_scanners.append(
+                    imdb_parser.SectionScanner()) or l_scanners[-1])
+
+            with self.assertRaises(imdb_http_client.BodyTooLargeError):
+                imdb_http_client.HttpClient(p_requests_per_second=0, p_max_body_bytes=100 * 1024).get(l_url)
+
+            l_client.close()
+
+        assert l_partial.truncated and len(l_partial.content) < len(l_full.content), 'Whole page was read'
+        assert len(l_scanners) == 2 and l_retried.content == l_partial.content, 'Scanner was reused by the retry'
+        for l_backend in imdb_parser.PARSER_BACKENDS:
+            assert imdb_scraper.extract_imdb_data(p_content=l_partial.content, p_parser=l_backend) == \
+                imdb_scraper.extract_imdb_data(p_content=l_full.content, p_parser=l_backend), \
+                f'Sections needed by the "{l_backend}" backend were not read'
+        assert l_server.counters['requests'] == 4, 'Too large response was retried'
+
+    def test_log_excerpt_is_short_and_lazy(self):
+
+        l_page = mock.MagicMock()
+        l_page.__str__.return_value = 'x' * 10000
+
+        l_logger = logging.getLogger('excerpt test')
+        l_logger.setLevel('INFO')
+        l_logger.debug('Page: %s', imdb_logs.Excerpt(l_page))
+
+        assert not l_page.__str__.called, 'Excerpt was formatted below its log level'
+        assert str(imdb_logs.Excerpt(l_page, p_limit=10)) == 'x' * 10 + ' ... ( 10000 in total )', 'Excerpt was not cut'
+        assert str(imdb_logs.Excerpt(b'<html>', p_limit=10)) == '<html>', 'Short content was changed'
+
+    def test_rate_limiter_serves_list_pages_first(self):
+
+        l_limiter = imdb_http_client.RateLimiter(p_requests_per_second=20, p_burst=1)
+        l_limiter.throttled(p_retry_after=0.2)  # Every caller queues up behind the pause
+        l_order = []
+
+        def acquire(p_name, p_priority):
+            l_limiter.acquire(p_priority=p_priority)
+            l_order.append(p_name)
+
+        l_threads = [threading.Thread(target=acquire, args=(f'page {i}', imdb_http_client.PRIORITY_PAGE))
+                     for i in range(3)]
+        for l_thread in l_threads:
+            l_thread.start()
+        time.sleep(0.05)
+        l_threads.append(threading.Thread(target=acquire, args=('list', imdb_http_client.PRIORITY_LIST)))
+        l_threads[-1].start()
+        for l_thread in l_threads:
+            l_thread.join()
+
+        assert l_order == ['list', 'page 0', 'page 1', 'page 2'], f'List page was not served first: {l_order}'
+        assert l_limiter.summary()['queue_wait_max'] >= 0.15, 'Pause of the 429 response was not respected'
+
+    def test_client_adapts_to_throttling(self):
+
+        with StandInServer(p_titles=20, p_throttle_rate=0.3, p_retry_after=0.1) as l_server:
+            l_client = imdb_http_client.HttpClient(p_requests_per_second=100, p_max_retries=10, p_retry_wait=0.01)
+            l_client.stats.rate_limiter.min_rate = 20  # Keeps the test fast, the default floor is far lower
+            l_pages = imdb_fetcher.fetch_pages(p_url_list=l_server.title_urls(), p_max_workers=8, p_client=l_client)
+            l_client.close()
+
+        l_rate = l_client.stats.summary()['rate']
+
+        assert all(l_pages), 'Throttled pages were not fetched'
+        assert l_rate['throttled'] == l_server.counters['throttled'] > 0, f'429 responses were not counted: {l_rate}'
+        assert 1 <= l_rate['slowdowns'] <= l_rate['throttled'], f'Scheduler did not slow down: {l_rate}'
+        assert 20 <= l_rate['rate_limit'] <= 100, f'Rate left its bounds: {l_rate}'
+        assert l_rate['requests_per_second'] > 0 and l_rate['queue_wait_total'] > 0, f'Missing rate stats: {l_rate}'
+
+
+class TestIMDBCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_cache_evicts_least_recently_used(self):
+
+        l_cache = imdb_cache.ResponseCache(p_cache_dir=self.temp_dir.name, p_max_bytes=10 ** 9)
+
+        l_urls = [f'https://www.imdb.com/title/tt{i:07d}/' for i in range(3)]
+        for l_url in l_urls:
+            l_cache.put(l_url, os.urandom(1000))  # Random bytes do not compress, sizes are predictable
+
+        l_cache.get(l_urls[0])  # Most recently used now
+        l_cache.max_bytes = l_cache.size() - 100  # Below the size of the entries, metadata lines vary by a few bytes
+        l_cache.put(l_urls[0], l_cache.get(l_urls[0]).content)
+
+        assert l_cache.get(l_urls[1]) is None, 'Least recently used entry was not evicted'
+        assert l_cache.get(l_urls[0]) is not None and l_cache.get(l_urls[2]) is not None, 'Wrong entry was evicted'
+
+    def test_entry_is_one_file_and_touch_keeps_the_body(self):
+
+        l_url = 'https://www.imdb.com/title/tt0000001/'
+        l_cache = imdb_cache.ResponseCache(p_cache_dir=self.temp_dir.name)
+        l_cache.put(l_url, b'cached page', p_etag='"v1"', p_truncated=True)
+        l_stored_at = l_cache.get(l_url).stored_at
+
+        l_files = [os.path.join(l_root, x) for l_root, _, l_names in os.walk(self.temp_dir.name) for x in l_names]
+        self.assertEqual(1, len(l_files))  # Metadata and body are written together
+        self.assertEqual(os.path.getsize(l_files[0]), l_cache.size())
+
+        with mock.patch.object(imdb_cache.gzip, 'decompress') as l_decompress, \
+                mock.patch.object(imdb_cache.gzip, 'compress') as l_compress:
+            l_cache.touch(l_url)
+        l_decompress.assert_not_called()
+        l_compress.assert_not_called()
+
+        l_entry = l_cache.get(l_url)
+        self.assertEqual((b'cached page', '"v1"', True), (l_entry.content, l_entry.etag, l_entry.truncated))
+        self.assertGreaterEqual(l_entry.stored_at, l_stored_at)
+        self.assertEqual(os.path.getsize(l_files[0]), l_cache.size())
+
+        # A reopened cache counts the same size, files of the previous two file layout are dropped
+        with open(os.path.join(self.temp_dir.name, 'old.gz'), 'wb') as l_file:
+            l_file.write(b'old body')
+        self.assertEqual(l_cache.size(), imdb_cache.ResponseCache(p_cache_dir=self.temp_dir.name).size())
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, 'old.gz')))
+
+    def test_client_revalidates_stale_entry(self):
+
+        l_url = 'https://www.imdb.com/title/tt0000001/'
+        l_cache = imdb_cache.ResponseCache(p_cache_dir=self.temp_dir.name, p_ttl_seconds=0)
+        l_cache.put(l_url, b'cached page', p_etag='"v1"')
+
+        l_not_modified = requests.Response()
+        l_not_modified.status_code = 304
+        l_not_modified._content = b''
+        l_client = imdb_http_client.HttpClient(p_requests_per_second=0, p_cache=l_cache)
+
+        with mock.patch.object(l_client.session, 'get', return_value=l_not_modified) as l_get:
+            l_response = l_client.get(l_url)
+
+        assert l_get.call_args.kwargs['headers'] == {'If-None-Match': '"v1"'}, 'Request was not conditional'
+        assert l_response.content == b'cached page' and l_response.from_cache, 'Cached body was not served on 304'
+        assert l_client.stats.summary()['cache_revalidated'] == 1, 'Revalidation was not counted'
+
+        # A 304 without a cached body is an error, not an empty page
+        l_uncached = imdb_http_client.HttpClient(p_requests_per_second=0)
+        with mock.patch.object(l_uncached.session, 'get', return_value=l_not_modified), \
+                self.assertRaises(requests.HTTPError):
+            l_uncached.get(l_url)
+
+    def test_truncated_body_only_serves_early_stopping_reads(self):
+
+        with StandInServer(p_titles=1) as l_server:
+            l_url = l_server.title_urls()[0]
+            l_cache = imdb_cache.ResponseCache(p_cache_dir=self.temp_dir.name)
+            l_client = imdb_http_client.HttpClient(p_requests_per_second=0, p_cache=l_cache)
+
+            l_partial = l_client.get(l_url, p_complete_factory=imdb_parser.SectionScanner)
+            assert l_cache.get(l_url).truncated, 'Cut short body was cached as complete'
+
+            l_hit = l_client.get(l_url, p_complete_factory=imdb_parser.SectionScanner)
+            l_full = l_client.get(l_url)  # Needs the whole body, downloaded again
+            l_client.close()
+
+        assert l_hit.from_cache and l_hit.content == l_partial.content, 'Early stopping read missed the cache'
+        assert not l_full.from_cache and len(l_full.content) > len(l_partial.content), 'Partial body served as full'
+        assert not l_cache.get(l_url).truncated and l_server.counters['requests'] == 2, 'Full body was not cached'
+
+        with self.assertRaises(imdb_http_client.CacheMissError):  # Offline, a cut short body is no full page
+            l_cache.put(l_url, l_partial.content, p_truncated=True)
+            imdb_http_client.HttpClient(p_cache=l_cache, p_offline=True).get(l_url)
+
+    def test_offline_replay_of_captured_pages(self):
+
+        l_cache = imdb_cache.ResponseCache(p_cache_dir=self.temp_dir.name)
+        l_urls = []
+
+        for movie_data in test_data.test_data['movie_byte_files']:
+            with open(movie_data['file_name'], "rb") as binary_file:
+                l_url = f'https://www.imdb.com/{movie_data["file_name"]}'
+                l_cache.put(l_url, binary_file.read())
+                l_urls.append(l_url)
+
+        l_client = imdb_http_client.HttpClient(p_cache=l_cache, p_offline=True)
+
+        with mock.patch.object(l_client.session, 'get', side_effect=AssertionError('Network used offline')):
+            l_pages = imdb_fetcher.fetch_pages(p_url_list=l_urls, p_client=l_client)
+
+            with self.assertRaises(imdb_http_client.CacheMissError):
+                l_client.get('https://www.imdb.com/title/tt9999999/')
+
+        for l_page, movie_data in zip(l_pages, test_data.test_data['movie_byte_files']):
+            assert imdb_scraper.extract_imdb_data(p_content=l_page)[0] == movie_data['title'], \
+                f'Replayed page does not match captured page: {movie_data["file_name"]}'
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,3 +1,101 @@
 log_format = '%(levelname)s\t%(asctime)s\t%(funcName)s\t%(message)s'
 top_250_url = "https://www.imdb.com/list/ls068082370/"
-movie_link_pattern = 'title/tt'
\ No newline at end of file
+movie_link_pattern = 'title/tt'
+
+# List sources: name -> URL of the first list page, kept positions [ first, last ] ( last None: to the end of the list )
+# and maximum number of list pages followed ( ?page=2, ... )
+list_sources = {
+    'top_250': {'url': top_250_url, 'positions': [1, 20], 'max_pages': 1},
+    'top_250_full': {'url': top_250_url, 'positions': [1, None], 'max_pages': 3},
+}
+list_source = 'top_250'  # Source scraped when none is given
+
+# Fetch stage settings
+max_workers = 8  # Number of movie pages downloaded in parallel
+max_requests_per_second = 10  # Upper limit of requests started per second, 0 means no limit
+min_requests_per_second = 0.5  # Rate the scheduler slows down to at most on repeated 429 responses
+rate_limit_burst = 2  # Requests that can start at once after an idle period ( size of the token bucket )
+rate_decrease_factor = 0.5  # The rate is multiplied by this on a 429 response
+rate_increase_step = 0.1  # Requests per second added after every successful response, up to the upper limit
+
+# HTTP client settings
+max_retries = 3  # Number of retries for a single request before giving up
+retry_wait_seconds = 1  # Base of the exponential backoff between retries
+max_retry_after_seconds = 120  # Longest Retry-After waited for, a request asked to wait longer fails
+retry_status_codes = (429, 500, 502, 503, 504)  # Status codes that are retried with backoff
+request_timeout_seconds = 30  # Timeout for a single request
+connection_pool_size = 16  # Number of keep-alive connections kept open per host
+max_connections_per_host = 8  # Number of requests running in parallel against a single host
+max_body_bytes = 8 * 1024 * 1024  # Responses larger than this ( decoded ) are not read, the request fails
+stream_chunk_bytes = 64 * 1024  # Responses are read in chunks of this size
+http_headers = {'Accept-Encoding': 'gzip, deflate',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Connection': 'keep-alive'}
+
+# Response cache settings
+cache_enabled = False  # Keep downloaded pages in the on-disk response cache, also enabled by --cache_dir / --offline
+cache_dir = '.imdb_cache'  # Directory of the response cache
+cache_ttl_seconds = 6 * 60 * 60  # Age after which cached pages are revalidated with a conditional request
+cache_max_bytes = 512 * 1024 * 1024  # Maximum size of the cached pages on disk ( compressed, with their metadata )
+
+# Parser settings
+parser_backend = 'fast'  # Movie page parser: 'fast' ( raw byte scan ), 'strainer' ( restricted tree ) or 'soup' ( full tree )
+stop_after_sections = True  # Stop reading a movie page once its application JSON and awards item have been read
+
+# Parse stage settings
+parse_workers = 0  # Number of parser processes, 0 means one per CPU core
+parse_queue_size = 32  # Maximum number of downloaded pages waiting for the parser
+parse_in_process = False  # Parse in the main process instead of the process pool ( debugging )
+
+# Incremental refresh settings
+snapshot_file = 'imdb_{source}_snapshot.csv'  # Raw records of the last run of a list source, reused by incremental runs
+freshness_hours = 24  # Records older than this are scraped again in incremental runs
+
+# Rating adjustment rule sets, compiled and evaluated by imdb_rules
+# top_n:        number of best rated movies the vote benchmark ( maximum votes ) is taken from
+# vote_penalty: 'step' - points for every full step of votes below the benchmark
+#               'log'  - points for every tenfold of votes below the benchmark
+#               'none' - no penalty
+#               type, step and points default to 'step', 100000 and 0 ( imdb_rules.DEFAULT_VOTE_PENALTY ),
+#               so a rule set without vote_penalty has no penalty
+# awards:       adjustment tiers per award column, values[i] applies from bounds[i - 1] awards
+# decimals:     rounding of the adjusted rating
+adjustment_rule_sets = {
+    'default': {'top_n': 20,
+                'vote_penalty': {'type': 'step', 'step': 100000, 'points': -0.1},
+                'awards': [{'column': 'oscars', 'bounds': [1, 3, 6, 11], 'values': [0, 0.3, 0.5, 1, 1.5]}],
+                'decimals': 1},
+    'log_votes': {'top_n': 20,
+                  'vote_penalty': {'type': 'log', 'points': -0.5},
+                  'awards': [{'column': 'oscars', 'bounds': [1, 3, 6, 11], 'values': [0, 0.3, 0.5, 1, 1.5]}],
+                  'decimals': 1},
+}
+adjustment_rule_set = 'default'  # Rule set used by adjust_dataframe
+
+# Output
+output_format = 'csv'  # csv, parquet, feather ( parquet and feather need pyarrow ) or ndjson
+dataset_dir = None  # Every run is also appended to this partitioned dataset when set
+
+# History store
+store_file = 'imdb_top_250_history.db'  # SQLite database every run is stored into
+store_busy_timeout_seconds = 30  # Time a run waits for the write lock of another process on the store
+
+# Instrumentation
+report_file = None  # JSON run report with stage and per-title timings, written when set
+profiler = 'cprofile'  # Profiler of --profile: cprofile or pyinstrument ( needs pyinstrument )
+log_excerpt_chars = 300  # Pages, soups and JSON in log and error messages are cut to this many characters
+
+# Checkpointed runs
+checkpoint_dir = '.imdb_checkpoint'  # Journal of completed records and dead-letter file of failed titles
+max_failed_titles = 0  # Number of failed titles a checkpointed run tolerates ...
+max_failed_ratio = 0.05  # ... or this share of the titles, whichever is larger
+
+# Service mode ( imdb-top-250 serve )
+service_host = '127.0.0.1'  # Interface of the result endpoint, local only by default
+service_port = 8080  # Port of the result endpoint
+service_refresh_minutes = 60  # Time between two refreshes of the served result
+service_retry_minutes = 5  # Time before a failed refresh is retried, the previous result is served meanwhile
+
+# Batch runs ( imdb-top-250 batch )
+batch_workers = 0  # Number of processes adjusting and writing the jobs of a manifest, 0 means one per CPU core
+batch_output_dir = 'imdb_batch'  # Directory of the result files when the manifest does not name one
@@ -0,0 +1,117 @@
+import re
+import html
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+import logging
+
+# Awards summary of a movie page: the anchor of the awards item ( 'Won 11 Oscars', 'Nominated for 2 Oscars' or
+# 'Awards' ) followed by the totals ( '209 wins & 124 nominations total' ), matched once per page
+AWARDS_ITEM_PATTERN = re.compile(rb'<a[^>]*\shref="[^"]*/awards/[^"]*"[^>]*>(.*?)</a>\s*'
+                                 rb'<div class="ipc-metadata-list-item__content-container">(.*?)</div>', re.DOTALL)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# 'Won 1 Oscar', 'Won 11 Oscars', 'Nominated for 2 Oscars'
+_OSCARS_PATTERN = re.compile(r'\b(Won|Nominated for)\s+(\d+)\s+Oscars?\b')
+
+# '209 wins & 124 nominations total', '2 wins', '1 nomination total'
+_TOTALS_PATTERN = re.compile(r'(?:(\d+)\s+wins?)?\s*&?\s*(?:(\d+)\s+nominations?)?(?:\s+total)?')
+
+# Columns of the batch API, in order
+AWARD_COLUMNS = ['oscars', 'oscar_nominations', 'wins', 'nominations']
+
+
+class AwardCounts(NamedTuple):
+    """
+    Awards of a movie as summarized on its page.
+    """
+    oscars: int = 0  # Oscars won
+    oscar_nominations: int = 0  # Oscar nominations without a win, only shown when no Oscar was won
+    wins: int = 0  # Wins of every award, the Oscars included
+    nominations: int = 0  # Nominations without a win, of every award
+
+    @property
+    def other_wins(self) -> int:
+        """
+        :return: int
+            Wins of awards other than the Oscars
+        """
+        return self.wins - self.oscars
+
+
+def _text(p_markup: bytes) -> str:
+    return html.unescape(_TAG_PATTERN.sub(' ', p_markup.decode('utf-8', errors='replace'))).strip()
+
+
+def awards_from_labels(p_labels: list, p_totals: str = None, p_log_level: str = 'INFO') -> AwardCounts:
+    """
+    Reads the award counts from the texts of the metadata list items, stops at the first Oscars label.
+    :param p_labels: list
+        Texts of the metadata list items of the movie page.
+    :param p_totals: str
+        Totals text of the awards item, e.g. '209 wins & 124 nominations total'.
+    :param p_log_level: str
+        Log level to logging
+    :return: AwardCounts
+        Award counts, zero where the page has no data
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_oscars = l_oscar_nominations = 0
+    for l_label in p_labels:
+        l_match = _OSCARS_PATTERN.search(l_label)
+        if l_match:
+            if l_match.group(1) == 'Won':
+                l_oscars = int(l_match.group(2))
+            else:
+                l_oscar_nominations = int(l_match.group(2))
+
+            logger.debug('Found Oscars in: %s', l_label)
+            break  # A page has a single awards summary
+
+    l_wins = l_nominations = 0
+    if p_totals:
+        l_match = _TOTALS_PATTERN.match(p_totals.strip())
+        l_wins = int(l_match.group(1) or 0)
+        l_nominations = int(l_match.group(2) or 0)
+
+    return AwardCounts(oscars=l_oscars, oscar_nominations=l_oscar_nominations, wins=l_wins, nominations=l_nominations)
+
+
+def parse_awards(p_content: bytes, p_log_level: str = 'INFO') -> AwardCounts:
+    """
+    Scans the raw page for the awards item without building a tree.
+    :param p_content: bytes
+        Content of the movie page.
+    :param p_log_level: str
+        Log level to logging
+    :return: AwardCounts
+        Award counts, zero when the page has no awards item
+    """
+    l_match = AWARDS_ITEM_PATTERN.search(p_content)
+
+    if l_match is None:
+        return AwardCounts()
+
+    return awards_from_labels(p_labels=[_text(l_match.group(1))], p_totals=_text(l_match.group(2)),
+                              p_log_level=p_log_level)
+
+
+def parse_awards_batch(p_contents: list, p_log_level: str = 'INFO') -> pd.DataFrame:
+    """
+    Award counts of many pages at once, as columns ready for the award rules of imdb_rules
+    ( e.g. {'column': 'wins', ...} ).
+    :param p_contents: list
+        Contents of the movie pages.
+    :param p_log_level: str
+        Log level to logging
+    :return: pandas.DataFrame
+        One int64 row per page with AWARD_COLUMNS, in the order of p_contents
+    """
+    l_counts = np.array([parse_awards(p_content=x, p_log_level=p_log_level) for x in p_contents],
+                        dtype=np.int64).reshape(-1, len(AWARD_COLUMNS))
+
+    return pd.DataFrame(l_counts, columns=AWARD_COLUMNS)
@@ -0,0 +1,476 @@
+"""
+Batch runner: rebuilds the adjusted rankings of many lists and stored snapshots in one go, e.g. after a rule change.
+
+A manifest ( JSON ) names the jobs and the rule sets to apply:
+
+{
+    "output_dir": "backfill",
+    "output_format": "csv",
+    "rule_sets": ["default"],
+    "jobs": [
+        {"list": "top_250_full"},
+        {"file": "imdb_top_250_snapshot.csv", "rule_sets": ["default", "log_votes"]},
+        {"store_run": "all", "store": "imdb_top_250_history.db"}
+    ]
+}
+
+list       list source of config.list_sources, scraped
+file       raw movie data written by "imdb-top-250 scrape" or the snapshot of an incremental run
+store_run  run ID, list of run IDs or "all" of a history store ( store, config.store_file when not given )
+
+Optional top level keys: "store_file" ( history store the results are added to, not stored when empty, default ),
+"dataset_dir", "overwrite". Every list is scraped in a single pass through one HTTP client ( and response cache,
+when enabled ), titles shared by lists are fetched once. The jobs are then adjusted and written on a process pool,
+one job per task, every rule set of a job to <output_dir>/<job>_<rule set>.<extension>. The history store is written
+by the calling process alone, job after job, once the pool finished. A failed job, or a failed scrape of the lists
+for the list jobs, is reported and the others go on.
+"""
+import os
+import json
+import time
+from datetime import datetime
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import logging
+import config as c
+import imdb_metrics
+import imdb_records
+import imdb_rules
+import imdb_store
+import imdb_writers
+
+JOB_KINDS = ('list', 'file', 'store_run')
+
+
+class BatchJob(NamedTuple):
+    """
+    A list or a snapshot to adjust with one or more rule sets.
+    """
+    name: str  # Name of the job, prefix of its result files
+    kind: str  # One of JOB_KINDS
+    source: str  # List source name, raw data file or history store file
+    source_url: str  # Origin of the data, stored with the adjusted runs
+    run_id: int = None  # Stored run of a store_run job
+    rule_sets: tuple = (c.adjustment_rule_set,)
+
+
+def read_movie_data(p_file: str, p_log_level: str = 'INFO') -> pd.DataFrame:
+    """
+    Reads raw movie data for adjustment: a file written by "imdb-top-250 scrape" or an incremental snapshot.
+    :param p_file: str
+        File name / path, the format follows the extension.
+    :param p_log_level: str
+        Log level to logging
+    :return: pandas.DataFrame
+        "title_id" and imdb_records.MOVIE_COLUMNS in list order
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    df = imdb_writers.read_dataframe(p_file=p_file)
+
+    # Snapshots of incremental runs have the movie URLs, scrape results the title IDs
+    if 'title_id' not in df.columns:
+        if 'url' not in df.columns:
+            l_exc_msg = f'Neither "title_id" nor "url" column found in: {p_file}'
+            logger.error(l_exc_msg)
+            raise ValueError(l_exc_msg)
+
+        df['title_id'] = df['url'].map(imdb_records.title_id_from_url)
+
+    if 'position' in df.columns:
+        df = df.sort_values('position', kind='stable')
+
+    return df[['title_id'] + imdb_records.MOVIE_COLUMNS].reset_index(drop=True)
+
+
+def read_stored_run(p_store_file: str, p_run_id: int, p_log_level: str = 'INFO') -> pd.DataFrame:
+    """
+    Reads the raw movie data of a stored run, for adjustment with other rules.
+    :param p_store_file: str
+        SQLite history store.
+    :param p_run_id: int
+        ID of the run.
+    :param p_log_level: str
+        Log level to logging
+    :return: pandas.DataFrame
+        "title_id" and imdb_records.MOVIE_COLUMNS in rank order
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_store = imdb_store.SnapshotStore(p_db_file=p_store_file, p_log_level=p_log_level)
+    try:
+        df = l_store.records_at(p_run_id=p_run_id)
+    finally:
+        l_store.close()
+
+    if df.empty:
+        l_exc_msg = f'Run {p_run_id} not found in history store: {p_store_file}'
+        logger.error(l_exc_msg)
+        raise ValueError(l_exc_msg)
+
+    return df[['title_id'] + imdb_records.MOVIE_COLUMNS]
+
+
+def load_manifest(p_file: str) -> dict:
+    """
+    :param p_file: str
+        Manifest file name / path ( JSON ).
+    :return: dict
+        Content of the manifest
+    """
+    with open(p_file, encoding='utf-8') as l_file:
+        return json.load(l_file)
+
+
+def manifest_jobs(p_manifest: dict, p_log_level: str = 'INFO') -> list:
+    """
+    Expands and validates the jobs of a manifest before anything runs.
+    :param p_manifest: dict
+        Content of the manifest, see the module documentation.
+    :param p_log_level: str
+        Log level to logging
+    :return: list
+        BatchJob objects in manifest order
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    def fail(p_msg: str):
+        logger.error(p_msg)
+        raise ValueError(p_msg)
+
+    l_default_rule_sets = p_manifest.get('rule_sets', [c.adjustment_rule_set])
+
+    l_jobs = []
+    for l_spec in p_manifest.get('jobs', []):
+        l_kinds = [x for x in JOB_KINDS if x in l_spec]
+        if len(l_kinds) != 1:
+            fail(f'A job needs exactly one of {list(JOB_KINDS)}: {l_spec}')
+
+        l_rule_sets = tuple(l_spec.get('rule_sets', l_default_rule_sets))
+        for l_rule_set in l_rule_sets:
+            imdb_rules.get_rule_set(l_rule_set)  # Unknown rule sets fail here, not in a worker
+
+        if l_kinds[0] == 'list':
+            if l_spec['list'] not in c.list_sources:
+                fail(f'Unknown list source: "{l_spec["list"]}", available: {list(c.list_sources)}')
+            l_jobs.append(BatchJob(name=l_spec.get('name', l_spec['list']), kind='list', source=l_spec['list'],
+                                   source_url=c.list_sources[l_spec['list']]['url'], rule_sets=l_rule_sets))
+
+        elif l_kinds[0] == 'file':
+            if not os.path.exists(l_spec['file']):
+                fail(f'Raw data file not found: {l_spec["file"]}')
+            l_jobs.append(BatchJob(name=l_spec.get('name', os.path.splitext(os.path.basename(l_spec['file']))[0]),
+                                   kind='file', source=l_spec['file'], source_url=l_spec['file'],
+                                   rule_sets=l_rule_sets))
+
+        else:
+            l_store_file = l_spec.get('store', c.store_file)
+            if not os.path.exists(l_store_file):
+                fail(f'History store not found: {l_store_file}')
+
+            l_run_ids = l_spec['store_run']
+            if l_run_ids == 'all':
+                l_store = imdb_store.SnapshotStore(p_db_file=l_store_file, p_log_level=p_log_level)
+                try:
+                    l_run_ids = l_store.runs()['run_id'].tolist()
+                finally:
+                    l_store.close()
+            elif not isinstance(l_run_ids, list):
+                l_run_ids = [l_run_ids]
+
+            l_prefix = l_spec.get('name', 'run')
+            l_jobs.extend(BatchJob(name=f'{l_prefix}_{x}', kind='store_run', source=l_store_file,
+                                   source_url=f'{l_store_file}#run={x}', run_id=int(x), rule_sets=l_rule_sets)
+                          for x in l_run_ids)
+
+    l_names = [x.name for x in l_jobs]
+    l_duplicates = sorted({x for x in l_names if l_names.count(x) > 1})
+    if l_duplicates:
+        fail(f'Job names must be unique, their result files would collide: {l_duplicates}')
+
+    return l_jobs
+
+
+def run_job(p_job: BatchJob,
+            p_df: pd.DataFrame = None,
+            p_output_dir: str = '.',
+            p_output_format: str = c.output_format,
+            p_dataset_dir: str = None,
+            p_overwrite: bool = False,
+            p_log_level: str = 'INFO') -> dict:
+    """
+    Adjusts and writes a job with each of its rule sets, runs in a worker process.
+    The adjusted runs are returned for the history store, which only the parent process writes ( see store_runs ).
+    :param p_job: BatchJob
+        The job.
+    :param p_df: pandas.DataFrame
+        Scraped data of a list job, the snapshot is read here for the other jobs.
+    :param p_output_dir: str
+        Directory of the result files.
+    :param p_output_format: str
+        Format of the result files, key of imdb_writers.WRITERS.
+    :param p_dataset_dir: str
+        Also append the results to the dataset partitioned by run timestamp in this directory,
+        one part file per job and rule set ( part-<job>-<rule set> ), with "job" and "rule_set" columns.
+    :param p_overwrite: bool
+        Replace existing result files.
+    :param p_log_level: str
+        Log level to logging
+    :return: dict
+        Report of the job: result file and seconds per rule set, stage timings, error,
+        "runs": ( rule set, adjusted DataFrame, run time ) of every written result
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    import imdb_top_250_adjustment
+
+    l_metrics = imdb_metrics.start_run()  # Stage timings of this job, a worker runs one job at a time
+    l_start = time.perf_counter()
+
+    l_report = {'job': p_job.name, 'kind': p_job.kind, 'source': p_job.source_url, 'titles': None,
+                'outputs': {}, 'error': None, 'runs': []}
+    try:
+        with imdb_metrics.timed('load'):
+            if p_df is not None:
+                df = p_df
+            elif p_job.kind == 'list':
+                raise ValueError(f'List "{p_job.source}" has no scraped data')
+            elif p_job.kind == 'file':
+                df = read_movie_data(p_file=p_job.source, p_log_level=p_log_level)
+            else:
+                df = read_stored_run(p_store_file=p_job.source, p_run_id=p_job.run_id, p_log_level=p_log_level)
+
+        l_report['titles'] = len(df)
+
+        # Every rule set of the job is evaluated in one pass, sharing the common calculations
+        l_rule_sets = [imdb_rules.get_rule_set(x) for x in p_job.rule_sets]
+        with imdb_metrics.timed('adjust'):
+            l_ratings = imdb_rules.evaluate_rule_sets(p_df=df, p_rule_sets=l_rule_sets, p_log_level=p_log_level)
+
+        for l_rule_set in l_rule_sets:
+            l_rule_start = time.perf_counter()
+            with imdb_metrics.timed('adjust'):
+                l_adjusted = imdb_top_250_adjustment.rank_adjusted(p_df=df,
+                                                                   p_adjusted_rating=l_ratings[l_rule_set.name].to_numpy(),
+                                                                   p_decimals=l_rule_set.decimals)
+
+            l_run_time = datetime.now()
+            l_file = imdb_top_250_adjustment.write_adjusted(
+                p_df=l_adjusted,
+                p_run_time=l_run_time,
+                p_output_format=p_output_format,
+                p_output_file=os.path.join(p_output_dir, f'{p_job.name}_{l_rule_set.name}.'
+                                                         f'{imdb_writers.file_extension(p_output_format)}'),
+                p_dataset_dir=p_dataset_dir,
+                p_overwrite=p_overwrite,
+                p_partition={'job': p_job.name, 'rule_set': l_rule_set.name},
+                p_log_level=p_log_level)
+            l_report['outputs'][l_rule_set.name] = {'file': l_file, 'seconds': round(time.perf_counter() - l_rule_start, 4)}
+            l_report['runs'].append((l_rule_set.name, l_adjusted, l_run_time))
+    except Exception as e:
+        l_report['error'] = f'{type(e).__name__}: {e}'
+        logger.error(f'Job "{p_job.name}" failed: {l_report["error"]}')
+
+    l_report['stages'] = l_metrics.report()['stages']
+    l_report['elapsed'] = round(time.perf_counter() - l_start, 4)
+    l_report['worker'] = os.getpid()
+
+    return l_report
+
+
+def store_runs(p_job_reports: list, p_store_file: str, p_log_level: str = 'INFO'):
+    """
+    Adds the adjusted runs of the jobs to the history store one after the other, in the parent process, so the
+    workers never write the store at the same time. A failed store fails its job, the others are still stored.
+    :param p_job_reports: list
+        Reports of run_job in manifest order, their "runs" are removed.
+    :param p_store_file: str
+        SQLite history store the results are added to, not stored when empty.
+    :param p_log_level: str
+        Log level to logging
+    :return: None
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    import imdb_top_250_adjustment
+
+    for l_job_report in p_job_reports:
+        l_runs = l_job_report.pop('runs', [])
+        if not p_store_file or not l_runs:
+            continue
+
+        l_metrics = imdb_metrics.start_run()
+        try:
+            for l_rule_set, l_adjusted, l_run_time in l_runs:
+                imdb_top_250_adjustment.store_run(p_df=l_adjusted, p_store_file=p_store_file, p_run_time=l_run_time,
+                                                  p_rule_set=l_rule_set, p_source_url=l_job_report['source'],
+                                                  p_log_level=p_log_level)
+        except Exception as e:
+            l_error = f'{type(e).__name__}: {e}'
+            l_job_report['error'] = l_job_report['error'] or l_error
+            logger.error(f'Storing the runs of job "{l_job_report["job"]}" failed: {l_error}')
+
+        l_job_report['stages'].update(l_metrics.report()['stages'])
+
+
+def scrape_lists(p_jobs: list,
+                 p_client=None,
+                 p_log_level: str = 'INFO',
+                 **kwargs) -> dict:
+    """
+    Scrapes the lists of the list jobs in a single pass, titles shared by the lists are fetched once.
+    :param p_jobs: list
+        BatchJob objects, only the list jobs are scraped.
+    :param p_client: imdb_http_client.HttpClient
+        Client of every fetch.
+    :param p_log_level: str
+        Log level to logging
+    :param kwargs:
+        Further keyword arguments of imdb_scraper.extract_imdb_lists_data ( p_max_workers, p_parser, ... )
+    :return: dict
+        List source name -> "title_id" and imdb_records.MOVIE_COLUMNS in list order
+    """
+    l_sources = list(dict.fromkeys(x.source for x in p_jobs if x.kind == 'list'))
+
+    if not l_sources:
+        return {}
+
+    import imdb_scraper  # Pulls in requests, only needed when lists are scraped
+
+    df = imdb_scraper.extract_imdb_lists_data(p_sources=l_sources, p_client=p_client, p_log_level=p_log_level,
+                                              **kwargs)
+
+    return {l_source: l_df[['title_id'] + imdb_records.MOVIE_COLUMNS].reset_index(drop=True)
+            for l_source, l_df in df.groupby('list', sort=False, observed=True)}
+
+
+def run_batch(p_manifest: dict,
+              p_batch_workers: int = c.batch_workers,
+              p_in_process: bool = False,
+              p_cache_dir: str = None,
+              p_offline: bool = False,
+              p_report_file: str = None,
+              p_log_level: str = 'INFO',
+              **kwargs) -> dict:
+    """
+    Runs every job of a manifest: scrapes the lists, then adjusts and writes the jobs on a process pool.
+    :param p_manifest: dict
+        Content of the manifest, see the module documentation.
+    :param p_batch_workers: int
+        Number of worker processes, 0 means one per CPU core.
+    :param p_in_process: bool
+        Run the jobs in the calling process instead of the process pool ( debugging ), parsing too.
+    :param p_cache_dir: str
+        Directory of the response cache, see imdb_http_client.create_client.
+    :param p_offline: bool
+        Scrape the lists from the response cache without network access.
+    :param p_report_file: str
+        Write the batch report to this JSON file.
+    :param p_log_level: str
+        Log level to logging
+    :param kwargs:
+        Further keyword arguments of imdb_scraper.extract_imdb_lists_data ( p_max_workers, p_parser, ... )
+    :return: dict
+        Batch report: scrape timings and network usage, one report per job in manifest order, failed jobs
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_started = datetime.now()
+    l_start = time.perf_counter()
+
+    l_jobs = manifest_jobs(p_manifest=p_manifest, p_log_level=p_log_level)
+
+    l_job_args = {'p_output_dir': p_manifest.get('output_dir', c.batch_output_dir),
+                  'p_output_format': p_manifest.get('output_format', c.output_format),
+                  'p_dataset_dir': p_manifest.get('dataset_dir'),
+                  'p_overwrite': p_manifest.get('overwrite', False),
+                  'p_log_level': p_log_level}
+
+    l_store_file = p_manifest.get('store_file')  # Written by this process only, after the jobs
+    l_report = {'started': l_started.isoformat(timespec='seconds'), 'jobs': []}
+
+    # One client and response cache for every list of the batch, a failed scrape only fails the list jobs
+    l_list_data = {}
+    l_results = {}
+    if any(x.kind == 'list' for x in l_jobs):
+        import imdb_http_client
+
+        l_client = imdb_http_client.create_client(p_cache_dir=p_cache_dir, p_offline=p_offline,
+                                                  p_log_level=p_log_level)
+        l_scrape_start = time.perf_counter()
+        l_scrape_error = None
+        try:
+            l_list_data = scrape_lists(p_jobs=l_jobs, p_client=l_client, p_log_level=p_log_level,
+                                       p_in_process=p_in_process, **kwargs)
+        except Exception as e:
+            l_scrape_error = f'{type(e).__name__}: {e}'
+            logger.error(f'Scraping the lists failed: {l_scrape_error}')
+        finally:
+            l_client.close()
+
+        l_report['scrape'] = {'lists': len(l_list_data),
+                              'titles': len(set().union(*[set(x['title_id']) for x in l_list_data.values()])),
+                              'seconds': round(time.perf_counter() - l_scrape_start, 4),
+                              'network': l_client.stats.summary(),
+                              'error': l_scrape_error}
+
+        if l_scrape_error:
+            for l_job in l_jobs:
+                if l_job.kind == 'list':
+                    l_results[l_job.name] = {'job': l_job.name, 'kind': l_job.kind, 'source': l_job.source_url,
+                                             'titles': None, 'outputs': {}, 'stages': {}, 'elapsed': 0.0,
+                                             'worker': os.getpid(), 'error': f'Scraping the lists failed: {l_scrape_error}'}
+
+    l_pending = [x for x in l_jobs if x.name not in l_results]
+
+    logger.info(f'Running {len(l_pending)} jobs '
+                f'{"in process" if p_in_process else f"on {p_batch_workers or os.cpu_count()} processes"}')
+
+    if p_in_process:
+        for l_job in l_pending:
+            l_results[l_job.name] = run_job(p_job=l_job, p_df=l_list_data.get(l_job.source) if l_job.kind == 'list'
+                                            else None, **l_job_args)
+    else:
+        import imdb_pipeline
+
+        with ProcessPoolExecutor(max_workers=p_batch_workers or os.cpu_count() or 1,
+                                 mp_context=imdb_pipeline._process_context()) as l_pool:
+            l_futures = {l_pool.submit(run_job, l_job, l_list_data.get(l_job.source) if l_job.kind == 'list' else None,
+                                       **l_job_args): l_job for l_job in l_pending}
+
+            for l_future in as_completed(l_futures):
+                l_job_report = l_future.result()
+                l_results[l_job_report['job']] = l_job_report
+                logger.info(f'Job "{l_job_report["job"]}" {"failed" if l_job_report["error"] else "finished"} '
+                            f'in {l_job_report["elapsed"]:.2f} s')
+
+    l_report['jobs'] = [l_results[x.name] for x in l_jobs]
+    store_runs(p_job_reports=l_report['jobs'], p_store_file=l_store_file, p_log_level=p_log_level)
+    l_report['failed'] = [x['job'] for x in l_report['jobs'] if x['error']]
+    l_report['elapsed'] = round(time.perf_counter() - l_start, 4)
+
+    logger.info(f'Finished {len(l_jobs)} jobs in {l_report["elapsed"]:.2f} s, {len(l_report["failed"])} failed')
+
+    if p_report_file:
+        imdb_metrics.write_report(p_report=l_report, p_file=p_report_file, p_log_level=p_log_level)
+
+    return l_report
@@ -0,0 +1,233 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from typing import NamedTuple
+import logging
+import config as c
+
+
+class CacheEntry(NamedTuple):
+    """
+    Cached response of a URL.
+    """
+    url: str
+    content: bytes
+    etag: str
+    last_modified: str
+    stored_at: float  # Epoch seconds of the last download or revalidation
+    truncated: bool = False  # Download stopped after the sections the parsers need, not the whole body
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of HTTP response bodies.
+    Entries are addressed by the SHA-256 hash of the URL and stored in a single file each, written atomically:
+    a JSON metadata line holding the validators (ETag, Last-Modified) used for conditional revalidation,
+    followed by the gzip compressed body. The cache is bounded in size, least recently used entries are evicted first.
+    """
+
+    def __init__(self,
+                 p_cache_dir: str = c.cache_dir,
+                 p_ttl_seconds: float = c.cache_ttl_seconds,
+                 p_max_bytes: int = c.cache_max_bytes,
+                 p_log_level: str = 'INFO'):
+        """
+        :param p_cache_dir: str
+            Directory of the cache, created when missing.
+        :param p_ttl_seconds: float
+            Age after which an entry has to be revalidated.
+        :param p_max_bytes: int
+            Maximum size of the entry files on disk.
+        :param p_log_level: str
+            Log level to logging
+        """
+        self.cache_dir = p_cache_dir
+        self.ttl_seconds = p_ttl_seconds
+        self.max_bytes = p_max_bytes
+        self.log_level = p_log_level
+
+        self._lock = threading.Lock()
+        self._index = {}  # key -> [last access time, file size]
+        self._size = 0  # Sum of the file sizes in the index
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(p_url: str) -> str:
+        """
+        :param p_url: str
+            URL of the entry.
+        :return: str
+            Cache key of the URL
+        """
+        return hashlib.sha256(p_url.encode('utf-8')).hexdigest()
+
+    def _path(self, p_key: str) -> str:
+        return os.path.join(self.cache_dir, p_key[:2], f'{p_key}.entry')
+
+    def _load_index(self):
+        for l_root, _, l_files in os.walk(self.cache_dir):
+            for l_file in l_files:
+                if l_file.endswith('.entry'):
+                    l_stat = os.stat(os.path.join(l_root, l_file))
+                    self._index[l_file[:-6]] = [l_stat.st_mtime, l_stat.st_size]
+                    self._size += l_stat.st_size
+                elif l_file.endswith(('.gz', '.json')):  # Body and metadata files of the previous layout
+                    try:
+                        os.remove(os.path.join(l_root, l_file))
+                    except OSError:
+                        pass
+
+    @staticmethod
+    def _write_atomic(p_path: str, p_data: bytes):
+        l_tmp = f'{p_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(l_tmp, 'wb') as l_file:
+            l_file.write(p_data)
+        os.replace(l_tmp, p_path)
+
+    @staticmethod
+    def _read(p_path: str) -> tuple:
+        """
+        :return: tuple
+            Metadata and the compressed body of an entry file
+        """
+        with open(p_path, 'rb') as l_file:
+            l_meta, l_body = l_file.read().split(b'\n', 1)
+        return json.loads(l_meta), l_body
+
+    def _write(self, p_key: str, p_meta: dict, p_body: bytes):
+        """
+        Writes an entry file atomically and accounts for its size.
+        """
+        l_path = self._path(p_key)
+        os.makedirs(os.path.dirname(l_path), exist_ok=True)
+
+        l_data = json.dumps(p_meta).encode('utf-8') + b'\n' + p_body
+        self._write_atomic(l_path, l_data)
+
+        with self._lock:
+            self._size += len(l_data) - self._index.get(p_key, [0, 0])[1]
+            self._index[p_key] = [time.time(), len(l_data)]
+
+    def get(self, p_url: str):
+        """
+        Reads an entry regardless of its age.
+        :param p_url: str
+            URL of the entry.
+        :return: CacheEntry
+            Cached entry, None when the URL is not cached
+        """
+        l_key = self.key(p_url)
+        l_path = self._path(l_key)
+
+        try:
+            l_meta, l_body = self._read(l_path)
+            l_content = gzip.decompress(l_body)
+        except (OSError, ValueError, EOFError):  # Missing or damaged entry counts as a miss
+            return None
+
+        with self._lock:
+            if l_key in self._index:
+                self._index[l_key][0] = time.time()
+        try:
+            os.utime(l_path)  # Access time survives restarts through the file mtime
+        except OSError:
+            pass
+
+        return CacheEntry(url=p_url,
+                          content=l_content,
+                          etag=l_meta.get('etag', ''),
+                          last_modified=l_meta.get('last_modified', ''),
+                          stored_at=l_meta['stored_at'],
+                          truncated=l_meta.get('truncated', False))
+
+    def is_fresh(self, p_entry: CacheEntry) -> bool:
+        """
+        :param p_entry: CacheEntry
+            Entry to check.
+        :return: bool
+            True if the entry is younger than the TTL
+        """
+        return time.time() - p_entry.stored_at < self.ttl_seconds
+
+    def put(self, p_url: str, p_content: bytes, p_etag: str = '', p_last_modified: str = '', p_truncated: bool = False):
+        """
+        Stores or replaces an entry, evicting least recently used entries when the cache is over its size.
+        :param p_url: str
+            URL of the entry.
+        :param p_content: bytes
+            Decoded response body.
+        :param p_etag: str
+            ETag header of the response.
+        :param p_last_modified: str
+            Last-Modified header of the response.
+        :param p_truncated: bool
+            The body was not read to the end, only readers that need the same sections may use the entry.
+        :return: None
+        """
+        self._write(self.key(p_url),
+                    {'url': p_url,
+                     'etag': p_etag or '',
+                     'last_modified': p_last_modified or '',
+                     'stored_at': time.time(),
+                     'truncated': p_truncated},
+                    gzip.compress(p_content, compresslevel=6))
+
+        self._evict()
+
+    def touch(self, p_url: str):
+        """
+        Marks an entry as fresh after a successful revalidation (304 Not Modified).
+        Only the metadata changes, the compressed body is copied as it is.
+        :param p_url: str
+            URL of the entry.
+        :return: None
+        """
+        l_key = self.key(p_url)
+
+        try:
+            l_meta, l_body = self._read(self._path(l_key))
+        except (OSError, ValueError):
+            return
+
+        self._write(l_key, dict(l_meta, stored_at=time.time()), l_body)
+
+    def size(self) -> int:
+        """
+        :return: int
+            Size of the entry files in the cache
+        """
+        with self._lock:
+            return self._size
+
+    def _evict(self):
+
+        # Initiate logging for this function, pad function name to 30 characters
+        logger = logging.getLogger(__name__.ljust(30, ' '))
+        logger.setLevel(self.log_level)
+
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+
+            l_evicted = []
+            for l_key, (_, l_entry_size) in sorted(self._index.items(), key=lambda x: x[1][0]):
+                if self._size <= self.max_bytes:
+                    break
+                self._size -= l_entry_size
+                l_evicted.append(l_key)
+
+            for l_key in l_evicted:
+                del self._index[l_key]
+
+        for l_key in l_evicted:
+            try:
+                os.remove(self._path(l_key))
+            except OSError:
+                pass
+
+        logger.debug(f'Evicted {len(l_evicted)} entries from cache: {self.cache_dir}')
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import math
+import pandas as pd
+import logging
+import config as c
+import imdb_http_client
+import imdb_records
+import imdb_scraper
+
+
+class TooManyFailuresError(Exception):
+    """
+    More titles failed than the failure policy tolerates. The journal is kept, the next run resumes from it.
+    """
+
+
+class Checkpoint:
+    """
+    Journal of the completed records of a run and dead-letter file of the failed titles, both JSON lines.
+    Every completed record is appended and flushed at once, so a crashed run loses at most the titles in flight.
+    """
+
+    def __init__(self, p_dir: str = c.checkpoint_dir, p_name: str = c.list_source, p_log_level: str = 'INFO'):
+        """
+        :param p_dir: str
+            Directory of the checkpoint files, created when missing.
+        :param p_name: str
+            Name of the run, e.g. the list source. Runs with different names have separate checkpoints.
+        :param p_log_level: str
+            Log level to logging
+        """
+
+        # Initiate logging for this class, pad class name to 30 characters
+        self.logger = logging.getLogger(__name__.ljust(30, ' '))
+        self.logger.setLevel(p_log_level)
+
+        os.makedirs(p_dir, exist_ok=True)
+        self.journal_file = os.path.join(p_dir, f'{p_name}.journal.jsonl')
+        self.dead_letter_file = os.path.join(p_dir, f'{p_name}.dead_letter.jsonl')
+
+        self._journal = None
+        self._dead_letter = None
+        self.failures = 0
+
+    def load(self, p_max_age_hours: float = c.freshness_hours) -> dict:
+        """
+        Reads the journal of an interrupted run. A line cut short by a crash is skipped.
+        :param p_max_age_hours: float
+            Records older than this are not reused.
+        :return: dict
+            Movie URL -> imdb_records.MovieRecord
+        """
+        if not os.path.isfile(self.journal_file):
+            return {}
+
+        l_oldest = time.time() - p_max_age_hours * 60 * 60
+
+        l_records = {}
+        with open(self.journal_file, 'r', encoding='utf-8') as l_file:
+            for l_line in l_file:
+                try:
+                    l_entry = json.loads(l_line)
+                except json.JSONDecodeError:
+                    self.logger.warning(f'Skipping damaged journal line: {l_line[:100]!r}')
+                    continue
+
+                if l_entry['scraped_at'] >= l_oldest:
+                    l_records[l_entry['url']] = imdb_records.MovieRecord.from_row(p_position=l_entry['position'],
+                                                                                  p_url=l_entry['url'],
+                                                                                  p_row=l_entry['row'])
+
+        self.logger.info(f'Resuming with {len(l_records)} records from journal: {self.journal_file}')
+
+        return l_records
+
+    def open(self, p_resume: bool = True):
+        """
+        Opens the journal for appending and starts a new dead-letter file.
+        :param p_resume: bool
+            Keep the journal of the previous run, a new journal is started otherwise.
+        """
+        self._journal = open(self.journal_file, 'a' if p_resume else 'w', encoding='utf-8')
+        self._dead_letter = open(self.dead_letter_file, 'w', encoding='utf-8')
+        self.failures = 0
+
+    def record(self, p_record: imdb_records.MovieRecord):
+        """
+        Appends a completed record to the journal.
+        """
+        self._journal.write(json.dumps({'position': p_record.position, 'url': p_record.url,
+                                        'row': p_record.to_row(), 'scraped_at': time.time()}) + '\n')
+        self._journal.flush()
+
+    def fail(self, p_failed: imdb_records.FailedTitle):
+        """
+        Appends a failed title with its error to the dead-letter file.
+        """
+        self.failures += 1
+
+        self.logger.error(f'Title failed, moved to dead-letter file: {p_failed.url}: {p_failed.error!r}')
+
+        self._dead_letter.write(json.dumps({'position': p_failed.position, 'url': p_failed.url,
+                                            'error_type': type(p_failed.error).__name__,
+                                            'error': str(p_failed.error)[:1000],
+                                            'failed_at': time.time()}) + '\n')
+        self._dead_letter.flush()
+
+    def close(self):
+        for l_file in (self._journal, self._dead_letter):
+            if l_file is not None:
+                os.fsync(l_file.fileno())
+                l_file.close()
+        self._journal = self._dead_letter = None
+
+    def complete(self):
+        """
+        Removes the journal of a finished run, so the next run starts from scratch.
+        """
+        self.close()
+        if os.path.isfile(self.journal_file):
+            os.remove(self.journal_file)
+
+
+def tolerated_failures(p_titles: int, p_max_failed_titles: int = c.max_failed_titles,
+                       p_max_failed_ratio: float = c.max_failed_ratio) -> int:
+    """
+    :param p_titles: int
+        Number of titles of the run.
+    :param p_max_failed_titles: int
+        Number of failed titles tolerated in any run.
+    :param p_max_failed_ratio: float
+        Share of failed titles tolerated.
+    :return: int
+        Number of failed titles tolerated in the run, the larger of the two limits
+    """
+    return max(p_max_failed_titles, math.floor(p_max_failed_ratio * p_titles))
+
+
+def extract_imdb_top_250_data_checkpointed(p_checkpoint_dir: str = c.checkpoint_dir,
+                                           p_resume: bool = True,
+                                           p_max_failed_titles: int = c.max_failed_titles,
+                                           p_max_failed_ratio: float = c.max_failed_ratio,
+                                           p_log_level: str = 'INFO',
+                                           p_client: imdb_http_client.HttpClient = None,
+                                           p_title_ids: bool = False,
+                                           p_list_url: str = None,
+                                           p_source=c.list_source,
+                                           **kwargs) -> pd.DataFrame:
+    """
+    Fault tolerant variant of imdb_scraper.extract_imdb_top_250_data.
+    Completed records are journaled, a failed title goes to the dead-letter file and the run goes on.
+    A rerun after a crash or after too many failures resumes from the journal, only the missing titles are scraped.
+    :param p_checkpoint_dir: str
+        Directory of the journal and the dead-letter file.
+    :param p_resume: bool
+        Reuse the journal of an interrupted run.
+    :param p_max_failed_titles: int
+        Number of failed titles tolerated, see tolerated_failures.
+    :param p_max_failed_ratio: float
+        Share of failed titles tolerated, see tolerated_failures.
+    :param p_log_level: str
+        Log level to logging
+    :param p_client: imdb_http_client.HttpClient
+        Client shared by the list and movie page fetches, the process wide default client when not given
+    :param p_title_ids: bool
+        Add a leading "title_id" column with the IMDB title IDs
+    :param p_list_url: str
+        URL of the list page replacing the URL of the source
+    :param p_source: str
+        Name of the list source in config.list_sources, or an imdb_lists.ListSource
+    :param kwargs:
+        Further keyword arguments of imdb_scraper.iter_imdb_records ( p_max_workers, p_parser, ... )
+    :return: pandas.DataFrame
+        Data of the scraped titles, same columns as imdb_scraper.extract_imdb_top_250_data
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    logger.info('Started')
+
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
+
+    l_link_list = imdb_scraper.extract_imdb_title_links(p_client=l_client, p_log_level=p_log_level,
+                                                        p_list_url=p_list_url, p_source=p_source)
+
+    l_checkpoint = Checkpoint(p_dir=p_checkpoint_dir, p_name=getattr(p_source, 'name', p_source),
+                              p_log_level=p_log_level)
+
+    # Journaled records of the titles still on the list, at their current position
+    l_journal = l_checkpoint.load() if p_resume else {}
+    l_records = {l_url: l_journal[l_url]._replace(position=l_position)
+                 for l_position, l_url in l_link_list if l_url in l_journal}
+
+    l_to_scrape = [x for x in l_link_list if x[1] not in l_records]
+
+    logger.info(f'{len(l_to_scrape)} titles to scrape, {len(l_records)} resumed from journal')
+
+    l_checkpoint.open(p_resume=p_resume)
+    try:
+        for l_result in imdb_scraper.iter_imdb_records(p_link_list=l_to_scrape,
+                                                       p_log_level=p_log_level,
+                                                       p_client=l_client,
+                                                       p_return_errors=True,
+                                                       **kwargs):
+            if isinstance(l_result, imdb_records.FailedTitle):
+                l_checkpoint.fail(l_result)
+            else:
+                l_checkpoint.record(l_result)
+                l_records[l_result.url] = l_result
+    finally:
+        l_checkpoint.close()
+
+    l_tolerated = tolerated_failures(p_titles=len(l_link_list), p_max_failed_titles=p_max_failed_titles,
+                                     p_max_failed_ratio=p_max_failed_ratio)
+
+    if l_checkpoint.failures > l_tolerated:
+        l_exc_msg = f'{l_checkpoint.failures} of {len(l_link_list)} titles failed, {l_tolerated} tolerated. ' \
+                    f'Failed titles: {l_checkpoint.dead_letter_file}, rerun to resume from: {l_checkpoint.journal_file}'
+        logger.error(l_exc_msg)
+        raise TooManyFailuresError(l_exc_msg)
+
+    if l_checkpoint.failures:
+        logger.warning(f'{l_checkpoint.failures} titles failed and are left out, see: {l_checkpoint.dead_letter_file}')
+
+    l_checkpoint.complete()
+
+    df = imdb_records.records_to_dataframe(p_records=sorted(l_records.values(), key=lambda x: x.position),
+                                           p_title_ids=p_title_ids)
+
+    logger.info(f'Finished, network usage: {l_client.stats.summary()}')
+
+    return df
@@ -0,0 +1,330 @@
+"""
+Console entry point of the project, installed as "imdb-top-250" by setup.py.
+
+imdb-top-250 run      scrape, adjust, store and write, same as python imdb_top_250_adjustment.py
+imdb-top-250 scrape   scrape the raw movie data to a file
+imdb-top-250 adjust   adjust raw movie data from a file, e.g. the snapshot of an incremental run, without network access
+imdb-top-250 write    convert a result file to another output format
+imdb-top-250 report   query the history store of the runs
+imdb-top-250 serve    refresh on a schedule and serve the adjusted list as JSON over HTTP
+imdb-top-250 batch    adjust and write the lists and snapshots of a manifest on a process pool
+
+Only argparse and config are imported at start, every command imports the modules it needs when it runs.
+The offline commands ( adjust, write, report ) never import requests or BeautifulSoup.
+"""
+import sys
+import argparse
+import contextlib
+from datetime import datetime
+import logging
+import config as c
+
+OUTPUT_FORMATS_HELP = "csv, ndjson, parquet or feather, parquet and feather need pyarrow"
+
+
+def _add_scrape_arguments(p_parser: argparse.ArgumentParser, p_list: bool = True):
+    p_parser.add_argument("--max_workers", required=False, default=c.max_workers, type=int,
+                          help=f"Number of movie pages downloaded in parallel, default={c.max_workers}")
+    p_parser.add_argument("--cache_dir", required=False, default=None,
+                          help=f"Directory of the response cache, default='{c.cache_dir}'")
+    p_parser.add_argument("--offline", required=False, action='store_true',
+                          help="Replay the run from the response cache without network access")
+    p_parser.add_argument("--parser", required=False, default=c.parser_backend,
+                          choices=['fast', 'strainer', 'soup'],
+                          help=f"Movie page parser backend, default='{c.parser_backend}'")
+    p_parser.add_argument("--parse_workers", required=False, default=c.parse_workers, type=int,
+                          help="Number of parser processes, default: one per CPU core")
+    p_parser.add_argument("--in_process", required=False, action='store_true',
+                          help="Parse pages in the main process instead of the process pool ( debugging )")
+    if p_list:
+        p_parser.add_argument("--list", required=False, default=c.list_source, choices=list(c.list_sources),
+                              help=f"List source from config, default='{c.list_source}'")
+
+
+def _add_transport_arguments(p_parser: argparse.ArgumentParser):
+    l_transport = p_parser.add_mutually_exclusive_group()
+    l_transport.add_argument("--record", required=False, default=None,
+                             help="Record every response of the run into this compressed archive, the cache is not used")
+    l_transport.add_argument("--replay", required=False, default=None,
+                             help="Serve every response from an archive written by --record, without network access")
+
+
+def _add_adjust_arguments(p_parser: argparse.ArgumentParser):
+    p_parser.add_argument("--rule_set", required=False, default=c.adjustment_rule_set,
+                          choices=list(c.adjustment_rule_sets),
+                          help=f"Adjustment rule set from config, default='{c.adjustment_rule_set}'")
+    p_parser.add_argument("--output_format", required=False, default=c.output_format,
+                          help=f"Format of the result file: {OUTPUT_FORMATS_HELP}, default='{c.output_format}'")
+    p_parser.add_argument("--dataset_dir", required=False, default=c.dataset_dir,
+                          help="Also append the result to the dataset partitioned by run timestamp in this directory")
+    p_parser.add_argument("--store_file", required=False, default=c.store_file,
+                          help=f"SQLite history store of the runs, empty string disables it, default='{c.store_file}'")
+
+
+def _command_run(p_args: argparse.Namespace):
+    import imdb_top_250_adjustment
+    import imdb_metrics
+
+    l_profile_file = f'imdb_top_250_profile_{datetime.now().strftime("%Y%m%d_%H%M%S")}.' \
+                     f'{"html" if c.profiler == "pyinstrument" else "prof"}'
+
+    with imdb_metrics.profiled(p_file=l_profile_file, p_log_level=p_args.log_level) \
+            if p_args.profile else contextlib.nullcontext():
+        imdb_top_250_adjustment.extract_and_adjust(p_log_level=p_args.log_level,
+                                                   p_max_workers=p_args.max_workers,
+                                                   p_cache_dir=p_args.cache_dir,
+                                                   p_offline=p_args.offline,
+                                                   p_record_file=p_args.record,
+                                                   p_replay_file=p_args.replay,
+                                                   p_parser=p_args.parser,
+                                                   p_parse_workers=p_args.parse_workers,
+                                                   p_in_process=p_args.in_process,
+                                                   p_incremental=p_args.incremental,
+                                                   p_snapshot_file=p_args.snapshot_file,
+                                                   p_freshness_hours=p_args.freshness_hours,
+                                                   p_rule_set=p_args.rule_set,
+                                                   p_output_format=p_args.output_format,
+                                                   p_dataset_dir=p_args.dataset_dir,
+                                                   p_store_file=p_args.store_file,
+                                                   p_report_file=p_args.report_file,
+                                                   p_source=p_args.list,
+                                                   p_checkpoint=p_args.checkpoint,
+                                                   p_checkpoint_dir=p_args.checkpoint_dir)
+
+
+def _command_scrape(p_args: argparse.Namespace):
+    import imdb_http_client
+    import imdb_scraper
+    import imdb_writers
+
+    l_client = imdb_http_client.create_client(p_cache_dir=p_args.cache_dir, p_offline=p_args.offline,
+                                              p_record_file=p_args.record, p_replay_file=p_args.replay,
+                                              p_log_level=p_args.log_level)
+
+    try:
+        df = imdb_scraper.extract_imdb_top_250_data(p_log_level=p_args.log_level,
+                                                    p_max_workers=p_args.max_workers,
+                                                    p_client=l_client,
+                                                    p_parser=p_args.parser,
+                                                    p_parse_workers=p_args.parse_workers,
+                                                    p_in_process=p_args.in_process,
+                                                    p_title_ids=True,
+                                                    p_source=p_args.list)
+    finally:
+        l_client.close()  # Writes the archive when recording
+
+    l_output_format = p_args.output_format or imdb_writers.format_of_file(p_args.output)
+
+    imdb_writers.write_dataframe(p_df=df, p_file=p_args.output, p_format=l_output_format,
+                                 p_overwrite=p_args.overwrite, p_log_level=p_args.log_level)
+
+
+def _command_adjust(p_args: argparse.Namespace):
+    import imdb_top_250_adjustment
+    import imdb_batch
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_args.log_level)
+
+    l_input = p_args.input or c.snapshot_file.format(source=p_args.list)  # imdb_incremental.snapshot_path, without its imports
+
+    df = imdb_batch.read_movie_data(p_file=l_input, p_log_level=p_args.log_level)
+
+    l_output_file = imdb_top_250_adjustment.adjust_and_write(
+        p_df=df,
+        p_log_level=p_args.log_level,
+        p_rule_set=p_args.rule_set,
+        p_output_format=p_args.output_format,
+        p_output_file=p_args.output,
+        p_dataset_dir=p_args.dataset_dir,
+        p_store_file=p_args.store_file,
+        p_source_url=l_input)
+
+    logger.info(f'Adjusted {len(df)} movies of {l_input}: {l_output_file}')
+
+
+def _command_write(p_args: argparse.Namespace):
+    import imdb_writers
+
+    l_output_format = p_args.output_format or imdb_writers.format_of_file(p_args.output)
+
+    imdb_writers.write_dataframe(p_df=imdb_writers.read_dataframe(p_file=p_args.input),
+                                 p_file=p_args.output,
+                                 p_format=l_output_format,
+                                 p_overwrite=p_args.overwrite,
+                                 p_log_level=p_args.log_level)
+
+
+def _command_report(p_args: argparse.Namespace):
+    import imdb_store
+
+    l_store = imdb_store.SnapshotStore(p_db_file=p_args.store_file, p_log_level=p_args.log_level)
+    try:
+        if p_args.runs:
+            df = l_store.runs()
+        elif p_args.title:
+            df = l_store.title_history(p_title_id=p_args.title)
+        else:
+            df = l_store.rank_deltas(p_from_run=p_args.from_run, p_to_run=p_args.to_run)
+    finally:
+        l_store.close()
+
+    print(df.to_string(index=False))
+
+
+def _command_serve(p_args: argparse.Namespace):
+    import imdb_service
+
+    imdb_service.ScrapeService(p_rule_set=p_args.rule_set,
+                               p_refresh_minutes=p_args.refresh_minutes,
+                               p_host=p_args.host,
+                               p_port=p_args.port,
+                               p_cache_dir=p_args.cache_dir,
+                               p_offline=p_args.offline,
+                               p_source=p_args.list,
+                               p_log_level=p_args.log_level,
+                               p_max_workers=p_args.max_workers,
+                               p_parser=p_args.parser,
+                               p_parse_workers=p_args.parse_workers,
+                               p_in_process=p_args.in_process).serve_forever()
+
+
+def _command_batch(p_args: argparse.Namespace):
+    import imdb_batch
+
+    l_report = imdb_batch.run_batch(p_manifest=imdb_batch.load_manifest(p_args.manifest),
+                                    p_batch_workers=p_args.batch_workers,
+                                    p_in_process=p_args.in_process,
+                                    p_cache_dir=p_args.cache_dir,
+                                    p_offline=p_args.offline,
+                                    p_report_file=p_args.report_file,
+                                    p_log_level=p_args.log_level,
+                                    p_max_workers=p_args.max_workers,
+                                    p_parser=p_args.parser,
+                                    p_parse_workers=p_args.parse_workers)
+
+    if l_report['failed']:
+        sys.exit(f'{len(l_report["failed"])} of {len(l_report["jobs"])} jobs failed: {", ".join(l_report["failed"])}')
+
+
+def argument_parser() -> argparse.ArgumentParser:
+    """
+    :return: argparse.ArgumentParser
+        Parser of the command line, the handler of the chosen command is in the "command" attribute
+    """
+    l_common = argparse.ArgumentParser(add_help=False)
+    l_common.add_argument("--log_level", required=False, default='INFO',
+                          help="Initiates log level, default='INFO'")
+
+    parser = argparse.ArgumentParser(prog='imdb-top-250', description='IMDB top 250 rating adjustment')
+    l_commands = parser.add_subparsers(title='commands', dest='command_name', required=True)
+
+    l_run = l_commands.add_parser('run', parents=[l_common],
+                                  help='Scrape, adjust, store and write the result')
+    l_run.set_defaults(command=_command_run)
+    _add_scrape_arguments(l_run)
+    _add_transport_arguments(l_run)
+    _add_adjust_arguments(l_run)
+    l_mode = l_run.add_mutually_exclusive_group()
+    l_mode.add_argument("--incremental", required=False, action='store_true',
+                        help="Scrape only new, moved or stale titles, reuse the rest from the snapshot of the last run")
+    l_mode.add_argument("--checkpoint", required=False, action='store_true',
+                        help="Journal completed titles, dead-letter failed ones and resume an interrupted run")
+    l_run.add_argument("--checkpoint_dir", required=False, default=c.checkpoint_dir,
+                       help=f"Directory of the journal and the dead-letter file, default='{c.checkpoint_dir}'")
+    l_run.add_argument("--snapshot_file", required=False, default=None,
+                       help=f"Snapshot of the last run for incremental mode, default='{c.snapshot_file}' of the list")
+    l_run.add_argument("--freshness_hours", required=False, default=c.freshness_hours, type=float,
+                       help=f"Records older than this are scraped again in incremental mode, default={c.freshness_hours}")
+    l_run.add_argument("--report_file", required=False, default=c.report_file,
+                       help="Write a JSON run report with stage and per-title timings to this file")
+    l_run.add_argument("--profile", required=False, action='store_true',
+                       help=f"Profile the run with {c.profiler}, written to imdb_top_250_profile_%%Y%%m%%d_%%H%%M%%S")
+
+    l_scrape = l_commands.add_parser('scrape', parents=[l_common],
+                                     help='Scrape the raw movie data with title IDs to a file')
+    l_scrape.set_defaults(command=_command_scrape)
+    _add_scrape_arguments(l_scrape)
+    _add_transport_arguments(l_scrape)
+    l_scrape.add_argument("--output", required=True, help="Target file, the format follows the extension")
+    l_scrape.add_argument("--output_format", required=False, default=None,
+                          help=f"Format of the target file: {OUTPUT_FORMATS_HELP}")
+    l_scrape.add_argument("--overwrite", required=False, action='store_true', help="Replace an existing target file")
+
+    l_adjust = l_commands.add_parser('adjust', parents=[l_common],
+                                     help='Adjust raw movie data from a file, no network access')
+    l_adjust.set_defaults(command=_command_adjust)
+    l_adjust.add_argument("--input", required=False, default=None,
+                          help=f"Raw movie data written by scrape, or a snapshot, default='{c.snapshot_file}' of the list")
+    l_adjust.add_argument("--list", required=False, default=c.list_source, choices=list(c.list_sources),
+                          help=f"Adjust the incremental snapshot of this list without --input, default='{c.list_source}'")
+    l_adjust.add_argument("--output", required=False, default=None,
+                          help="Result file, imdb_top_250_adjusted_%%Y%%m%%d_%%H%%M%%S.<extension> when not given")
+    _add_adjust_arguments(l_adjust)
+
+    l_write = l_commands.add_parser('write', parents=[l_common],
+                                    help='Convert a result file to another output format')
+    l_write.set_defaults(command=_command_write)
+    l_write.add_argument("--input", required=True, help="Source file, the format follows the extension")
+    l_write.add_argument("--output", required=True, help="Target file, the format follows the extension")
+    l_write.add_argument("--output_format", required=False, default=None,
+                         help=f"Format of the target file: {OUTPUT_FORMATS_HELP}")
+    l_write.add_argument("--overwrite", required=False, action='store_true', help="Replace an existing target file")
+
+    l_report = l_commands.add_parser('report', parents=[l_common],
+                                     help='Query the history store: rank changes, runs or a title')
+    l_report.set_defaults(command=_command_report)
+    l_report.add_argument("--store_file", required=False, default=c.store_file,
+                          help=f"SQLite history store of the runs, default='{c.store_file}'")
+    l_query = l_report.add_mutually_exclusive_group()
+    l_query.add_argument("--runs", required=False, action='store_true', help="List the stored runs")
+    l_query.add_argument("--title", required=False, default=None, help="History of a title ID, e.g. tt0111161")
+    l_report.add_argument("--from_run", required=False, default=None, type=int,
+                          help="Rank changes since this run, default: the run before --to_run")
+    l_report.add_argument("--to_run", required=False, default=None, type=int,
+                          help="Rank changes until this run, default: the latest run")
+
+    l_serve = l_commands.add_parser('serve', parents=[l_common],
+                                    help='Refresh on a schedule and serve the adjusted list as JSON over HTTP')
+    l_serve.set_defaults(command=_command_serve)
+    _add_scrape_arguments(l_serve)
+    l_serve.add_argument("--rule_set", required=False, default=c.adjustment_rule_set,
+                         choices=list(c.adjustment_rule_sets),
+                         help=f"Adjustment rule set from config, default='{c.adjustment_rule_set}'")
+    l_serve.add_argument("--refresh_minutes", required=False, default=c.service_refresh_minutes, type=float,
+                         help=f"Time between two refreshes, default={c.service_refresh_minutes}")
+    l_serve.add_argument("--host", required=False, default=c.service_host,
+                         help=f"Interface to listen on, default='{c.service_host}'")
+    l_serve.add_argument("--port", required=False, default=c.service_port, type=int,
+                         help=f"Port to listen on, default={c.service_port}")
+
+    l_batch = l_commands.add_parser('batch', parents=[l_common],
+                                    help='Adjust and write the lists and snapshots of a manifest on a process pool')
+    l_batch.set_defaults(command=_command_batch)
+    l_batch.add_argument("--manifest", required=True, help="JSON manifest of the jobs, see imdb_batch")
+    l_batch.add_argument("--batch_workers", required=False, default=c.batch_workers, type=int,
+                         help="Number of processes adjusting and writing the jobs, default: one per CPU core")
+    l_batch.add_argument("--report_file", required=False, default=None,
+                         help="Write the JSON batch report with the timings of every job to this file")
+    _add_scrape_arguments(l_batch, p_list=False)  # The lists are named in the manifest
+
+    return parser
+
+
+def main(p_argv: list = None):
+    """
+    Runs a command of the command line.
+    :param p_argv: list
+        Command line arguments, sys.argv[1:] when not given.
+    :return: None
+    """
+    l_args = argument_parser().parse_args(p_argv)
+
+    logging.basicConfig(format=c.log_format)  # Logging is configured by the entry point, never on import
+
+    l_args.command(l_args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import config as c
+import imdb_http_client
+import imdb_parser
+
+
+def fetch_page(p_url: str,
+               p_client: imdb_http_client.HttpClient = None,
+               p_log_level: str = 'INFO') -> bytes:
+    """
+    Downloads a single movie page through the shared HTTP client.
+    Retries, backoff and rate limiting are handled by the client. With config.stop_after_sections the download
+    stops once the application JSON and the awards item have been read, the rest of the page is never held.
+    :param p_url: str
+        URL of the page.
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given.
+    :param p_log_level: str
+        Log level to logging
+    :return: bytes
+        Content of the page
+    """
+
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
+
+    l_complete_factory = imdb_parser.SectionScanner if c.stop_after_sections else None
+
+    return l_client.get(p_url, p_complete_factory=l_complete_factory).content
+
+
+def fetch_pages(p_url_list: list,
+                p_max_workers: int = c.max_workers,
+                p_client: imdb_http_client.HttpClient = None,
+                p_log_level: str = 'INFO') -> list:
+    """
+    Downloads pages concurrently on a thread pool.
+    Results are returned in the order of the URL list, each page is retried on its own,
+    so a failing or slow page does not restart the others.
+    :param p_url_list: list
+        URLs to download.
+    :param p_max_workers: int
+        Number of pages downloaded in parallel.
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given.
+    :param p_log_level: str
+        Log level to logging
+    :return: list
+        Page contents as bytes, in the order of p_url_list
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    logger.info(f'Started fetching {len(p_url_list)} pages on {p_max_workers} workers')
+
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
+
+    with ThreadPoolExecutor(max_workers=max(1, p_max_workers)) as executor:
+        # map keeps the order of the input list regardless of completion order
+        l_pages = list(executor.map(lambda url: fetch_page(p_url=url, p_client=l_client, p_log_level=p_log_level),
+                                    p_url_list))
+
+    logger.info(f'Finished fetching {len(l_pages)} pages')
+
+    return l_pages
@@ -0,0 +1,618 @@
+import time
+import heapq
+import itertools
+import threading
+from collections import defaultdict
+from typing import NamedTuple
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+import config as c
+import imdb_cache
+import imdb_transport
+
+
+# Priorities of the request scheduler, lower is served first: the list page decides which movie pages are fetched
+PRIORITY_LIST = 0
+PRIORITY_PAGE = 1
+
+
+class HttpResponse(NamedTuple):
+    """
+    Response of a single request, detached from the underlying connection.
+    """
+    url: str
+    status_code: int
+    headers: dict
+    content: bytes
+    elapsed: float  # Seconds spent on the request including retries
+    from_cache: bool = False  # True if the body was served from the response cache
+    truncated: bool = False  # True if reading stopped early because the rest of the body was not needed
+
+
+class CacheMissError(requests.RequestException):
+    """
+    Raised in offline mode when the requested URL is not in the response cache.
+    """
+
+
+class BodyTooLargeError(requests.RequestException):
+    """
+    Raised when a response body is larger than the configured maximum, the request is not retried.
+    """
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket scheduler shared by every fetch of a client.
+    Tokens are refilled at the current rate up to the bucket size, a caller takes one token per request.
+    Waiting callers are served by priority ( list pages before movie pages ), then in arrival order.
+    A 429 response pauses every caller until its Retry-After has passed and cuts the rate, every successful
+    response raises it again step by step up to the upper limit.
+    """
+
+    def __init__(self,
+                 p_requests_per_second: float = c.max_requests_per_second,
+                 p_min_requests_per_second: float = c.min_requests_per_second,
+                 p_burst: int = c.rate_limit_burst,
+                 p_decrease_factor: float = c.rate_decrease_factor,
+                 p_increase_step: float = c.rate_increase_step):
+        """
+        :param p_requests_per_second: float
+            Maximum number of requests started per second, 0 or less means no limit and no scheduling.
+        :param p_min_requests_per_second: float
+            Rate the limiter slows down to at most on 429 responses.
+        :param p_burst: int
+            Size of the token bucket: requests that can start at once after an idle period.
+        :param p_decrease_factor: float
+            The rate is multiplied by this on a 429 response.
+        :param p_increase_step: float
+            Requests per second added after every successful response.
+        """
+        self.max_rate = max(p_requests_per_second, 0)
+        self.min_rate = min(p_min_requests_per_second, self.max_rate)
+        self.rate = self.max_rate
+        self.burst = max(1, p_burst)
+        self.decrease_factor = p_decrease_factor
+        self.increase_step = p_increase_step
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []  # Heap of ( priority, arrival ) of the waiting callers
+        self._arrivals = itertools.count()
+        self._condition = threading.Condition()
+
+        self._acquired = 0
+        self._first_acquired = None
+        self._last_acquired = None
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._throttled = 0
+        self._slowdowns = 0
+
+    def _refill(self, p_now: float):
+        if p_now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (p_now - self._updated) * self.rate)
+            self._updated = p_now
+
+    def acquire(self, p_priority: int = PRIORITY_PAGE) -> float:
+        """
+        Blocks until the caller is allowed to start its request.
+        :param p_priority: int
+            Lower values are served first, see PRIORITY_LIST and PRIORITY_PAGE.
+        :return: float
+            Seconds the caller waited in the queue
+        """
+        if self.max_rate == 0:
+            return 0.0
+
+        l_start = time.monotonic()
+        l_entry = (p_priority, next(self._arrivals))
+
+        with self._condition:
+            heapq.heappush(self._waiters, l_entry)
+            try:
+                while True:
+                    l_now = time.monotonic()
+                    self._refill(l_now)
+
+                    l_delay = None  # Not first in line: woken up when the caller ahead is done
+                    if self._waiters[0] == l_entry:
+                        l_delay = max(self._paused_until - l_now, (1 - self._tokens) / self.rate)
+                        if l_delay <= 0:
+                            break
+
+                    self._condition.wait(l_delay)
+            finally:
+                self._waiters.remove(l_entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()  # The next caller in line takes over
+
+            self._tokens -= 1
+
+            l_wait = l_now - l_start
+            self._acquired += 1
+            self._first_acquired = l_now if self._first_acquired is None else self._first_acquired
+            self._last_acquired = l_now
+            self._wait_total += l_wait
+            self._wait_max = max(self._wait_max, l_wait)
+
+        return l_wait
+
+    def throttled(self, p_retry_after: float):
+        """
+        Reports a 429 response: pauses every caller for p_retry_after seconds and slows down.
+        The 429 responses of requests already running when the first one arrived slow down only once.
+        :param p_retry_after: float
+            Seconds the server asked to wait.
+        :return: None
+        """
+        if self.max_rate == 0:
+            return
+
+        with self._condition:
+            l_now = time.monotonic()
+            self._refill(l_now)
+            self._throttled += 1
+
+            if l_now >= self._paused_until:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self._slowdowns += 1
+
+            self._paused_until = max(self._paused_until, l_now + p_retry_after)
+            self._tokens = min(self._tokens, 0.0)  # No burst when the pause is over
+            self._updated = max(self._updated, self._paused_until)
+
+    def succeeded(self):
+        """
+        Reports a successful response, raises the rate by one step up to the upper limit.
+        :return: None
+        """
+        if self.max_rate == 0 or self.rate >= self.max_rate:
+            return
+
+        with self._condition:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def summary(self) -> dict:
+        """
+        :return: dict
+            Current rate, achieved requests per second, queue wait and number of 429 responses and slowdowns
+        """
+        with self._condition:
+            l_span = (self._last_acquired or 0) - (self._first_acquired or 0)
+
+            return {'rate_limit': round(self.rate, 3),
+                    'requests_per_second': round((self._acquired - 1) / l_span, 3) if l_span > 0 else 0.0,
+                    'queue_wait_total': round(self._wait_total, 3),
+                    'queue_wait_max': round(self._wait_max, 3),
+                    'throttled': self._throttled,
+                    'slowdowns': self._slowdowns}
+
+
+class RequestStats:
+    """
+    Thread safe collector of per-request timings and byte counters.
+    """
+
+    def __init__(self, p_rate_limiter: RateLimiter = None):
+        """
+        :param p_rate_limiter: RateLimiter
+            Scheduler of the requests, its achieved rate and queue wait are part of the summary.
+        """
+        self._lock = threading.Lock()
+        self.rate_limiter = p_rate_limiter
+        self.requests = []  # One dict per request: url, status_code, elapsed, bytes, wire_bytes, retries, cache
+
+    def add(self, p_url: str, p_status_code: int, p_elapsed: float, p_bytes: int, p_wire_bytes: int, p_retries: int,
+            p_cache: str = 'none'):
+        """
+        Records a finished request.
+        :param p_url: str
+            URL of the request.
+        :param p_status_code: int
+            Final status code, 0 if no response was received.
+        :param p_elapsed: float
+            Seconds spent on the request including retries.
+        :param p_bytes: int
+            Size of the decoded response body.
+        :param p_wire_bytes: int
+            Number of bytes received on the connection (compressed size).
+        :param p_retries: int
+            Number of retries needed.
+        :param p_cache: str
+            Cache outcome: 'hit', 'revalidated', 'miss' or 'none' when no cache is used.
+        :return: None
+        """
+        with self._lock:
+            self.requests.append({'url': p_url,
+                                  'status_code': p_status_code,
+                                  'elapsed': p_elapsed,
+                                  'bytes': p_bytes,
+                                  'wire_bytes': p_wire_bytes,
+                                  'retries': p_retries,
+                                  'cache': p_cache})
+
+    def summary(self) -> dict:
+        """
+        Aggregates the recorded requests.
+        :return: dict
+            Number of requests, retries, cache hits, total and maximum seconds, decoded and wire bytes,
+            and the state of the scheduler ( rate ).
+        """
+        with self._lock:
+            l_requests = list(self.requests)
+
+        return {'requests': len(l_requests),
+                'retries': sum(r['retries'] for r in l_requests),
+                'cache_hits': sum(1 for r in l_requests if r['cache'] == 'hit'),
+                'cache_revalidated': sum(1 for r in l_requests if r['cache'] == 'revalidated'),
+                'errors': sum(1 for r in l_requests if not 200 <= r['status_code'] < 400),
+                'elapsed_total': round(sum(r['elapsed'] for r in l_requests), 3),
+                'elapsed_max': round(max((r['elapsed'] for r in l_requests), default=0), 3),
+                'bytes': sum(r['bytes'] for r in l_requests),
+                'wire_bytes': sum(r['wire_bytes'] for r in l_requests),
+                'rate': self.rate_limiter.summary() if self.rate_limiter is not None else {}}
+
+
+class HttpClient:
+    """
+    Shared HTTP client of the scraper.
+    Keeps a pooled keep-alive session, negotiates compressed transfer, limits the number of parallel
+    requests per host and retries connection errors and 429/5xx responses with exponential backoff.
+    Every request goes through a shared token bucket scheduler that slows down on 429 responses.
+    With a response cache, fresh entries are served from disk and stale ones are revalidated with
+    conditional requests. In offline mode every response comes from the cache.
+    """
+
+    def __init__(self,
+                 p_requests_per_second: float = c.max_requests_per_second,
+                 p_max_connections_per_host: int = c.max_connections_per_host,
+                 p_pool_size: int = c.connection_pool_size,
+                 p_max_retries: int = c.max_retries,
+                 p_retry_wait: float = c.retry_wait_seconds,
+                 p_max_retry_after: float = c.max_retry_after_seconds,
+                 p_timeout: float = c.request_timeout_seconds,
+                 p_max_body_bytes: int = c.max_body_bytes,
+                 p_chunk_bytes: int = c.stream_chunk_bytes,
+                 p_headers: dict = None,
+                 p_cache: imdb_cache.ResponseCache = None,
+                 p_offline: bool = False,
+                 p_transport: HTTPAdapter = None,
+                 p_log_level: str = 'INFO'):
+        """
+        :param p_requests_per_second: float
+            Maximum number of requests started per second, 0 means no limit.
+        :param p_max_connections_per_host: int
+            Number of requests running in parallel against a single host.
+        :param p_pool_size: int
+            Number of keep-alive connections kept open per host.
+        :param p_max_retries: int
+            Number of retries before the error is raised.
+        :param p_retry_wait: float
+            Seconds to wait before the first retry, doubled after every failed attempt.
+        :param p_max_retry_after: float
+            Longest wait before a retry, a request asked to wait longer by a Retry-After header fails.
+        :param p_timeout: float
+            Timeout of a single request in seconds.
+        :param p_max_body_bytes: int
+            Largest response body read, larger responses fail with BodyTooLargeError.
+        :param p_chunk_bytes: int
+            Size of the chunks the response bodies are read in.
+        :param p_headers: dict
+            Headers sent with every request, config.http_headers when not given.
+        :param p_cache: imdb_cache.ResponseCache
+            On-disk response cache, no caching when not given.
+        :param p_offline: bool
+            Serve every response from the cache without touching the network.
+        :param p_transport: requests.adapters.HTTPAdapter
+            Adapter sending the requests, a pooled network adapter when not given.
+            See imdb_transport for recording and replaying runs.
+        :param p_log_level: str
+            Log level to logging
+        """
+        self.max_retries = p_max_retries
+        self.retry_wait = p_retry_wait
+        self.max_retry_after = p_max_retry_after
+        self.timeout = p_timeout
+        self.max_body_bytes = p_max_body_bytes
+        self.chunk_bytes = p_chunk_bytes
+        self.log_level = p_log_level
+        self.cache = p_cache
+        self.offline = p_offline
+
+        if p_offline and p_cache is None:
+            raise ValueError('Offline mode needs a response cache')
+
+        self._rate_limiter = RateLimiter(p_requests_per_second=p_requests_per_second)
+        self.stats = RequestStats(p_rate_limiter=self._rate_limiter)
+        self._host_semaphores = defaultdict(lambda: threading.BoundedSemaphore(max(1, p_max_connections_per_host)))
+        self._host_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update(c.http_headers if p_headers is None else p_headers)
+        self.session.stream = True  # Bodies are read by _read_body, chunk by chunk
+        l_adapter = p_transport or HTTPAdapter(pool_connections=p_pool_size, pool_maxsize=p_pool_size)
+        self.session.mount('https://', l_adapter)
+        self.session.mount('http://', l_adapter)
+
+    def _host_semaphore(self, p_url: str) -> threading.BoundedSemaphore:
+        with self._host_lock:
+            return self._host_semaphores[urlsplit(p_url).netloc]
+
+    def _retry_wait(self, p_attempt: int, p_response: requests.Response = None) -> float:
+        """
+        Calculates the wait before the next attempt, a Retry-After header ( seconds or HTTP date ) takes precedence.
+        """
+        if p_response is not None:
+            l_retry_after = p_response.headers.get('Retry-After', '').strip()
+            try:
+                return max(0.0, float(l_retry_after))
+            except ValueError:
+                pass
+            try:
+                return max(0.0, parsedate_to_datetime(l_retry_after).timestamp() - time.time())
+            except (TypeError, ValueError, IndexError):
+                pass
+
+        return self.retry_wait * 2 ** p_attempt
+
+    def _read_body(self, p_response: requests.Response, p_complete=None) -> tuple:
+        """
+        Reads the body of a streamed response chunk by chunk into a single buffer.
+        :param p_response: requests.Response
+            Response of the request.
+        :param p_complete:
+            Called with the bytes read so far after every chunk, reading stops when it returns True.
+        :return: tuple
+            ( body as bytes, True when reading stopped early )
+        """
+        if p_response.raw is None:  # Response built in memory, nothing to stream
+            return p_response.content, False
+
+        try:
+            l_length = int(p_response.headers.get('Content-Length', 0))
+        except ValueError:
+            l_length = 0
+
+        try:
+            if l_length > self.max_body_bytes:  # Compressed size already over the limit, nothing is read
+                raise BodyTooLargeError(f'Response of {l_length} bytes is larger than {self.max_body_bytes} bytes')
+
+            l_body = bytearray()
+            for l_chunk in p_response.iter_content(chunk_size=self.chunk_bytes):
+                l_body += l_chunk
+
+                if len(l_body) > self.max_body_bytes:
+                    raise BodyTooLargeError(f'Response is larger than {self.max_body_bytes} bytes')
+
+                if p_complete is not None and p_complete(l_body):
+                    return bytes(l_body), True
+        finally:
+            p_response.close()  # An unread rest closes the connection, a fully read one goes back to the pool
+
+        return bytes(l_body), False
+
+    def get(self, p_url: str, p_priority: int = PRIORITY_PAGE, p_complete_factory=None) -> HttpResponse:
+        """
+        Downloads a page, retrying connection errors and retryable status codes with backoff.
+        Fresh cached pages are returned without a request, stale ones are revalidated.
+        :param p_url: str
+            URL of the page.
+        :param p_priority: int
+            Priority in the request scheduler, PRIORITY_LIST or PRIORITY_PAGE.
+        :param p_complete_factory:
+            Creates the check called with the bytes read so far, reading stops early when it returns True
+            ( e.g. imdb_parser.SectionScanner ). Called before every attempt, so no state of a failed read is carried
+            over to the next one. The whole body is read when not given.
+        :return: HttpResponse
+            Response of the last attempt.
+        """
+
+        # Initiate logging for this function, pad function name to 30 characters
+        logger = logging.getLogger(__name__.ljust(30, ' '))
+        logger.setLevel(self.log_level)
+
+        logger.debug(f'Fetching URL: {p_url}')
+
+        l_start = time.perf_counter()
+
+        l_cached = self.cache.get(p_url) if self.cache is not None else None
+        l_conditional_headers = {}
+
+        # A body cut short after the needed sections only serves readers that stop at the same sections
+        if l_cached is not None and l_cached.truncated and \
+                (p_complete_factory is None or not p_complete_factory()(l_cached.content)):
+            l_cached = None
+
+        if l_cached is not None and (self.offline or self.cache.is_fresh(l_cached)):
+            self.stats.add(p_url, 200, time.perf_counter() - l_start, len(l_cached.content), 0, 0, 'hit')
+            logger.debug(f'Cache hit for URL: {p_url}')
+            return HttpResponse(url=p_url, status_code=200, headers={}, content=l_cached.content,
+                                elapsed=time.perf_counter() - l_start, from_cache=True)
+
+        if self.offline:
+            self.stats.add(p_url, 0, time.perf_counter() - l_start, 0, 0, 0, 'miss')
+            l_exc_msg = f'URL is not in the response cache in offline mode: {p_url}'
+            logger.error(l_exc_msg)
+            raise CacheMissError(l_exc_msg)
+
+        if l_cached is not None:  # Stale entry, ask the server whether it changed
+            if l_cached.etag:
+                l_conditional_headers['If-None-Match'] = l_cached.etag
+            if l_cached.last_modified:
+                l_conditional_headers['If-Modified-Since'] = l_cached.last_modified
+
+        l_cache_status = 'none' if self.cache is None else 'miss'
+
+        l_attempt = 0
+        while True:
+            self._rate_limiter.acquire(p_priority=p_priority)
+
+            try:
+                with self._host_semaphore(p_url):
+                    l_response = self.session.get(p_url, timeout=self.timeout, headers=l_conditional_headers)
+                    l_content, l_truncated = self._read_body(l_response, p_complete=p_complete_factory()
+                                                             if p_complete_factory is not None else None)
+            except requests.RequestException as rqe:
+                if l_attempt >= self.max_retries or isinstance(rqe, (BodyTooLargeError, imdb_transport.ReplayMissError)):
+                    self.stats.add(p_url, 0, time.perf_counter() - l_start, 0, 0, l_attempt, l_cache_status)
+                    logger.error(f'Fetching "{p_url}" failed after {l_attempt + 1} attempts:\n{rqe}')
+                    raise rqe
+
+                l_wait = self._retry_wait(l_attempt)
+                logger.warning(f'Fetching "{p_url}" failed, retrying in {l_wait} seconds: {rqe}')
+                time.sleep(l_wait)
+                l_attempt += 1
+                continue
+
+            if l_response.status_code in c.retry_status_codes and l_attempt < self.max_retries:
+                l_wait = self._retry_wait(l_attempt, l_response)
+                if l_wait > self.max_retry_after:  # A worker blocked for hours would stall the whole run
+                    self._rate_limiter.throttled(p_retry_after=self.max_retry_after)
+                    self.stats.add(p_url, l_response.status_code, time.perf_counter() - l_start, 0, 0, l_attempt,
+                                   l_cache_status)
+                    l_exc_msg = f'Fetching "{p_url}" returned {l_response.status_code} with a retry after ' \
+                                f'{l_wait:.0f} seconds, longer than {self.max_retry_after} seconds'
+                    logger.error(l_exc_msg)
+                    raise requests.HTTPError(l_exc_msg, response=l_response)
+                if l_response.status_code == 429:  # Every other request waits too, and the rate goes down
+                    self._rate_limiter.throttled(p_retry_after=l_wait)
+                logger.warning(f'Fetching "{p_url}" returned {l_response.status_code}, retrying in {l_wait} seconds')
+                time.sleep(l_wait)
+                l_attempt += 1
+                continue
+
+            break
+
+        if l_response.status_code == 429:
+            self._rate_limiter.throttled(p_retry_after=min(self._retry_wait(l_attempt, l_response),
+                                                           self.max_retry_after))
+        elif l_response.status_code < 400:
+            self._rate_limiter.succeeded()
+
+        l_elapsed = time.perf_counter() - l_start
+
+        # Bytes read from the connection before decompression, falls back to the decoded size
+        try:
+            l_wire_bytes = int(l_response.raw.tell())
+        except (AttributeError, TypeError, ValueError):
+            l_wire_bytes = len(l_content)
+
+        if l_response.status_code == 304 and l_cached is not None:  # Not modified, serve the cached body
+            self.cache.touch(p_url)
+            self.stats.add(p_url, 304, l_elapsed, len(l_cached.content), l_wire_bytes, l_attempt, 'revalidated')
+            logger.debug(f'Cache entry revalidated for URL: {p_url}')
+            return HttpResponse(url=p_url, status_code=200, headers=dict(l_response.headers),
+                                content=l_cached.content, elapsed=l_elapsed, from_cache=True)
+
+        self.stats.add(p_url, l_response.status_code, l_elapsed, len(l_content), l_wire_bytes, l_attempt,
+                       l_cache_status)
+
+        if l_response.status_code == 304:  # Not modified, but there is no cached body to serve
+            l_exc_msg = f'Fetching "{p_url}" returned 304 Not Modified without a cached body'
+            logger.error(l_exc_msg)
+            raise requests.HTTPError(l_exc_msg, response=l_response)
+
+        try:
+            l_response.raise_for_status()
+        except requests.HTTPError as he:
+            logger.error(f'Fetching "{p_url}" failed after {l_attempt + 1} attempts:\n{he}')
+            raise he
+
+        logger.debug(f'Fetched URL: {p_url} in {l_elapsed:.3f} seconds, {len(l_content)} bytes'
+                     f'{", rest of the body not read" if l_truncated else ""}')
+
+        if self.cache is not None:
+            self.cache.put(p_url, l_content,
+                           p_etag=l_response.headers.get('ETag', ''),
+                           p_last_modified=l_response.headers.get('Last-Modified', ''),
+                           p_truncated=l_truncated)
+
+        return HttpResponse(url=p_url,
+                            status_code=l_response.status_code,
+                            headers=dict(l_response.headers),
+                            content=l_content,
+                            elapsed=l_elapsed,
+                            truncated=l_truncated)
+
+    def close(self):
+        """
+        Closes the pooled connections.
+        :return: None
+        """
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def create_client(p_cache_dir: str = None,
+                  p_offline: bool = False,
+                  p_record_file: str = None,
+                  p_replay_file: str = None,
+                  p_log_level: str = 'INFO') -> HttpClient:
+    """
+    Creates a client with the settings from config.
+    :param p_cache_dir: str
+        Directory of the response cache, config.cache_dir when not given.
+        The cache is used when enabled in config, a cache directory is given or offline mode is requested.
+    :param p_offline: bool
+        Serve every response from the cache without touching the network.
+    :param p_record_file: str
+        Record every response into this archive, written when the client is closed. The cache is not used.
+    :param p_replay_file: str
+        Serve every response from this archive, recorded with p_record_file, without rate limit or network.
+    :param p_log_level: str
+        Log level to logging
+    :return: HttpClient
+        New client
+    """
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    if sum([p_offline, p_record_file is not None, p_replay_file is not None]) > 1:
+        logger.error('Offline mode, recording and replaying exclude each other')
+        raise ValueError('Offline mode, recording and replaying exclude each other')
+
+    if p_record_file is not None:
+        return HttpClient(p_transport=imdb_transport.RecordingAdapter(p_file=p_record_file,
+                                                                      pool_connections=c.connection_pool_size,
+                                                                      pool_maxsize=c.connection_pool_size,
+                                                                      p_log_level=p_log_level),
+                          p_log_level=p_log_level)
+
+    if p_replay_file is not None:
+        l_archive = imdb_transport.TransportArchive.load(p_replay_file)
+        logger.info(f'Replaying {len(l_archive)} responses from archive: {p_replay_file}')
+        return HttpClient(p_requests_per_second=0, p_retry_wait=0,
+                          p_transport=imdb_transport.ReplayAdapter(p_archive=l_archive),
+                          p_log_level=p_log_level)
+
+    l_cache = None
+    if c.cache_enabled or p_cache_dir is not None or p_offline:
+        l_cache = imdb_cache.ResponseCache(p_cache_dir=p_cache_dir or c.cache_dir, p_log_level=p_log_level)
+
+    return HttpClient(p_cache=l_cache, p_offline=p_offline, p_log_level=p_log_level)
+
+
+def get_default_client(p_log_level: str = 'INFO') -> HttpClient:
+    """
+    Returns the process wide client shared by the list and the movie page fetches, created on first use.
+    :param p_log_level: str
+        Log level to logging
+    :return: HttpClient
+        Shared client
+    """
+    global _default_client
+
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = create_client(p_log_level=p_log_level)
+
+    return _default_client
@@ -0,0 +1,188 @@
+import os
+import csv
+import time
+import pandas as pd
+import logging
+import config as c
+import imdb_http_client
+import imdb_records
+import imdb_scraper
+
+# Columns of the snapshot file
+SNAPSHOT_COLUMNS = ['position', 'url'] + imdb_records.MOVIE_COLUMNS + ['scraped_at']
+
+
+def snapshot_path(p_source=c.list_source) -> str:
+    """
+    :param p_source: str
+        Name of the list source in config.list_sources, or an imdb_lists.ListSource
+    :return: str
+        Snapshot file of the source, every list keeps its own snapshot
+    """
+    return c.snapshot_file.format(source=getattr(p_source, 'name', p_source))
+
+
+def load_snapshot(p_file: str, p_log_level: str = 'INFO') -> dict:
+    """
+    Loads the raw records of the previous run.
+    :param p_file: str
+        Snapshot file written by save_snapshot.
+    :param p_log_level: str
+        Log level to logging
+    :return: dict
+        Movie URL -> ( imdb_records.MovieRecord, scraped at as epoch seconds ), empty if there is no snapshot
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    if not os.path.isfile(p_file):
+        logger.warning(f'No snapshot found, every title is scraped: {p_file}')
+        return {}
+
+    l_df = pd.read_csv(p_file, sep=';', keep_default_na=False)
+
+    l_snapshot = {}
+    for l_row in l_df.itertuples(index=False):
+        l_record = imdb_records.MovieRecord(position=int(l_row.position),
+                                            url=l_row.url,
+                                            name=l_row.name,
+                                            release_date=l_row.release_date,
+                                            rating=l_row.rating,
+                                            votes=int(l_row.votes),
+                                            oscars=int(l_row.oscars))
+        l_snapshot[l_record.url] = (l_record, float(l_row.scraped_at))
+
+    logger.info(f'Loaded {len(l_snapshot)} records from snapshot: {p_file}')
+
+    return l_snapshot
+
+
+def save_snapshot(p_snapshot: dict, p_file: str, p_log_level: str = 'INFO'):
+    """
+    Writes the raw records of the run, replacing the previous snapshot atomically.
+    :param p_snapshot: dict
+        Movie URL -> ( imdb_records.MovieRecord, scraped at as epoch seconds ).
+    :param p_file: str
+        Target file name / path.
+    :param p_log_level: str
+        Log level to logging
+    :return: None
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_df = pd.DataFrame([[l_record.position, l_record.url] + l_record.to_row() + [l_scraped_at]
+                         for l_record, l_scraped_at in sorted(p_snapshot.values(), key=lambda x: x[0].position)],
+                        columns=SNAPSHOT_COLUMNS)
+
+    l_tmp_file = f'{p_file}.tmp'
+    l_df.to_csv(path_or_buf=l_tmp_file, sep=';', index=False, header=True, quoting=csv.QUOTE_NONNUMERIC)
+    os.replace(l_tmp_file, p_file)  # Readers never see a half written snapshot
+
+    logger.info(f'Saved {len(l_df)} records to snapshot: {p_file}')
+
+
+def plan_refresh(p_link_list: list, p_snapshot: dict, p_freshness_hours: float = c.freshness_hours,
+                 p_now: float = None) -> tuple:
+    """
+    Compares the current list with the snapshot and decides which titles have to be scraped again.
+    A title is scraped when it is new in the list, moved to another position or its record is older
+    than the freshness window. Everything else is reused from the snapshot.
+    :param p_link_list: list
+        ( position, movie URL ) tuples of the current list.
+    :param p_snapshot: dict
+        Movie URL -> ( imdb_records.MovieRecord, scraped at ), as returned by load_snapshot.
+    :param p_freshness_hours: float
+        Maximum age of a reused record.
+    :param p_now: float
+        Current time as epoch seconds, time.time() when not given.
+    :return: tuple
+        ( links to scrape as ( position, URL ) tuples, reused snapshot entries as a URL -> entry dict )
+    """
+    l_now = time.time() if p_now is None else p_now
+    l_max_age = p_freshness_hours * 60 * 60
+
+    l_to_scrape = []
+    l_reused = {}
+    for l_position, l_url in p_link_list:
+        l_entry = p_snapshot.get(l_url)
+
+        if l_entry is None or l_entry[0].position != l_position or l_now - l_entry[1] >= l_max_age:
+            l_to_scrape.append((l_position, l_url))
+        else:
+            l_reused[l_url] = l_entry
+
+    return l_to_scrape, l_reused
+
+
+def extract_imdb_top_250_data_incremental(p_snapshot_file: str = None,
+                                          p_freshness_hours: float = c.freshness_hours,
+                                          p_log_level: str = 'INFO',
+                                          p_client: imdb_http_client.HttpClient = None,
+                                          p_title_ids: bool = False,
+                                          p_list_url: str = None,
+                                          p_source: str = c.list_source,
+                                          **kwargs) -> pd.DataFrame:
+    """
+    Incremental variant of imdb_scraper.extract_imdb_top_250_data.
+    Only new, moved or stale titles are scraped, the rest is taken from the snapshot of the previous run.
+    The snapshot is updated with the result.
+    :param p_snapshot_file: str
+        Snapshot file of the previous run, created when missing, snapshot_path of the source when not given.
+    :param p_freshness_hours: float
+        Maximum age of a reused record.
+    :param p_log_level: str
+        Log level to logging
+    :param p_client: imdb_http_client.HttpClient
+        Client shared by the list and movie page fetches, the process wide default client when not given
+    :param p_title_ids: bool
+        Add a leading "title_id" column with the IMDB title IDs
+    :param p_list_url: str
+        URL of the list page replacing the URL of the source
+    :param p_source: str
+        Name of the list source in config.list_sources, or an imdb_lists.ListSource
+    :param kwargs:
+        Further keyword arguments of imdb_scraper.iter_imdb_records ( p_max_workers, p_parser, ... )
+    :return: pandas.DataFrame
+        Extracted data, same columns as imdb_scraper.extract_imdb_top_250_data
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    logger.info('Started')
+
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
+
+    l_snapshot_file = p_snapshot_file or snapshot_path(p_source)
+
+    l_link_list = imdb_scraper.extract_imdb_title_links(p_client=l_client, p_log_level=p_log_level,
+                                                        p_list_url=p_list_url, p_source=p_source)
+
+    l_to_scrape, l_snapshot = plan_refresh(p_link_list=l_link_list,
+                                           p_snapshot=load_snapshot(p_file=l_snapshot_file, p_log_level=p_log_level),
+                                           p_freshness_hours=p_freshness_hours)
+
+    logger.info(f'{len(l_to_scrape)} titles to scrape, {len(l_snapshot)} reused from snapshot')
+
+    for l_record in imdb_scraper.iter_imdb_records(p_link_list=l_to_scrape,
+                                                   p_log_level=p_log_level,
+                                                   p_client=l_client,
+                                                   **kwargs):
+        l_snapshot[l_record.url] = (l_record, time.time())
+
+    save_snapshot(p_snapshot=l_snapshot, p_file=l_snapshot_file, p_log_level=p_log_level)
+
+    # Merge reused and fresh records back into list order
+    l_records = sorted((x[0] for x in l_snapshot.values()), key=lambda x: x.position)
+
+    df = imdb_records.records_to_dataframe(p_records=l_records, p_title_ids=p_title_ids)
+
+    logger.info(f'Finished, network usage: {l_client.stats.summary()}')
+
+    return df
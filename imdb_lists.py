@@ -0,0 +1,183 @@
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+import json
+import logging
+import config as c
+import imdb_http_client
+import imdb_metrics
+import imdb_records
+import imdb_logs
+
+
+class ListSource(NamedTuple):
+    """
+    A list of movies to scrape, see config.list_sources.
+    """
+    name: str
+    url: str  # URL of the first list page
+    first: int = 1  # First kept position
+    last: int = None  # Last kept position, None: to the end of the list
+    max_pages: int = 1  # Maximum number of list pages followed
+
+
+def get_list_source(p_name=c.list_source) -> ListSource:
+    """
+    :param p_name: str
+        Name of a source in config.list_sources, or a ListSource which is returned as is.
+    :return: ListSource
+        The source
+    """
+    if isinstance(p_name, ListSource):
+        return p_name
+
+    if p_name not in c.list_sources:
+        raise ValueError(f'Unknown list source: "{p_name}", available: {list(c.list_sources)}')
+
+    l_spec = c.list_sources[p_name]
+    l_first, l_last = l_spec.get('positions', [1, None])
+
+    return ListSource(name=p_name, url=l_spec['url'], first=l_first, last=l_last, max_pages=l_spec.get('max_pages', 1))
+
+
+def page_url(p_url: str, p_page: int) -> str:
+    """
+    :param p_url: str
+        URL of the first list page.
+    :param p_page: int
+        Page number, starting at 1.
+    :return: str
+        URL of the page, the first page is p_url itself
+    """
+    if p_page == 1:
+        return p_url
+
+    l_parts = urlsplit(p_url)
+    l_query = [(k, v) for k, v in parse_qsl(l_parts.query) if k != 'page'] + [('page', str(p_page))]
+
+    return urlunsplit(l_parts._replace(query=urlencode(l_query)))
+
+
+def parse_list_page(p_content: bytes, p_url: str, p_log_level: str = 'INFO') -> list:
+    """
+    Extracts the movie links of a list page from its application JSON.
+    :param p_content: bytes
+        Content of the list page.
+    :param p_url: str
+        URL of the list page, movie links are resolved against it.
+    :param p_log_level: str
+        Log level to logging
+    :return: list
+        ( position, movie URL ) tuples in page order
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    from bs4 import BeautifulSoup  # Imported on the first list page, not with the module
+
+    l_script = BeautifulSoup(p_content, "html.parser").find('script', type="application/ld+json")
+
+    if l_script is None:
+        l_msg = f'No application data was found on list page: {p_url}'
+        logger.error(l_msg)
+        raise Exception(l_msg)
+
+    try:
+        l_title_json = json.loads(l_script.text)  # Parse link list into JSON object
+    except json.JSONDecodeError as jde:
+        logger.error(f'Parsing JSON data failed with the following error:\n{jde}')
+        raise jde
+
+    try:
+        # Extract position and url from link list, calculate movie links
+        return [(int(x['position']), urljoin(p_url, x['url'])) for x in l_title_json['about']['itemListElement']]
+    except KeyError as ke:
+        l_exc_msg = f'Field not found in JSON: {ke}, JSON data:\n{imdb_logs.Excerpt(l_title_json)}'
+        logger.error(l_exc_msg)
+        raise KeyError(l_exc_msg)
+
+
+def iter_list_links(p_source: ListSource, p_client: imdb_http_client.HttpClient = None, p_log_level: str = 'INFO'):
+    """
+    Follows the pages of a list and yields the links in the position range of the source.
+    Pages are fetched one by one as the links are consumed. Paging stops at the last position, at max_pages,
+    or at a page without new positions ( empty, or a repeated last page ).
+    :param p_source: ListSource
+        List to read.
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given
+    :param p_log_level: str
+        Log level to logging
+    :return: generator
+        ( position, movie URL ) tuples in list order
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
+
+    l_last_position = 0
+    for l_page in range(1, p_source.max_pages + 1):
+        l_url = page_url(p_source.url, l_page)
+
+        logger.debug('Starting on URL: %s', l_url)
+
+        try:
+            with imdb_metrics.timed('list_fetch'):
+                l_content = l_client.get(l_url, p_priority=imdb_http_client.PRIORITY_LIST).content
+        except requests.RequestException as rqe:
+            l_exc_msg = f'Connection error occured while trying to reach "{l_url}":\n{rqe}'
+            logger.error(l_exc_msg)
+            raise rqe
+
+        l_new_links = [x for x in parse_list_page(p_content=l_content, p_url=l_url, p_log_level=p_log_level)
+                       if x[0] > l_last_position]
+
+        if not l_new_links:
+            break
+
+        for l_position, l_movie_url in l_new_links:
+            if p_source.last is not None and l_position > p_source.last:
+                return
+            if l_position >= p_source.first:
+                yield l_position, l_movie_url
+
+        l_last_position = l_new_links[-1][0]
+
+        logger.info(f'List "{p_source.name}" page {l_page} read, last position: {l_last_position}')
+
+
+def collect_list_links(p_sources: list, p_client: imdb_http_client.HttpClient = None,
+                       p_log_level: str = 'INFO') -> tuple:
+    """
+    Reads the links of several lists and deduplicates the titles they share by title ID,
+    so every movie page is fetched once.
+    :param p_sources: list
+        ListSource objects.
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given
+    :param p_log_level: str
+        Log level to logging
+    :return: tuple
+        ( unique movie URLs in first seen order, movie URL -> list of ( source name, position ) memberships )
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_titles = {}  # Title ID -> ( URL seen first, memberships ), insertion ordered
+    l_links = 0
+    for l_source in p_sources:
+        for l_position, l_url in iter_list_links(p_source=l_source, p_client=p_client, p_log_level=p_log_level):
+            l_entry = l_titles.setdefault(imdb_records.title_id_from_url(l_url), (l_url, []))
+            l_entry[1].append((l_source.name, l_position))
+            l_links += 1
+
+    logger.info(f'{l_links} links in {len(p_sources)} lists, {len(l_titles)} unique titles')
+
+    return [x[0] for x in l_titles.values()], dict(l_titles.values())
@@ -0,0 +1,36 @@
+import config as c
+
+
+class Excerpt:
+    """
+    Log argument that stands for a large value ( page content, soup, JSON ) and formats only its beginning.
+    Formatting happens when the record is emitted: logger.debug('Content: %s', Excerpt(p_content)) costs nothing
+    below DEBUG level, and never copies more than the excerpt of raw bytes.
+    """
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, p_value, p_limit: int = c.log_excerpt_chars):
+        """
+        :param p_value:
+            Value to log: bytes, str or any object with a string form ( e.g. a BeautifulSoup tree ).
+        :param p_limit: int
+            Number of characters kept.
+        """
+        self.value = p_value
+        self.limit = p_limit
+
+    def __str__(self) -> str:
+        if isinstance(self.value, (bytes, bytearray, memoryview)):
+            l_size = len(self.value)
+            l_text = bytes(self.value[:self.limit]).decode('utf-8', errors='replace')
+        else:
+            l_text = self.value if isinstance(self.value, str) else str(self.value)
+            l_size = len(l_text)
+            l_text = l_text[:self.limit]
+
+        if l_size <= self.limit:
+            return l_text
+
+        return f'{l_text} ... ( {l_size} in total )'
+
+    __repr__ = __str__
@@ -0,0 +1,221 @@
+import os
+import io
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import logging
+import config as c
+
+# Stage timings of the current unit of work, set by collect_timings ( per title, also in parser processes )
+_local = threading.local()
+
+
+class RunMetrics:
+    """
+    Thread safe collector of stage timings of a run, in total and per title.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}  # Stage -> [ count, total seconds, maximum seconds ]
+        self.titles = {}  # Title URL -> { stage -> seconds }
+
+    def add(self, p_stage: str, p_seconds: float):
+        """
+        :param p_stage: str
+            Name of the stage, e.g. "parse".
+        :param p_seconds: float
+            Time spent in the stage.
+        :return: None
+        """
+        with self._lock:
+            l_stage = self.stages.setdefault(p_stage, [0, 0.0, 0.0])
+            l_stage[0] += 1
+            l_stage[1] += p_seconds
+            l_stage[2] = max(l_stage[2], p_seconds)
+
+    def add_title(self, p_title: str, p_timings: dict):
+        """
+        Records the stage timings of a title, as returned by collect_timings.
+        :param p_title: str
+            URL of the movie page.
+        :param p_timings: dict
+            Stage -> seconds.
+        :return: None
+        """
+        for l_stage, l_seconds in p_timings.items():
+            self.add(l_stage, l_seconds)
+
+        with self._lock:
+            self.titles.setdefault(p_title, {}).update(p_timings)
+
+    def report(self, p_client=None) -> dict:
+        """
+        :param p_client: imdb_http_client.HttpClient
+            Client of the run, adds network usage and per-title fetch times when given.
+        :return: dict
+            JSON serializable run report
+        """
+        with self._lock:
+            l_stages = {k: {'count': v[0], 'total': round(v[1], 4), 'mean': round(v[1] / v[0], 4), 'max': round(v[2], 4)}
+                        for k, v in self.stages.items()}
+            l_titles = {k: {s: round(x, 4) for s, x in v.items()} for k, v in self.titles.items()}
+
+        l_report = {'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                    'elapsed': round(time.time() - self.started, 3),
+                    'stages': l_stages,
+                    'titles': l_titles}
+
+        if p_client is not None:
+            l_report['network'] = p_client.stats.summary()
+
+            for l_request in list(p_client.stats.requests):
+                if l_request['url'] in l_titles:
+                    l_titles[l_request['url']].update({'fetch': round(l_request['elapsed'], 4),
+                                                       'bytes': l_request['bytes'],
+                                                       'retries': l_request['retries'],
+                                                       'cache': l_request['cache']})
+
+            l_fetches = [x['fetch'] for x in l_titles.values() if 'fetch' in x]
+            if l_fetches:
+                l_stages['page_fetch'] = {'count': len(l_fetches), 'total': round(sum(l_fetches), 4),
+                                          'mean': round(sum(l_fetches) / len(l_fetches), 4), 'max': max(l_fetches)}
+
+        return l_report
+
+
+_run_metrics = RunMetrics()
+
+
+def get_run_metrics() -> RunMetrics:
+    """
+    :return: RunMetrics
+        Metrics of the current run
+    """
+    return _run_metrics
+
+
+def start_run() -> RunMetrics:
+    """
+    Starts collecting the metrics of a new run.
+    :return: RunMetrics
+        Metrics of the new run
+    """
+    global _run_metrics
+    _run_metrics = RunMetrics()
+
+    return _run_metrics
+
+
+@contextmanager
+def timed(p_stage: str):
+    """
+    Times the block as p_stage. Inside collect_timings the time belongs to the current title,
+    elsewhere it is added to the metrics of the run.
+    :param p_stage: str
+        Name of the stage.
+    """
+    l_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        l_elapsed = time.perf_counter() - l_start
+        l_timings = getattr(_local, 'timings', None)
+
+        if l_timings is not None:
+            l_timings[p_stage] = l_timings.get(p_stage, 0.0) + l_elapsed
+        else:
+            _run_metrics.add(p_stage, l_elapsed)
+
+
+def collect_timings(p_function, p_content):
+    """
+    Calls p_function and collects the stages timed during the call. Picklable with functools.partial,
+    so it can wrap a parse function running in a parser process.
+    :param p_function:
+        Function called with p_content.
+    :param p_content:
+        Argument of p_function, e.g. page content.
+    :return: tuple
+        ( return value of p_function, stage -> seconds dict )
+    """
+    _local.timings = {}
+    try:
+        return p_function(p_content), _local.timings
+    finally:
+        _local.timings = None
+
+
+def write_report(p_report: dict, p_file: str, p_log_level: str = 'INFO'):
+    """
+    Writes a run report as JSON, replacing the file atomically.
+    :param p_report: dict
+        Report, as returned by RunMetrics.report.
+    :param p_file: str
+        Target file name / path.
+    :param p_log_level: str
+        Log level to logging
+    :return: None
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_tmp_file = f'{p_file}.tmp'
+    with open(l_tmp_file, 'w', encoding='utf-8') as l_file:
+        json.dump(p_report, l_file, indent=2)
+    os.replace(l_tmp_file, p_file)
+
+    logger.info(f'Run report written: {p_file}')
+
+
+@contextmanager
+def profiled(p_file: str, p_profiler: str = c.profiler, p_log_level: str = 'INFO'):
+    """
+    Profiles the block and writes the result to p_file.
+    :param p_file: str
+        Target file name / path: cProfile stats ( open with pstats or snakeviz ) or pyinstrument HTML.
+    :param p_profiler: str
+        'cprofile' or 'pyinstrument' ( needs pyinstrument installed ).
+    :param p_log_level: str
+        Log level to logging
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    if p_profiler == 'pyinstrument':
+        from pyinstrument import Profiler  # Optional dependency, only needed here
+
+        l_profiler = Profiler()
+        l_profiler.start()
+        try:
+            yield
+        finally:
+            l_profiler.stop()
+            with open(p_file, 'w', encoding='utf-8') as l_file:
+                l_file.write(l_profiler.output_html())
+    elif p_profiler == 'cprofile':
+        import cProfile
+        import pstats
+
+        l_profiler = cProfile.Profile()
+        l_profiler.enable()
+        try:
+            yield
+        finally:
+            l_profiler.disable()
+            l_profiler.dump_stats(p_file)
+
+            l_top = io.StringIO()
+            pstats.Stats(l_profiler, stream=l_top).sort_stats('cumulative').print_stats(15)
+            logger.info('Top functions by cumulative time:\n%s', l_top.getvalue())
+    else:
+        raise ValueError(f'Unknown profiler: "{p_profiler}", available: cprofile, pyinstrument')
+
+    logger.info(f'Profile written: {p_file}')
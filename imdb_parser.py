@@ -0,0 +1,162 @@
+import re
+import html
+import importlib.util
+from typing import NamedTuple, TYPE_CHECKING
+import logging
+import config as c
+import imdb_awards
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup  # Imported by the soup backends when used, the fast backend does not need it
+
+# Class of the metadata list anchors, the awards summary ( e.g. 'Won 11 Oscars' ) is one of them
+AWARD_LABEL_CLASS = 'ipc-metadata-list-item__label ipc-metadata-list-item__label--link'
+
+_JSON_SCRIPT_PATTERN = re.compile(rb'<script[^>]*\stype="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL)
+_LABEL_PATTERN = re.compile(rb'<a[^>]*\sclass="' + AWARD_LABEL_CLASS.encode() + rb'"[^>]*>(.*?)</a>', re.DOTALL)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+class ParsedPage(NamedTuple):
+    """
+    The parts of a movie page needed for extraction.
+    """
+    json_text: str  # Text of the first application/ld+json script
+    labels: list  # Texts of the metadata list anchors
+
+
+class SectionScanner:
+    """
+    Tells a streamed download when the bytes read so far hold every section the parsers need: the application
+    JSON script and the awards item, the rest of the page can be left unread. A page without an awards item is
+    read to the end. Keeps its position between calls, each chunk is scanned about once.
+    Passed as p_complete_factory to imdb_http_client.HttpClient.get, which creates one instance per attempt.
+    """
+    __slots__ = ('_json_end', '_scanned')
+
+    # The awards item is a few hundred bytes, an item cut by a chunk boundary is found again with this overlap
+    OVERLAP = 8 * 1024
+
+    def __init__(self):
+        self._json_end = None  # End of the application JSON script, the awards item comes after it
+        self._scanned = 0  # Bytes scanned for the awards item so far
+
+    def __call__(self, p_content: bytearray) -> bool:
+        """
+        :param p_content: bytearray
+            Bytes of the page read so far.
+        :return: bool
+            True when the rest of the page is not needed
+        """
+        if self._json_end is None:
+            l_match = _JSON_SCRIPT_PATTERN.search(p_content)
+            if l_match is None:
+                return False
+            self._json_end = self._scanned = l_match.end()
+
+        l_start = max(self._json_end, self._scanned - self.OVERLAP)
+        self._scanned = len(p_content)
+
+        return imdb_awards.AWARDS_ITEM_PATTERN.search(p_content, l_start) is not None
+
+
+class ParseError(Exception):
+    """
+    Raised when a parser backend does not find the application JSON in the page.
+    """
+
+
+def parse_page_soup(p_content: bytes) -> ParsedPage:
+    """
+    Reference backend: builds the full BeautifulSoup tree of the page.
+    :param p_content: bytes
+        Content of the page.
+    :return: ParsedPage
+        Application JSON text and metadata labels
+    """
+    from bs4 import BeautifulSoup
+
+    return _parsed_page_from_soup(BeautifulSoup(p_content, 'html.parser'))
+
+
+def parse_page_strainer(p_content: bytes) -> ParsedPage:
+    """
+    Builds a tree restricted to script and anchor tags, with lxml when it is installed.
+    :param p_content: bytes
+        Content of the page.
+    :return: ParsedPage
+        Application JSON text and metadata labels
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    l_features = 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+
+    l_strainer = SoupStrainer(['script', 'a'])
+
+    return _parsed_page_from_soup(BeautifulSoup(p_content, l_features, parse_only=l_strainer))
+
+
+def parse_page_fast(p_content: bytes) -> ParsedPage:
+    """
+    Scans the raw bytes for the application JSON script and the metadata labels without building a tree.
+    :param p_content: bytes
+        Content of the page.
+    :return: ParsedPage
+        Application JSON text and metadata labels
+    """
+    l_match = _JSON_SCRIPT_PATTERN.search(p_content)
+
+    if l_match is None:
+        raise ParseError('No application JSON script found in page content')
+
+    l_labels = [html.unescape(_TAG_PATTERN.sub('', x.decode('utf-8', errors='replace')))
+                for x in _LABEL_PATTERN.findall(p_content)]
+
+    return ParsedPage(json_text=l_match.group(1).decode('utf-8', errors='replace'), labels=l_labels)
+
+
+def _parsed_page_from_soup(p_soup: 'BeautifulSoup') -> ParsedPage:
+
+    l_script = p_soup.find('script', type='application/ld+json')
+
+    if l_script is None:
+        raise ParseError('No application JSON script found in page content')
+
+    return ParsedPage(json_text=l_script.text,
+                      labels=[x.text for x in p_soup.find_all('a', attrs={'class': AWARD_LABEL_CLASS})])
+
+
+PARSER_BACKENDS = {'fast': parse_page_fast,
+                   'strainer': parse_page_strainer,
+                   'soup': parse_page_soup}
+
+
+def parse_page(p_content: bytes, p_backend: str = c.parser_backend, p_log_level: str = 'INFO') -> ParsedPage:
+    """
+    Parses a movie page with the chosen backend, falling back to the full soup parse when it fails.
+    :param p_content: bytes
+        Content of the page.
+    :param p_backend: str
+        Name of the backend, one of PARSER_BACKENDS.
+    :param p_log_level: str
+        Log level to logging
+    :return: ParsedPage
+        Application JSON text and metadata labels
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    if p_backend not in PARSER_BACKENDS:
+        raise ValueError(f'Unknown parser backend: "{p_backend}", available: {list(PARSER_BACKENDS)}')
+
+    try:
+        return PARSER_BACKENDS[p_backend](p_content)
+    except ParseError as pe:
+        if p_backend == 'soup':
+            raise pe
+
+        logger.warning(f'Parser backend "{p_backend}" failed, falling back to soup: {pe}')
+
+        return parse_page_soup(p_content)
@@ -0,0 +1,196 @@
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import logging
+import config as c
+import imdb_fetcher
+import imdb_http_client
+
+
+def _process_context():
+    """
+    Start method of the parser processes. Forking a process that already runs fetch threads can copy locks held
+    by those threads, so a fresh interpreter is used ( forkserver where available, spawn elsewhere ).
+    """
+    l_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(l_method)
+
+
+def iter_pipeline(p_url_list: list,
+                  p_parse_function,
+                  p_client: imdb_http_client.HttpClient = None,
+                  p_max_workers: int = c.max_workers,
+                  p_parse_workers: int = c.parse_workers,
+                  p_queue_size: int = c.parse_queue_size,
+                  p_in_process: bool = c.parse_in_process,
+                  p_log_level: str = 'INFO',
+                  p_return_errors: bool = False):
+    """
+    Downloads pages on a thread pool and parses them on a process pool at the same time.
+    Downloaded pages wait in a bounded queue, so fetching pauses when parsing falls behind.
+    Only the raw page bytes are sent to the parser processes.
+    Results are yielded as soon as they are parsed, closing the generator early stops the remaining work.
+    :param p_url_list: list
+        URLs to download.
+    :param p_parse_function:
+        Module level function called with the page content as bytes, it's return value is yielded.
+        Must be picklable, bound arguments can be given with functools.partial.
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given.
+    :param p_max_workers: int
+        Number of pages downloaded in parallel.
+    :param p_parse_workers: int
+        Number of parser processes, 0 means one per CPU core.
+    :param p_queue_size: int
+        Maximum number of downloaded pages waiting for the parser.
+    :param p_in_process: bool
+        Parse in the calling process instead of the process pool ( debugging ).
+    :param p_log_level: str
+        Log level to logging
+    :param p_return_errors: bool
+        Yield the exception of a failed page as its result and go on, instead of raising it and stopping the run.
+    :return: generator
+        ( index in p_url_list, result of p_parse_function ) tuples in completion order
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_parse_workers = p_parse_workers if p_parse_workers > 0 else (os.cpu_count() or 1)
+
+    logger.info(f'Started pipeline for {len(p_url_list)} pages, {p_max_workers} fetch workers, '
+                f'{"in-process parsing" if p_in_process else f"{l_parse_workers} parse processes"}')
+
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
+
+    l_fetched = queue.Queue(maxsize=max(1, p_queue_size))  # (index, content or exception) waiting for the parser
+    l_abort = threading.Event()  # Set when the run failed or was closed, remaining fetches are skipped
+
+    def fetch(p_index: int, p_url: str):
+        if l_abort.is_set():
+            return
+        try:
+            l_item = imdb_fetcher.fetch_page(p_url=p_url, p_client=l_client, p_log_level=p_log_level)
+        except Exception as e:  # Handed over to the parsing side, raised there
+            l_item = e
+        while not l_abort.is_set():  # Blocks while the queue is full
+            try:
+                l_fetched.put((p_index, l_item), timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    # Parser processes are started before the fetch threads, see _process_context
+    l_parse_pool = None if p_in_process else ProcessPoolExecutor(max_workers=l_parse_workers,
+                                                                 mp_context=_process_context())
+
+    def result(p_future):
+        try:
+            return p_future.result()
+        except Exception as e:
+            if not p_return_errors:
+                raise
+            return e
+
+    def parse_in_process(p_content: bytes):
+        try:
+            return p_parse_function(p_content)
+        except Exception as e:
+            if not p_return_errors:
+                raise
+            return e
+
+    l_yielded = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, p_max_workers)) as fetch_pool:
+            for l_index, l_url in enumerate(p_url_list):
+                fetch_pool.submit(fetch, l_index, l_url)
+
+            try:
+                l_in_flight = {}  # Parse future -> index
+                for _ in range(len(p_url_list)):
+                    l_index, l_item = l_fetched.get()
+
+                    if isinstance(l_item, Exception):
+                        if not p_return_errors:
+                            raise l_item
+                        l_yielded += 1
+                        yield l_index, l_item
+                        continue
+
+                    if l_parse_pool is None:
+                        l_yielded += 1
+                        yield l_index, parse_in_process(l_item)
+                        continue
+
+                    l_in_flight[l_parse_pool.submit(p_parse_function, l_item)] = l_index
+
+                    # Keep a bounded number of pages on the parser side as well
+                    if len(l_in_flight) >= 2 * l_parse_workers:
+                        l_done, _ = wait(l_in_flight, return_when=FIRST_COMPLETED)
+                        for l_future in l_done:
+                            l_yielded += 1
+                            yield l_in_flight.pop(l_future), result(l_future)
+
+                while l_in_flight:
+                    l_done, _ = wait(l_in_flight, return_when=FIRST_COMPLETED)
+                    for l_future in l_done:
+                        l_yielded += 1
+                        yield l_in_flight.pop(l_future), result(l_future)
+            except BaseException:  # Includes GeneratorExit when the consumer stops early
+                l_abort.set()  # Lets the fetch threads finish, so the thread pool can shut down
+                for l_future in l_in_flight:
+                    l_future.cancel()
+                raise
+    finally:
+        if l_parse_pool is not None:
+            l_parse_pool.shutdown(wait=True)
+
+        logger.info(f'Finished pipeline, {l_yielded} of {len(p_url_list)} pages processed')
+
+
+def run_pipeline(p_url_list: list,
+                 p_parse_function,
+                 p_client: imdb_http_client.HttpClient = None,
+                 p_max_workers: int = c.max_workers,
+                 p_parse_workers: int = c.parse_workers,
+                 p_queue_size: int = c.parse_queue_size,
+                 p_in_process: bool = c.parse_in_process,
+                 p_log_level: str = 'INFO') -> list:
+    """
+    Runs iter_pipeline to the end and collects the results.
+    :param p_url_list: list
+        URLs to download.
+    :param p_parse_function:
+        Module level function called with the page content as bytes, see iter_pipeline.
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given.
+    :param p_max_workers: int
+        Number of pages downloaded in parallel.
+    :param p_parse_workers: int
+        Number of parser processes, 0 means one per CPU core.
+    :param p_queue_size: int
+        Maximum number of downloaded pages waiting for the parser.
+    :param p_in_process: bool
+        Parse in the calling process instead of the process pool ( debugging ).
+    :param p_log_level: str
+        Log level to logging
+    :return: list
+        Results of p_parse_function, in the order of p_url_list
+    """
+    l_results = [None] * len(p_url_list)
+
+    for l_index, l_result in iter_pipeline(p_url_list=p_url_list,
+                                           p_parse_function=p_parse_function,
+                                           p_client=p_client,
+                                           p_max_workers=p_max_workers,
+                                           p_parse_workers=p_parse_workers,
+                                           p_queue_size=p_queue_size,
+                                           p_in_process=p_in_process,
+                                           p_log_level=p_log_level):
+        l_results[l_index] = l_result
+
+    return l_results
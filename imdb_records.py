@@ -0,0 +1,259 @@
+import re
+import datetime
+from array import array
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+# Columns of the scraped movie DataFrame, in order
+MOVIE_COLUMNS = ["name", "release_date", "rating", "votes", "oscars"]
+
+# IMDB title ID in movie URLs, e.g. https://www.imdb.com/title/tt0111161/
+TITLE_ID_PATTERN = re.compile(r'tt\d+')
+
+# Release date of movies without a published date
+UNKNOWN_DATE = 'N/A'
+
+
+def title_id_from_url(p_url: str) -> str:
+    """
+    :param p_url: str
+        URL of a movie page.
+    :return: str
+        IMDB title ID, e.g. "tt0111161", the URL itself when it has no title ID
+    """
+    l_match = TITLE_ID_PATTERN.search(p_url)
+
+    return l_match.group(0) if l_match else p_url
+
+
+def parse_release_date(p_value) -> datetime.date:
+    """
+    :param p_value: str
+        Release date as published on the movie page ( "YYYY-MM-DD" ), a date, or 'N/A' / empty when not published.
+    :return: datetime.date
+        Release date, None when not published
+    """
+    if p_value is None or isinstance(p_value, datetime.date):
+        return p_value
+
+    if p_value in ('', UNKNOWN_DATE):
+        return None
+
+    try:
+        return datetime.date.fromisoformat(p_value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Release date is not in YYYY-MM-DD format: {p_value!r}')
+
+
+def format_release_date(p_value: datetime.date) -> str:
+    """
+    :param p_value: datetime.date
+        Release date, None when not published.
+    :return: str
+        "YYYY-MM-DD", 'N/A' when not published
+    """
+    return UNKNOWN_DATE if p_value is None else p_value.isoformat()
+
+
+def to_rating(p_value) -> float:
+    """
+    :param p_value:
+        Rating from the application JSON, a number or a string like "9.3".
+    :return: float
+        Rating
+    """
+    return float(p_value)
+
+
+def to_count(p_value) -> int:
+    """
+    :param p_value:
+        Count from the application JSON, a number or a string, possibly with thousands separators.
+    :return: int
+        Count
+    """
+    return int(p_value.replace(',', '')) if isinstance(p_value, str) else int(p_value)
+
+
+class MovieRecord:
+    """
+    Scraped data of a single movie of a list, normalized once when the record is made:
+    the release date is parsed, rating, votes and Oscars are numbers whatever type the page had.
+    Slotted, a run of many titles keeps no per-record attribute dictionaries.
+    """
+    __slots__ = ('position', 'url', 'title_id', 'name', 'release_date', 'rating', 'votes', 'oscars')
+
+    def __init__(self, position: int, url: str, name: str, release_date, rating, votes, oscars, title_id: str = None):
+        """
+        :param position: int
+            Position of the movie in the source list.
+        :param url: str
+            URL of the movie page.
+        :param name: str
+            Title of the movie.
+        :param release_date: str
+            Release date, see parse_release_date.
+        :param rating:
+            Rating, see to_rating.
+        :param votes:
+            Number of votes, see to_count.
+        :param oscars:
+            Number of Oscars won, see to_count.
+        :param title_id: str
+            IMDB title ID, taken from the URL when not given.
+        """
+        self.position = int(position)
+        self.url = url
+        self.title_id = title_id if title_id is not None else title_id_from_url(url)
+        self.name = name
+        self.release_date = parse_release_date(release_date)  # datetime.date, None when not published
+        self.rating = to_rating(rating)
+        self.votes = to_count(votes)
+        self.oscars = to_count(oscars)
+
+    @classmethod
+    def from_row(cls, p_position: int, p_url: str, p_row: list) -> 'MovieRecord':
+        """
+        :param p_position: int
+            Position of the movie in the source list.
+        :param p_url: str
+            URL of the movie page.
+        :param p_row: list
+            Extracted fields in MOVIE_COLUMNS order, as returned by imdb_scraper.extract_imdb_data.
+        :return: MovieRecord
+            New record
+        """
+        return cls(p_position, p_url, *p_row)
+
+    def _replace(self, **kwargs) -> 'MovieRecord':
+        """
+        :param kwargs:
+            Fields to change.
+        :return: MovieRecord
+            Copy of the record with the given fields changed
+        """
+        l_fields = {x: getattr(self, x) for x in self.__slots__}
+        l_fields.update(kwargs)
+
+        return MovieRecord(**l_fields)
+
+    def to_row(self) -> list:
+        """
+        :return: list
+            Fields in MOVIE_COLUMNS order, the release date as "YYYY-MM-DD" or 'N/A'
+        """
+        return [self.name, format_release_date(self.release_date), self.rating, self.votes, self.oscars]
+
+    def __eq__(self, p_other) -> bool:
+        if not isinstance(p_other, MovieRecord):
+            return NotImplemented
+
+        return all(getattr(self, x) == getattr(p_other, x) for x in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f'MovieRecord({", ".join(f"{x}={getattr(self, x)!r}" for x in self.__slots__)})'
+
+
+class FailedTitle(NamedTuple):
+    """
+    A movie of a list that could not be scraped.
+    """
+    position: int  # Position of the movie in the source list
+    url: str  # URL of the movie page
+    error: Exception  # Fetch or parse error
+
+
+class MovieColumnBuilder:
+    """
+    Collects records column by column: numbers go to typed arrays ( 8 bytes a value ), only the texts stay objects.
+    Records can be added as they are streamed and dropped right away, the DataFrame is built without per-row lists
+    and without dtype inference.
+    """
+
+    def __init__(self):
+        self.lists = array('q')  # Index of the list of a record, see to_dataframe
+        self.positions = array('q')
+        self.title_ids = []
+        self.names = []
+        self.release_dates = []
+        self.ratings = array('d')
+        self.votes = array('q')
+        self.oscars = array('q')
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def append(self, p_record: MovieRecord, p_list: int = 0, p_position: int = None):
+        """
+        :param p_record: MovieRecord
+            Record to add.
+        :param p_list: int
+            Index of the list the record is added for, a title of several lists is added once per list.
+        :param p_position: int
+            Position in that list, the position of the record when not given.
+        """
+        self.lists.append(p_list)
+        self.positions.append(p_record.position if p_position is None else p_position)
+        self.title_ids.append(p_record.title_id)
+        self.names.append(p_record.name)
+        self.release_dates.append(format_release_date(p_record.release_date))
+        self.ratings.append(p_record.rating)
+        self.votes.append(p_record.votes)
+        self.oscars.append(p_record.oscars)
+
+    def extend(self, p_records) -> 'MovieColumnBuilder':
+        """
+        :param p_records: iterable
+            MovieRecord objects to add.
+        :return: MovieColumnBuilder
+            The builder itself
+        """
+        for l_record in p_records:
+            self.append(l_record)
+
+        return self
+
+    def to_dataframe(self, p_title_ids: bool = False, p_sort: bool = False, p_lists: list = None) -> pd.DataFrame:
+        """
+        :param p_title_ids: bool
+            Add a leading "title_id" column.
+        :param p_sort: bool
+            Order the rows by list and list position instead of the order the records were added in.
+        :param p_lists: list
+            Names of the lists by index: adds leading "list" ( categorical, in this order ) and "position" columns.
+        :return: pandas.DataFrame
+            One row per record with MOVIE_COLUMNS: float64 rating, int64 votes and oscars
+        """
+        l_columns = {'list': np.frombuffer(self.lists, dtype=np.int64),
+                     'position': np.frombuffer(self.positions, dtype=np.int64),
+                     'title_id': np.array(self.title_ids, dtype=object),
+                     'name': np.array(self.names, dtype=object),
+                     'release_date': np.array(self.release_dates, dtype=object),
+                     'rating': np.frombuffer(self.ratings, dtype=np.float64),
+                     'votes': np.frombuffer(self.votes, dtype=np.int64),
+                     'oscars': np.frombuffer(self.oscars, dtype=np.int64)}
+
+        if p_sort:
+            l_order = np.lexsort((l_columns['position'], l_columns['list']))  # Stable, by list, then position
+            l_columns = {k: v[l_order] for k, v in l_columns.items()}
+
+        l_names = (['list', 'position'] if p_lists is not None else []) + (['title_id'] if p_title_ids else []) \
+            + MOVIE_COLUMNS
+
+        if p_lists is not None:
+            l_columns['list'] = pd.Categorical.from_codes(l_columns['list'], categories=p_lists)
+
+        return pd.DataFrame({x: l_columns[x] for x in l_names}, copy=True)  # The frame does not share the buffers
+
+
+def records_to_dataframe(p_records: list, p_title_ids: bool = False) -> pd.DataFrame:
+    """
+    :param p_records: list
+        MovieRecord objects, in list order.
+    :param p_title_ids: bool
+        Add a leading "title_id" column.
+    :return: pandas.DataFrame
+        One row per record with MOVIE_COLUMNS, see MovieColumnBuilder.to_dataframe
+    """
+    return MovieColumnBuilder().extend(p_records).to_dataframe(p_title_ids=p_title_ids)
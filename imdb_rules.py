@@ -0,0 +1,228 @@
+import json
+import numpy as np
+import pandas as pd
+import logging
+import config as c
+
+VOTE_PENALTY_TYPES = ('step', 'log', 'none')
+
+# Vote penalty of a rule set without "vote_penalty" or a "type" in it: 'step' with 0 points, i.e. no penalty
+# until points are given
+DEFAULT_VOTE_PENALTY = {'type': 'step', 'step': 100000, 'points': 0}
+
+
+class AwardRule:
+    """
+    Tiered adjustment by the number of awards in a column, values[i] applies from bounds[i - 1] awards.
+    """
+
+    def __init__(self, p_column: str, p_bounds: list, p_values: list):
+        """
+        :param p_column: str
+            Column holding the number of awards, e.g. "oscars".
+        :param p_bounds: list
+            Ascending lower bounds of the tiers after the first.
+        :param p_values: list
+            Adjustment of each tier, one more than the bounds.
+        """
+        if len(p_values) != len(p_bounds) + 1:
+            raise ValueError(f'Award rule on "{p_column}" needs one more value than bounds: {p_bounds}, {p_values}')
+        if list(p_bounds) != sorted(p_bounds):
+            raise ValueError(f'Award rule bounds on "{p_column}" are not ascending: {p_bounds}')
+
+        self.column = p_column
+        self.bounds = np.asarray(p_bounds)
+        self.values = np.asarray(p_values, dtype=np.float64)
+        self.key = (p_column, tuple(p_bounds), tuple(p_values))  # Identical rules are evaluated once per batch
+
+    def evaluate(self, p_awards: np.ndarray) -> np.ndarray:
+        """
+        :param p_awards: numpy.ndarray
+            Number of awards of the movies.
+        :return: numpy.ndarray
+            Adjustment of every movie
+        """
+        return tier_adjustments(p_awards, self.bounds, self.values, self.column)
+
+
+class RuleSet:
+    """
+    Compiled adjustment rules: vote penalty relative to the best rated movies and award adjustments.
+    """
+
+    def __init__(self, p_name: str, p_spec: dict):
+        """
+        :param p_name: str
+            Name of the rule set, used as column name of its adjusted ratings.
+        :param p_spec: dict
+            Declaration of the rules, see config.adjustment_rule_sets.
+        """
+        self.name = p_name
+        self.top_n = int(p_spec.get('top_n', 20))
+        self.decimals = int(p_spec.get('decimals', 1))
+
+        l_penalty = dict(DEFAULT_VOTE_PENALTY, **p_spec.get('vote_penalty', {}))
+        self.penalty_type = l_penalty['type']
+        if self.penalty_type not in VOTE_PENALTY_TYPES:
+            raise ValueError(f'Unknown vote penalty type in rule set "{p_name}": "{self.penalty_type}", '
+                             f'available: {VOTE_PENALTY_TYPES}')
+        self.penalty_step = l_penalty['step']
+        self.penalty_points = l_penalty['points']
+        self.penalty_key = (self.top_n, self.penalty_type, self.penalty_step, self.penalty_points)
+
+        self.awards = [AwardRule(p_column=x['column'], p_bounds=x['bounds'], p_values=x['values'])
+                       for x in p_spec.get('awards', [])]
+
+    def penalty(self, p_votes: np.ndarray, p_max_votes) -> np.ndarray:
+        """
+        :param p_votes: numpy.ndarray
+            Number of votes of the movies.
+        :param p_max_votes:
+            Benchmark number of votes.
+        :return: numpy.ndarray
+            Penalty of every movie
+        """
+        if self.penalty_type == 'step':
+            return (p_max_votes - p_votes) // self.penalty_step * self.penalty_points
+
+        if self.penalty_type == 'log':
+            with np.errstate(divide='ignore'):
+                return np.log10(p_max_votes / np.maximum(p_votes, 1)) * self.penalty_points
+
+        return np.zeros(len(p_votes))
+
+
+def tier_adjustments(p_values, p_bounds: np.ndarray, p_adjustments: np.ndarray, p_column: str = 'oscars') -> np.ndarray:
+    """
+    Looks up the tier of every value with a single binary search.
+    :param p_values: array-like
+        Number of awards of the movies.
+    :param p_bounds: numpy.ndarray
+        Ascending lower bounds of the tiers after the first.
+    :param p_adjustments: numpy.ndarray
+        Adjustment of each tier.
+    :param p_column: str
+        Name of the awards, used in the error message.
+    :return: numpy.ndarray
+        Adjustment of every movie
+    """
+    l_values = np.asarray(p_values)
+
+    if l_values.size and l_values.min() < 0:
+        raise Exception(f'The number of {p_column} parameter is below zero ("{l_values[l_values < 0][0]}"). '
+                        f'No movie is THAT bad.')
+
+    return p_adjustments[np.searchsorted(p_bounds, l_values, side='right')]
+
+
+def top_rated_max_votes(p_rating: np.ndarray, p_votes: np.ndarray, p_top: int = 20):
+    """
+    Maximum number of votes among the p_top best rated movies, found with a partial selection instead of a sort.
+    Movies tied at the last place are taken in their original order.
+    :param p_rating: numpy.ndarray
+        Ratings of the movies.
+    :param p_votes: numpy.ndarray
+        Number of votes of the movies.
+    :param p_top: int
+        Number of best rated movies to consider.
+    :return:
+        Maximum number of votes
+    """
+    if len(p_rating) <= p_top:
+        return p_votes.max()
+
+    l_threshold = -np.partition(-p_rating, p_top - 1)[p_top - 1]  # Rating of the p_top-th best movie
+
+    l_above = p_rating > l_threshold
+    l_tied = np.flatnonzero(p_rating == l_threshold)[:p_top - np.count_nonzero(l_above)]
+
+    return max(p_votes[l_above].max(initial=p_votes[l_tied].max()), p_votes[l_tied].max())
+
+
+def compile_rule_sets(p_specs: dict = None) -> dict:
+    """
+    Compiles rule set declarations.
+    :param p_specs: dict
+        Rule set name -> declaration, config.adjustment_rule_sets when not given.
+    :return: dict
+        Rule set name -> RuleSet
+    """
+    l_specs = c.adjustment_rule_sets if p_specs is None else p_specs
+
+    return {l_name: RuleSet(p_name=l_name, p_spec=l_spec) for l_name, l_spec in l_specs.items()}
+
+
+def load_rule_sets(p_file: str) -> dict:
+    """
+    Compiles rule set declarations from a JSON file, same structure as config.adjustment_rule_sets.
+    :param p_file: str
+        JSON file name / path.
+    :return: dict
+        Rule set name -> RuleSet
+    """
+    with open(p_file, 'r', encoding='utf-8') as l_file:
+        return compile_rule_sets(json.load(l_file))
+
+
+def get_rule_set(p_name: str = c.adjustment_rule_set) -> RuleSet:
+    """
+    :param p_name: str
+        Name of a rule set in config.adjustment_rule_sets.
+    :return: RuleSet
+        Compiled rule set
+    """
+    if p_name not in c.adjustment_rule_sets:
+        raise ValueError(f'Unknown rule set: "{p_name}", available: {list(c.adjustment_rule_sets)}')
+
+    return RuleSet(p_name=p_name, p_spec=c.adjustment_rule_sets[p_name])
+
+
+def evaluate_rule_sets(p_df: pd.DataFrame, p_rule_sets: list, p_log_level: str = 'INFO') -> pd.DataFrame:
+    """
+    Calculates the adjusted rating of every movie under every rule set in one pass over the data.
+    Columns are extracted once and parts shared by rule sets ( benchmark votes, penalties, award tiers )
+    are calculated once, so many variants cost little more than a single one.
+    :param p_df: pandas.DataFrame
+        Movie data with "rating", "votes" and the award columns used by the rule sets.
+    :param p_rule_sets: list
+        RuleSet objects.
+    :param p_log_level: str
+        Log level to logging
+    :return: pandas.DataFrame
+        Adjusted ratings, one column per rule set named after it, same index as p_df
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    l_rating = p_df['rating'].to_numpy(dtype=np.float64)
+    l_votes = p_df['votes'].to_numpy()
+
+    l_max_votes = {}  # top_n -> benchmark votes
+    l_penalties = {}  # penalty key -> penalties
+    l_awards = {}  # award rule key -> adjustments
+
+    l_result = np.empty((len(p_df), len(p_rule_sets)))
+
+    for l_index, l_rule_set in enumerate(p_rule_sets):
+
+        if l_rule_set.top_n not in l_max_votes:
+            l_max_votes[l_rule_set.top_n] = top_rated_max_votes(l_rating, l_votes, l_rule_set.top_n)
+            logger.info(f'Maximum number of votes among the top {l_rule_set.top_n}: {l_max_votes[l_rule_set.top_n]}')
+
+        if l_rule_set.penalty_key not in l_penalties:
+            l_penalties[l_rule_set.penalty_key] = l_rule_set.penalty(l_votes, l_max_votes[l_rule_set.top_n])
+
+        l_total = l_rating + l_penalties[l_rule_set.penalty_key]
+
+        for l_award in l_rule_set.awards:
+            if l_award.key not in l_awards:
+                l_awards[l_award.key] = l_award.evaluate(p_df[l_award.column].to_numpy())
+            l_total = l_total + l_awards[l_award.key]
+
+        l_result[:, l_index] = np.round(l_total, l_rule_set.decimals)
+
+    logger.info(f'Evaluated {len(p_rule_sets)} rule sets on {len(p_df)} movies')
+
+    return pd.DataFrame(l_result, index=p_df.index, columns=[x.name for x in p_rule_sets])
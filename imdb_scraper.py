@@ -1,17 +1,26 @@
 import os
+import asyncio
+from functools import partial
+from typing import TYPE_CHECKING
 import pandas as pd
-from bs4 import BeautifulSoup
-import requests
 import html
-import re
 import json
 import logging
 import config as c
+import imdb_pipeline
+import imdb_http_client
+import imdb_parser
+import imdb_records
+import imdb_metrics
+import imdb_lists
+import imdb_awards
+import imdb_logs
 
-logging.basicConfig(format=c.log_format)
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup  # Only the 'soup' parser backend builds a tree, imported there
 
 
-def extract_number_of_oscars(p_soup: BeautifulSoup, p_log_level: str = 'INFO') -> int:
+def extract_number_of_oscars(p_soup: 'BeautifulSoup', p_log_level: str = 'INFO') -> int:
     """
     Extract number of Oscars won by movie by parsing the movie page content, looking
     for the metadata list items and using regex to narrow the list.
@@ -34,21 +43,27 @@ def extract_number_of_oscars(p_soup: BeautifulSoup, p_log_level: str = 'INFO') -
                                  attrs={"class": "ipc-metadata-list-item__label ipc-metadata-list-item__label--link"})
 
     if soup_oscars is None:
-        l_exc_msg = f'No data found while looking for application Oscars in soup:\n{p_soup}'
+        l_exc_msg = f'No data found while looking for application Oscars in soup:\n{imdb_logs.Excerpt(p_soup)}'
         logger.error(l_exc_msg)
         raise Exception(l_exc_msg)
 
-    num_of_oscars = 0  # Default Oscars won is zero
-    for i in soup_oscars:  # If there is a section with relevant data, loop through
-        if re.search('Won(.+?)Oscars', i.text):  # If section contains text like 'Won X Oscars'
-            num_of_oscars = int(re.findall(r'\d+', i.text)[0])  # Extract integer of Oscars won
+    return extract_number_of_oscars_from_labels(p_labels=[i.text for i in soup_oscars], p_log_level=p_log_level)
 
-            logger.debug(f'Found Oscars: {num_of_oscars} in: {i.text}')
 
-    return num_of_oscars
+def extract_number_of_oscars_from_labels(p_labels: list, p_log_level: str = 'INFO') -> int:
+    """
+    Extract number of Oscars won by movie from the texts of the metadata list items, see imdb_awards.
+    :param p_labels: list
+        Texts of the metadata list items of the movie page.
+    :param p_log_level: str
+        Log level to logging
+    :return: int
+        Number of Oscars won by movie
+    """
+    return imdb_awards.awards_from_labels(p_labels=p_labels, p_log_level=p_log_level).oscars
 
 
-def extract_imdb_json_from_content(p_soup: BeautifulSoup, p_log_level: str = 'INFO') -> dict:
+def extract_imdb_json_from_content(p_soup: 'BeautifulSoup', p_log_level: str = 'INFO') -> dict:
     """
     Extract JSON data from JavaScript application data, parses it into a dictionary.
     :param p_soup: BeautifulSoup
@@ -68,21 +83,37 @@ def extract_imdb_json_from_content(p_soup: BeautifulSoup, p_log_level: str = 'IN
     l_soup_result = p_soup.find("script", type="application/ld+json")  # Extract script data from page content
 
     if l_soup_result is None:
-        l_exc_msg = f'No data found while looking for application JSON in soup:\n{p_soup}'
+        l_exc_msg = f'No data found while looking for application JSON in soup:\n{imdb_logs.Excerpt(p_soup)}'
         logger.error(l_exc_msg)
         raise Exception(l_exc_msg)
 
-    l_soup_data = l_soup_result.text
+    return extract_imdb_json_from_text(p_text=l_soup_result.text, p_log_level=p_log_level)
+
+
+def extract_imdb_json_from_text(p_text: str, p_log_level: str = 'INFO') -> dict:
+    """
+    Parses the text of the JavaScript application data into a dictionary.
+    :param p_text: str
+        Text of the application/ld+json script of the movie page.
+    :param p_log_level: str
+        Log level to logging.
+    :return: dict
+        Parsed JSON data from JavaScript application data.
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
 
-    logger.debug(f'Script data found:\n{l_soup_data}')
+    logger.debug('Script data found:\n%s', imdb_logs.Excerpt(p_text))  # Formatted at DEBUG level only, cut short
 
     try:
-        l_imdb_data = json.loads(l_soup_data)  # Parse script data into JSON object
+        l_imdb_data = json.loads(p_text)  # Parse script data into JSON object
     except json.JSONDecodeError as jde:
         logger.error(f'Parsing JSON data failed with the following error:\n{jde}')
         raise jde
 
-    logger.debug(f'Data extracted from content:\n{l_imdb_data}')
+    logger.debug('Data extracted from content:\n%s', imdb_logs.Excerpt(l_imdb_data))
 
     return l_imdb_data
 
@@ -90,7 +121,7 @@ def extract_imdb_json_from_content(p_soup: BeautifulSoup, p_log_level: str = 'IN
 def extract_imdb_data_from_json(p_json: dict, p_log_level: str = 'INFO') -> list:
     """
     Extracts the necessary fields from the parsed JSON application data from movie page.
-    Returns them in a list ["name", "release_date", "rating", "votes", "oscars"]
+    Returns them in a list ["name", "release_date", "rating", "votes"], rating as float and votes as int
     :param p_json:
         Parsed JSON data from JavaScript application data.
     :param p_log_level: str
@@ -119,28 +150,31 @@ def extract_imdb_data_from_json(p_json: dict, p_log_level: str = 'INFO') -> list
                 f'Publish date was not found for: {l_movie_name}')  # Log a warning and set release date as "N/A"
             release_date = 'N/A'
 
+        # Rating and number of votes can be strings in the JSON, normalized to numbers here
         l_return = [l_movie_name,
                     release_date,
-                    p_json['aggregateRating']['ratingValue'],
-                    p_json['aggregateRating']['ratingCount']]
+                    imdb_records.to_rating(p_json['aggregateRating']['ratingValue']),
+                    imdb_records.to_count(p_json['aggregateRating']['ratingCount'])]
 
     except KeyError as ke:
-        l_exc_msg = f'Field not found in JSON: {ke}, JSON data:\n{p_json}'
+        l_exc_msg = f'Field not found in JSON: {ke}, JSON data:\n{imdb_logs.Excerpt(p_json)}'
         logger.error(l_exc_msg)
         raise KeyError(l_exc_msg)
 
-    logger.info(f'Finished, Extracted data: {l_return}')
+    logger.info('Finished, Extracted data: %s', l_return)
 
     return l_return
 
 
-def extract_imdb_data(p_content: bytes, p_log_level: str = 'INFO') -> list:
+def extract_imdb_data(p_content: bytes, p_log_level: str = 'INFO', p_parser: str = c.parser_backend) -> list:
     """
     Extracts data from IMDB page content: "name", "release_date", "rating", "votes", "oscars"
     :param p_content: str
         Content of the page to extract from ( Html response )
     :param p_log_level: str
         Log level to logging
+    :param p_parser: str
+        Parser backend, one of imdb_parser.PARSER_BACKENDS. 'soup' builds the full BeautifulSoup tree.
     :return: list
         List of extracted content: "name", "release_date", "rating", "votes", "oscars"
     """
@@ -151,35 +185,154 @@ def extract_imdb_data(p_content: bytes, p_log_level: str = 'INFO') -> list:
 
     logger.info('Started')
 
-    logger.debug(f'Current content:\n{p_content}')
+    logger.debug('Current content:\n%s', imdb_logs.Excerpt(p_content))  # Formatted at DEBUG level only, cut short
 
-    l_soup = BeautifulSoup(p_content, 'html.parser')  # Parse page content
+    if p_parser == 'soup':
+        from bs4 import BeautifulSoup
 
-    # Extract json data from movie page content
-    l_imdb_json = extract_imdb_json_from_content(p_soup=l_soup, p_log_level=p_log_level)
+        with imdb_metrics.timed('parse'):
+            l_soup = BeautifulSoup(p_content, 'html.parser')  # Parse page content
 
-    # Extract number of Oscars won by movie
-    l_num_of_oscars = extract_number_of_oscars(p_soup=l_soup, p_log_level=p_log_level)
+        # Extract json data from movie page content
+        with imdb_metrics.timed('json_extract'):
+            l_imdb_json = extract_imdb_json_from_content(p_soup=l_soup, p_log_level=p_log_level)
+
+        # Extract number of Oscars won by movie
+        with imdb_metrics.timed('oscar_extract'):
+            l_num_of_oscars = extract_number_of_oscars(p_soup=l_soup, p_log_level=p_log_level)
+    else:
+        # Pull only the application JSON and the metadata labels out of the page
+        with imdb_metrics.timed('parse'):
+            l_page = imdb_parser.parse_page(p_content=p_content, p_backend=p_parser, p_log_level=p_log_level)
+
+        with imdb_metrics.timed('json_extract'):
+            l_imdb_json = extract_imdb_json_from_text(p_text=l_page.json_text, p_log_level=p_log_level)
+
+        with imdb_metrics.timed('oscar_extract'):
+            l_num_of_oscars = extract_number_of_oscars_from_labels(p_labels=l_page.labels, p_log_level=p_log_level)
 
     # Extract necessary data points from json data
-    l_imdb_data = extract_imdb_data_from_json(p_json=l_imdb_json, p_log_level=p_log_level)
+    with imdb_metrics.timed('json_extract'):
+        l_imdb_data = extract_imdb_data_from_json(p_json=l_imdb_json, p_log_level=p_log_level)
 
     # Append number of Oscars won to extracted json data
     l_imdb_data.append(l_num_of_oscars)
 
-    logger.info(f'Finished, Extracted data: {l_imdb_data}')
+    logger.info('Finished, Extracted data: %s', l_imdb_data)
 
     return l_imdb_data
 
 
-def extract_imdb_top_250_data(p_log_level: str = 'INFO') -> pd.DataFrame:
+def extract_imdb_title_links(p_client: imdb_http_client.HttpClient = None, p_log_level: str = 'INFO',
+                             p_list_url: str = None, p_source: str = c.list_source) -> list:
     """
-    Extracts movie URLs from the IMDB top 250 page and mines relevant info from their content
-    Returns the data in pandas DataFrame
+    Extracts the movie links of a list source, by default the top 20 positions of the IMDB top 250 page.
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given
     :param p_log_level: str
         Log level to logging
-    :return: pandas.DataFrame
-        Extracted data
+    :param p_list_url: str
+        URL of the list page replacing the URL of the source. Movie links are resolved against it.
+    :param p_source: str
+        Name of the list source in config.list_sources, or an imdb_lists.ListSource.
+        Gives the URL, the position range and the pages to follow.
+    :return: list
+        ( position, movie URL ) tuples in list order
+    """
+    l_source = imdb_lists.get_list_source(p_source)
+    if p_list_url is not None:
+        l_source = l_source._replace(url=p_list_url)
+
+    return list(imdb_lists.iter_list_links(p_source=l_source, p_client=p_client, p_log_level=p_log_level))
+
+
+def iter_imdb_records(p_link_list: list,
+                      p_log_level: str = 'INFO',
+                      p_max_workers: int = c.max_workers,
+                      p_client: imdb_http_client.HttpClient = None,
+                      p_parser: str = c.parser_backend,
+                      p_parse_workers: int = c.parse_workers,
+                      p_in_process: bool = c.parse_in_process,
+                      p_return_errors: bool = False):
+    """
+    Downloads and parses the given movie pages, yields the data of each movie as soon as it is parsed.
+    :param p_link_list: list
+        ( position, movie URL ) tuples, as returned by extract_imdb_title_links
+    :param p_log_level: str
+        Log level to logging
+    :param p_max_workers: int
+        Number of movie pages downloaded in parallel
+    :param p_client: imdb_http_client.HttpClient
+        Client to use, the process wide default client when not given
+    :param p_parser: str
+        Parser backend of the movie pages, one of imdb_parser.PARSER_BACKENDS
+    :param p_parse_workers: int
+        Number of parser processes, 0 means one per CPU core
+    :param p_in_process: bool
+        Parse in the main process instead of the process pool ( debugging )
+    :param p_return_errors: bool
+        Yield an imdb_records.FailedTitle for a movie that could not be fetched or parsed and go on,
+        instead of raising the error
+    :return: generator
+        imdb_records.MovieRecord of each movie, in completion order
+    """
+
+    l_metrics = imdb_metrics.get_run_metrics()
+
+    # Download movie pages on threads and extract the IMDB data points on parser processes at the same time
+    # Stage timings of every title are collected where it is parsed and returned with the data
+    l_parse_function = partial(imdb_metrics.collect_timings,
+                               partial(extract_imdb_data, p_log_level=p_log_level, p_parser=p_parser))
+
+    for l_index, l_result in imdb_pipeline.iter_pipeline(p_url_list=[x[1] for x in p_link_list],
+                                                         p_parse_function=l_parse_function,
+                                                         p_client=p_client,
+                                                         p_max_workers=p_max_workers,
+                                                         p_parse_workers=p_parse_workers,
+                                                         p_in_process=p_in_process,
+                                                         p_log_level=p_log_level,
+                                                         p_return_errors=p_return_errors):
+        l_position, l_url = p_link_list[l_index]
+
+        if isinstance(l_result, Exception):
+            yield imdb_records.FailedTitle(position=l_position, url=l_url, error=l_result)
+            continue
+
+        l_row, l_timings = l_result
+        l_metrics.add_title(l_url, l_timings)
+
+        yield imdb_records.MovieRecord.from_row(p_position=l_position, p_url=l_url, p_row=l_row)
+
+
+def iter_imdb_top_250_records(p_log_level: str = 'INFO',
+                              p_max_workers: int = c.max_workers,
+                              p_client: imdb_http_client.HttpClient = None,
+                              p_parser: str = c.parser_backend,
+                              p_parse_workers: int = c.parse_workers,
+                              p_in_process: bool = c.parse_in_process,
+                              p_list_url: str = None,
+                              p_source: str = c.list_source):
+    """
+    Extracts movie URLs from the IMDB top 250 page and yields the data of each movie as soon as it is parsed.
+    Records come in completion order, MovieRecord.position holds the position in the list.
+    :param p_log_level: str
+        Log level to logging
+    :param p_max_workers: int
+        Number of movie pages downloaded in parallel
+    :param p_client: imdb_http_client.HttpClient
+        Client shared by the list and movie page fetches, the process wide default client when not given
+    :param p_parser: str
+        Parser backend of the movie pages, one of imdb_parser.PARSER_BACKENDS
+    :param p_parse_workers: int
+        Number of parser processes, 0 means one per CPU core
+    :param p_in_process: bool
+        Parse in the main process instead of the process pool ( debugging )
+    :param p_list_url: str
+        URL of the list page replacing the URL of the source
+    :param p_source: str
+        Name of the list source in config.list_sources, or an imdb_lists.ListSource
+    :return: generator
+        imdb_records.MovieRecord of each movie
     """
 
     # Initiate logging for this function, pad function name to 30 characters
@@ -188,70 +341,155 @@ def extract_imdb_top_250_data(p_log_level: str = 'INFO') -> pd.DataFrame:
 
     logger.info('Started')
 
-    l_top_250_url = c.top_250_url  # Get url from config to avoid code changes if url changes if ever
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
 
-    logger.debug(f'Starting on URL: {l_top_250_url}')
+    l_link_list = extract_imdb_title_links(p_client=l_client, p_log_level=p_log_level, p_list_url=p_list_url,
+                                           p_source=p_source)
 
-    try:
-        l_req_result = requests.get(l_top_250_url)
-    except requests.ConnectionError as ce:
-        l_exc_msg = f'Connection error occured while trying to reach "{l_top_250_url}":\n{ce}'
-        logger.error(l_exc_msg)
-        raise ce
+    yield from iter_imdb_records(p_link_list=l_link_list,
+                                 p_log_level=p_log_level,
+                                 p_max_workers=p_max_workers,
+                                 p_client=l_client,
+                                 p_parser=p_parser,
+                                 p_parse_workers=p_parse_workers,
+                                 p_in_process=p_in_process)
 
-    soup = BeautifulSoup(l_req_result.text, "html.parser")  # Parse top 250 url
+    logger.info(f'Finished, network usage: {l_client.stats.summary()}')
 
-    l_title_list_soup = soup.find('script', type="application/ld+json").text  # Find movie link list in script tag
 
-    if l_title_list_soup is None:
-        l_msg = f'No application data was found in soup:\n{l_title_list_soup}'
-        logger.error(l_msg)
-        raise Exception(l_msg)
+async def aiter_imdb_top_250_records(**kwargs):
+    """
+    Async variant of iter_imdb_top_250_records, the blocking generator runs on the default executor
+    so the event loop stays responsive while pages are fetched and parsed.
+    :param kwargs:
+        Keyword arguments of iter_imdb_top_250_records
+    :return: async generator
+        imdb_records.MovieRecord of each movie
+    """
+    l_loop = asyncio.get_running_loop()
+    l_records = iter_imdb_top_250_records(**kwargs)
+    l_done = object()  # Sentinel returned by next() when the generator is exhausted
 
     try:
-        l_title_json = json.loads(l_title_list_soup)  # Parse link list into JSON object
-    except json.JSONDecodeError as jde:
-        logger.error(f'Parsing JSON data failed with the following error:\n{jde}')
-        raise jde
+        while True:
+            l_record = await l_loop.run_in_executor(None, next, l_records, l_done)
+            if l_record is l_done:
+                break
+            yield l_record
+    finally:
+        await l_loop.run_in_executor(None, l_records.close)
+
+
+def extract_imdb_top_250_data(p_log_level: str = 'INFO',
+                              p_max_workers: int = c.max_workers,
+                              p_client: imdb_http_client.HttpClient = None,
+                              p_parser: str = c.parser_backend,
+                              p_parse_workers: int = c.parse_workers,
+                              p_in_process: bool = c.parse_in_process,
+                              p_title_ids: bool = False,
+                              p_list_url: str = None,
+                              p_source: str = c.list_source) -> pd.DataFrame:
+    """
+    Extracts movie URLs from the IMDB top 250 page and mines relevant info from their content
+    Returns the data in pandas DataFrame
+    :param p_log_level: str
+        Log level to logging
+    :param p_max_workers: int
+        Number of movie pages downloaded in parallel
+    :param p_client: imdb_http_client.HttpClient
+        Client shared by the list and movie page fetches, the process wide default client when not given
+    :param p_parser: str
+        Parser backend of the movie pages, one of imdb_parser.PARSER_BACKENDS
+    :param p_parse_workers: int
+        Number of parser processes, 0 means one per CPU core
+    :param p_in_process: bool
+        Parse in the main process instead of the process pool ( debugging )
+    :param p_title_ids: bool
+        Add a leading "title_id" column with the IMDB title IDs
+    :param p_list_url: str
+        URL of the list page replacing the URL of the source
+    :param p_source: str
+        Name of the list source in config.list_sources, or an imdb_lists.ListSource
+    :return: pandas.DataFrame
+        Extracted data
+    """
 
-    try:
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
 
-        l_title_list = l_title_json['about']['itemListElement']  # Get links from JSON
+    # Collect the streamed records column by column, restoring list order
+    l_columns = imdb_records.MovieColumnBuilder().extend(iter_imdb_top_250_records(p_log_level=p_log_level,
+                                                                                   p_max_workers=p_max_workers,
+                                                                                   p_client=p_client,
+                                                                                   p_parser=p_parser,
+                                                                                   p_parse_workers=p_parse_workers,
+                                                                                   p_in_process=p_in_process,
+                                                                                   p_list_url=p_list_url,
+                                                                                   p_source=p_source))
 
-        # Filter on position ( 20 or less )
-        filtered = list(filter(lambda pos: int(pos['position']) <= 20, l_title_list))
+    df = l_columns.to_dataframe(p_title_ids=p_title_ids, p_sort=True)
 
-        link_list = [x['url'] for x in filtered]  # Extract url from link list
+    logger.info('Finished, Result dataframe:\n%s', df)  # Lazy, the frame is only formatted when logged
 
-    except KeyError as ke:
-        l_exc_msg = f'Field not found in JSON: {ke}, JSON data:\n{l_title_json}'
-        logger.error(l_exc_msg)
-        raise KeyError(l_exc_msg)
+    return df
 
-    imdb_top_250_data = []  # List to gather top 250 movie data into
 
-    # Looping though movie links
-    for link in link_list:
-        l_current_link = f'https://www.imdb.com{link}'  # Calculate current movie link
+def extract_imdb_lists_data(p_sources: list = None,
+                            p_log_level: str = 'INFO',
+                            p_max_workers: int = c.max_workers,
+                            p_client: imdb_http_client.HttpClient = None,
+                            p_parser: str = c.parser_backend,
+                            p_parse_workers: int = c.parse_workers,
+                            p_in_process: bool = c.parse_in_process) -> pd.DataFrame:
+    """
+    Scrapes several list sources at once, titles shared by the lists are fetched and parsed only once.
+    :param p_sources: list
+        Names of list sources in config.list_sources or imdb_lists.ListSource objects, config.list_source when
+        not given
+    :param p_log_level: str
+        Log level to logging
+    :param p_max_workers: int
+        Number of movie pages downloaded in parallel
+    :param p_client: imdb_http_client.HttpClient
+        Client shared by the list and movie page fetches, the process wide default client when not given
+    :param p_parser: str
+        Parser backend of the movie pages, one of imdb_parser.PARSER_BACKENDS
+    :param p_parse_workers: int
+        Number of parser processes, 0 means one per CPU core
+    :param p_in_process: bool
+        Parse in the main process instead of the process pool ( debugging )
+    :return: pandas.DataFrame
+        "list" ( categorical ), "position", "title_id" and the movie data, one row per list entry in source and
+        position order
+    """
 
-        logger.debug(f'Extracting data from URL:{l_current_link}')
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
 
-        try:
-            l_content = requests.get(l_current_link).content  # Extract content from movie url as bytes
-        except requests.ConnectionError as ce:
-            l_exc_msg = f'Connection error occured while trying to reach "{l_current_link}":\n{ce}'
-            logger.error(l_exc_msg)
-            raise ce
+    l_sources = [imdb_lists.get_list_source(x) for x in (p_sources or [c.list_source])]
 
-        logger.debug(f'Extracting bytes content from URL:{l_content}')
+    l_client = p_client if p_client is not None else imdb_http_client.get_default_client(p_log_level=p_log_level)
 
-        # Extract the IMDB data points
-        imdb_top_250_data.append(extract_imdb_data(p_content=l_content, p_log_level=p_log_level))
+    l_urls, l_memberships = imdb_lists.collect_list_links(p_sources=l_sources, p_client=l_client,
+                                                          p_log_level=p_log_level)
 
-    index = ["name", "release_date", "rating", "votes", "oscars"]  # Header for the DataFrame
+    # Collect the streamed records column by column, once per list they are in
+    l_list_index = {x.name: i for i, x in enumerate(l_sources)}
+    l_columns = imdb_records.MovieColumnBuilder()
+    for l_record in iter_imdb_records(p_link_list=list(enumerate(l_urls, 1)),
+                                      p_log_level=p_log_level,
+                                      p_max_workers=p_max_workers,
+                                      p_client=l_client,
+                                      p_parser=p_parser,
+                                      p_parse_workers=p_parse_workers,
+                                      p_in_process=p_in_process):
+        for l_list, l_position in l_memberships[l_record.url]:
+            l_columns.append(l_record, p_list=l_list_index[l_list], p_position=l_position)
 
-    df = pd.DataFrame(imdb_top_250_data, columns=index)  # Turn extracted data into DataFrame
+    df = l_columns.to_dataframe(p_title_ids=True, p_sort=True, p_lists=[x.name for x in l_sources])
 
-    logger.info(f'Finished, Result dataframe:\n{df}')
+    logger.info(f'Finished, {len(df)} list entries of {len(l_urls)} titles, network usage: {l_client.stats.summary()}')
 
     return df
@@ -0,0 +1,303 @@
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import NamedTuple
+import pandas as pd
+import logging
+import config as c
+import imdb_http_client
+import imdb_metrics
+import imdb_rules
+import imdb_scraper
+import imdb_top_250_adjustment
+
+
+class ServiceResult(NamedTuple):
+    """
+    Adjusted list as served: the response body is serialized once per refresh, reads only send it.
+    """
+    body: bytes  # JSON: rule set, source and the adjusted movies in rank order
+    etag: str  # Strong ETag of the body, unchanged as long as the ranking is
+    refreshed_at: float  # Epoch seconds of the refresh
+    movies: int  # Number of movies
+    duration: float  # Seconds the refresh took
+
+
+def result_from_dataframe(p_df: pd.DataFrame, p_rule_set: str, p_source: str, p_refreshed_at: float,
+                          p_duration: float = 0.0) -> ServiceResult:
+    """
+    :param p_df: pandas.DataFrame
+        Adjusted movie data, as returned by imdb_top_250_adjustment.adjust_dataframe.
+    :param p_rule_set: str
+        Name of the rule set of the adjustment.
+    :param p_source: str
+        Name of the scraped list source.
+    :param p_refreshed_at: float
+        Epoch seconds of the refresh.
+    :param p_duration: float
+        Seconds the refresh took.
+    :return: ServiceResult
+        Result ready to be served
+    """
+    l_body = f'{{"rule_set": {json.dumps(p_rule_set)}, "source": {json.dumps(p_source)}, ' \
+             f'"movies": {p_df.to_json(orient="records")}}}'.encode('utf-8')
+
+    return ServiceResult(body=l_body, etag=f'"{hashlib.sha1(l_body).hexdigest()}"', refreshed_at=p_refreshed_at,
+                         movies=len(p_df), duration=p_duration)
+
+
+def _iso_time(p_time: float) -> str:
+    return None if p_time is None else datetime.fromtimestamp(p_time, timezone.utc).isoformat(timespec='seconds')
+
+
+class ScrapeService:
+    """
+    Daemon keeping the latest adjusted list in memory and serving it as JSON on a local HTTP endpoint.
+
+    GET /top     the adjusted list, with ETag: a matching If-None-Match gets 304 without a body
+    GET /health  time and duration of the last refresh, last error, next refresh
+
+    A scheduler thread scrapes and adjusts on an interval. The new result replaces the served one in a single
+    reference assignment, a read sees either the previous or the new result, never a mix. Reads never scrape:
+    until the first refresh finishes /top answers 503 with Retry-After. A failed refresh keeps the previous result.
+    Use as a context manager or call start() / stop().
+    """
+
+    def __init__(self,
+                 p_rule_set: str = c.adjustment_rule_set,
+                 p_refresh_minutes: float = c.service_refresh_minutes,
+                 p_retry_minutes: float = c.service_retry_minutes,
+                 p_host: str = c.service_host,
+                 p_port: int = c.service_port,
+                 p_cache_dir: str = None,
+                 p_offline: bool = False,
+                 p_source: str = c.list_source,
+                 p_log_level: str = 'INFO',
+                 **kwargs):
+        """
+        :param p_rule_set: str
+            Name of the adjustment rule set in config.adjustment_rule_sets.
+        :param p_refresh_minutes: float
+            Time between two refreshes.
+        :param p_retry_minutes: float
+            Time before a failed refresh is retried.
+        :param p_host: str
+            Interface to listen on.
+        :param p_port: int
+            Port to listen on, a free port when 0.
+        :param p_cache_dir: str
+            Directory of the response cache, see imdb_http_client.create_client.
+        :param p_offline: bool
+            Refresh from the response cache without network access.
+        :param p_source: str
+            Name of the list source in config.list_sources, or an imdb_lists.ListSource.
+        :param p_log_level: str
+            Log level to logging
+        :param kwargs:
+            Further keyword arguments of imdb_scraper.extract_imdb_top_250_data ( p_max_workers, p_parser, ... )
+        """
+
+        # Initiate logging for this class, pad class name to 30 characters
+        self.logger = logging.getLogger(__name__.ljust(30, ' '))
+        self.logger.setLevel(p_log_level)
+
+        self.rule_set = imdb_rules.get_rule_set(p_rule_set)
+        self.refresh_seconds = p_refresh_minutes * 60
+        self.retry_seconds = p_retry_minutes * 60
+        self.cache_dir = p_cache_dir
+        self.offline = p_offline
+        self.source = p_source
+        self.log_level = p_log_level
+        self.scrape_args = kwargs
+
+        self.result = None  # Latest ServiceResult, replaced as a whole by refresh
+        self.refreshes = 0
+        self.last_error = None
+        self.next_refresh = None
+
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler = None
+
+        self._server = ThreadingHTTPServer((p_host, p_port), self._handler_class())
+        self._server.daemon_threads = True
+        self._server_thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self._server.server_address[0]}:{self._server.server_address[1]}'
+
+    def refresh(self) -> bool:
+        """
+        Scrapes and adjusts the list, then swaps the new result in.
+        :return: bool
+            True on success, False when the refresh failed and the previous result stays
+        """
+        with self._refresh_lock:  # The scheduler and a manual refresh do not scrape at the same time
+            l_start = time.time()
+
+            imdb_metrics.start_run()  # A long running process starts the stage timings of every refresh over
+
+            # New client per refresh: its request statistics go with it, the response cache on disk is kept
+            l_client = imdb_http_client.create_client(p_cache_dir=self.cache_dir, p_offline=self.offline,
+                                                      p_log_level=self.log_level)
+            try:
+                df = imdb_scraper.extract_imdb_top_250_data(p_log_level=self.log_level,
+                                                            p_client=l_client,
+                                                            p_title_ids=True,
+                                                            p_source=self.source,
+                                                            **self.scrape_args)
+
+                l_adjusted = imdb_top_250_adjustment.adjust_dataframe(p_df=df,
+                                                                      p_log_level=self.log_level,
+                                                                      p_rule_set=self.rule_set)
+            except Exception as e:
+                self.last_error = f'{type(e).__name__}: {e}'
+                self.logger.error(f'Refresh failed, serving the previous result: {self.last_error}')
+                return False
+            finally:
+                l_client.close()
+
+            self.result = result_from_dataframe(p_df=l_adjusted,
+                                                p_rule_set=self.rule_set.name,
+                                                p_source=getattr(self.source, 'name', self.source),
+                                                p_refreshed_at=time.time(),
+                                                p_duration=time.time() - l_start)
+            self.refreshes += 1
+            self.last_error = None
+
+        self.logger.info(f'Refreshed {self.result.movies} movies in {self.result.duration:.1f} s, '
+                         f'ETag: {self.result.etag}')
+
+        return True
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            l_wait = self.refresh_seconds if self.refresh() else self.retry_seconds
+            self.next_refresh = time.time() + l_wait
+            self._stop.wait(l_wait)
+
+    def health(self) -> dict:
+        """
+        :return: dict
+            State of the service, served on /health
+        """
+        l_result = self.result
+
+        if l_result is None:
+            return {'status': 'starting', 'refreshes': self.refreshes, 'last_error': self.last_error,
+                    'next_refresh': _iso_time(self.next_refresh)}
+
+        return {'status': 'stale' if self.last_error else 'ok',
+                'refreshed_at': _iso_time(l_result.refreshed_at),
+                'age_seconds': round(time.time() - l_result.refreshed_at, 1),
+                'refresh_seconds': round(l_result.duration, 3),
+                'movies': l_result.movies,
+                'refreshes': self.refreshes,
+                'last_error': self.last_error,
+                'next_refresh': _iso_time(self.next_refresh)}
+
+    def respond(self, p_path: str, p_if_none_match: str = None) -> tuple:
+        """
+        :param p_path: str
+            Request path.
+        :param p_if_none_match: str
+            If-None-Match header of the request.
+        :return: tuple
+            ( status code, headers, body )
+        """
+        l_path = p_path.split('?', 1)[0].rstrip('/')
+
+        if l_path == '/top':
+            l_result = self.result  # One read of the reference, the whole response comes from this result
+
+            if l_result is None:
+                return 503, {'Retry-After': str(int(self.retry_seconds) or 1)}, b'{"error": "No result yet"}'
+
+            l_headers = {'ETag': l_result.etag,
+                         'Last-Modified': formatdate(l_result.refreshed_at, usegmt=True),
+                         'Cache-Control': 'no-cache'}  # Clients revalidate with the ETag, unchanged lists cost a 304
+
+            if p_if_none_match is not None and l_result.etag in [x.strip() for x in p_if_none_match.split(',')]:
+                return 304, l_headers, b''
+
+            return 200, l_headers, l_result.body
+
+        if l_path == '/health':
+            return 200, {'Cache-Control': 'no-store'}, json.dumps(self.health()).encode('utf-8')
+
+        return 404, {}, b'{"error": "Not found"}'
+
+    def _handler_class(self):
+        l_service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive for polling dashboards
+            disable_nagle_algorithm = True  # Headers and body are separate writes, do not wait for the delayed ACK
+
+            def do_GET(self):
+                l_status, l_headers, l_body = l_service.respond(self.path, self.headers.get('If-None-Match'))
+                self.send_response(l_status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(l_body)))
+                for l_name, l_value in l_headers.items():
+                    self.send_header(l_name, l_value)
+                self.end_headers()
+                self.wfile.write(l_body)
+
+            def log_message(self, format, *args):
+                l_service.logger.debug('%s %s', self.address_string(), format % args)
+
+        return Handler
+
+    def start(self, p_schedule: bool = True) -> 'ScrapeService':
+        """
+        Starts serving, and the scheduler with the first refresh right away.
+        :param p_schedule: bool
+            Start the scheduler, refresh() is called by the owner otherwise.
+        :return: ScrapeService
+            The service itself
+        """
+        self._stop.clear()
+
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+
+        if p_schedule:
+            self._scheduler = threading.Thread(target=self._schedule, daemon=True)
+            self._scheduler.start()
+
+        self.logger.info(f'Serving on {self.url}/top, refresh every {self.refresh_seconds / 60:g} minutes')
+
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+        if self._scheduler is not None:
+            self._scheduler.join()  # A refresh in progress is finished
+
+    def serve_forever(self):
+        """
+        Starts the service and blocks until Ctrl+C.
+        """
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            self.logger.info('Stopping')
+        finally:
+            self.stop()
+
+    def __enter__(self) -> 'ScrapeService':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,206 @@
+import sqlite3
+import time
+import pandas as pd
+import logging
+import config as c
+
+# Stored fields of a title in a run, a new version row is only written when one of them changes
+STORE_COLUMNS = ['rank', 'name', 'release_date', 'rating', 'votes', 'oscars', 'adjusted_rating']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_time REAL NOT NULL,
+    rule_set TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_run_time ON runs (run_time);
+CREATE INDEX IF NOT EXISTS runs_series ON runs (source, rule_set, run_id);
+
+-- One row per unchanged stretch of a title: valid in every run from first_run to last_run
+-- with the source and rule set of first_run, runs of other lists or rule sets in between are not part of it
+CREATE TABLE IF NOT EXISTS title_versions (
+    title_id TEXT NOT NULL,
+    first_run INTEGER NOT NULL REFERENCES runs (run_id),
+    last_run INTEGER NOT NULL REFERENCES runs (run_id),
+    rank INTEGER,
+    name TEXT,
+    release_date TEXT,
+    rating REAL,
+    votes INTEGER,
+    oscars INTEGER,
+    adjusted_rating REAL,
+    PRIMARY KEY (title_id, first_run)
+);
+CREATE INDEX IF NOT EXISTS title_versions_runs ON title_versions (last_run, first_run);
+'''
+
+
+class SnapshotStore:
+    """
+    History of the raw and adjusted records of every run in an embedded SQLite database.
+    Titles are versioned: a run that repeats the previous values of a title only extends the validity of the
+    stored version, so the size grows with the number of changes instead of the number of runs.
+    Runs are chained per series ( list source and rule set ), runs of other series may come in between.
+    """
+
+    def __init__(self, p_db_file: str = c.store_file, p_log_level: str = 'INFO'):
+        """
+        :param p_db_file: str
+            Database file name / path, created when missing.
+        :param p_log_level: str
+            Log level to logging
+        """
+
+        # Initiate logging for this class, pad class name to 30 characters
+        self.logger = logging.getLogger(__name__.ljust(30, ' '))
+        self.logger.setLevel(p_log_level)
+
+        self.db_file = p_db_file
+        self._connection = sqlite3.connect(p_db_file, timeout=c.store_busy_timeout_seconds)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def add_run(self, p_df: pd.DataFrame, p_run_time: float = None, p_rule_set: str = None,
+                p_source: str = c.top_250_url) -> int:
+        """
+        Stores the records of a run in a single transaction.
+        :param p_df: pandas.DataFrame
+            Adjusted movie data with a "title_id" column and STORE_COLUMNS.
+        :param p_run_time: float
+            Time of the run as epoch seconds, time.time() when not given.
+        :param p_rule_set: str
+            Name of the adjustment rule set of the run.
+        :param p_source: str
+            URL of the list of the run.
+        :return: int
+            ID of the new run
+        """
+        l_run_time = time.time() if p_run_time is None else p_run_time
+
+        with self._connection:
+            # Write lock before the read of the previous run, concurrent writers wait instead of
+            # extending versions of a run that is no longer the previous one
+            self._connection.execute('BEGIN IMMEDIATE')
+
+            l_previous_run = self._previous_run(p_source=p_source, p_rule_set=p_rule_set)
+
+            l_run_id = self._connection.execute('INSERT INTO runs (run_time, rule_set, source) VALUES (?, ?, ?)',
+                                                (l_run_time, p_rule_set, p_source)).lastrowid
+
+            # Versions still valid in the previous run of the series, the only ones a title of this run can extend
+            l_current = {x[0]: (x[1], tuple(x[2:]))
+                         for x in self._connection.execute(f'SELECT title_id, first_run, {", ".join(STORE_COLUMNS)} '
+                                                           f'FROM title_versions WHERE last_run = ?', (l_previous_run,))}
+
+            l_extend = []
+            l_insert = []
+            for l_row in p_df[['title_id'] + STORE_COLUMNS].itertuples(index=False):
+                l_values = tuple(x.item() if hasattr(x, 'item') else x for x in l_row[1:])  # numpy -> python scalars
+                l_version = l_current.get(l_row[0])
+
+                if l_version is not None and l_version[1] == l_values:
+                    l_extend.append((l_run_id, l_row[0], l_version[0]))
+                else:
+                    l_insert.append((l_row[0], l_run_id, l_run_id) + l_values)
+
+            self._connection.executemany('UPDATE title_versions SET last_run = ? WHERE title_id = ? AND first_run = ?',
+                                         l_extend)
+            self._connection.executemany(f'INSERT INTO title_versions (title_id, first_run, last_run, '
+                                         f'{", ".join(STORE_COLUMNS)}) VALUES ({", ".join(["?"] * 10)})', l_insert)
+
+        self.logger.info(f'Stored run {l_run_id}: {len(l_insert)} changed titles, {len(l_extend)} unchanged')
+
+        return l_run_id
+
+    def _previous_run(self, p_source: str, p_rule_set: str, p_before: int = None):
+        """
+        :return: int
+            Latest run of the list source and rule set ( before p_before when given ), None if there is none
+        """
+        return self._connection.execute('SELECT MAX(run_id) FROM runs WHERE source IS ? AND rule_set IS ? '
+                                        'AND run_id < ?',
+                                        (p_source, p_rule_set, float('inf') if p_before is None else p_before)
+                                        ).fetchone()[0]
+
+    def runs(self) -> pd.DataFrame:
+        """
+        :return: pandas.DataFrame
+            Stored runs: "run_id", "run_time" ( datetime ), "rule_set", "source"
+        """
+        df = pd.read_sql_query('SELECT run_id, run_time, rule_set, source FROM runs ORDER BY run_id', self._connection)
+        df['run_time'] = pd.to_datetime(df['run_time'], unit='s')
+
+        return df
+
+    def title_history(self, p_title_id: str, p_since: float = None, p_until: float = None) -> pd.DataFrame:
+        """
+        Time series of a title, one row per run the title was part of, of every list source and rule set.
+        :param p_title_id: str
+            IMDB title ID, e.g. "tt0111161".
+        :param p_since: float
+            Earliest run time as epoch seconds, inclusive.
+        :param p_until: float
+            Latest run time as epoch seconds, inclusive.
+        :return: pandas.DataFrame
+            "run_id", "run_time" ( datetime ), "rule_set", "source" and STORE_COLUMNS in run order
+        """
+        df = pd.read_sql_query(f'SELECT r.run_id, r.run_time, r.rule_set, r.source, '
+                               f'{", ".join("v." + x for x in STORE_COLUMNS)} '
+                               f'FROM title_versions v JOIN runs f ON f.run_id = v.first_run '
+                               f'JOIN runs r ON r.run_id BETWEEN v.first_run AND v.last_run '
+                               f'AND r.source IS f.source AND r.rule_set IS f.rule_set '
+                               f'WHERE v.title_id = ? AND r.run_time >= ? AND r.run_time <= ? ORDER BY r.run_id',
+                               self._connection,
+                               params=(p_title_id,
+                                       float('-inf') if p_since is None else p_since,
+                                       float('inf') if p_until is None else p_until))
+        df['run_time'] = pd.to_datetime(df['run_time'], unit='s')
+
+        return df
+
+    def records_at(self, p_run_id: int) -> pd.DataFrame:
+        """
+        :param p_run_id: int
+            ID of a stored run.
+        :return: pandas.DataFrame
+            "title_id" and STORE_COLUMNS of the run, in rank order
+        """
+        return pd.read_sql_query(f'SELECT v.title_id, {", ".join("v." + x for x in STORE_COLUMNS)} '
+                                 f'FROM title_versions v JOIN runs f ON f.run_id = v.first_run JOIN runs r ON r.run_id = ? '
+                                 f'WHERE v.last_run >= r.run_id AND v.first_run <= r.run_id '
+                                 f'AND f.source IS r.source AND f.rule_set IS r.rule_set ORDER BY v.rank',
+                                 self._connection, params=(p_run_id,))
+
+    def rank_deltas(self, p_from_run: int = None, p_to_run: int = None) -> pd.DataFrame:
+        """
+        Rank and adjusted rating changes of the titles between two runs.
+        :param p_from_run: int
+            ID of the earlier run, the one before p_to_run of the same list source and rule set when not given.
+        :param p_to_run: int
+            ID of the later run, the latest run when not given.
+        :return: pandas.DataFrame
+            "title_id", "name", "rank_from", "rank_to", "rank_delta" ( positive is an improvement ),
+            "adjusted_rating_delta"; titles new in p_to_run have no "rank_from"
+        """
+        l_to_run = p_to_run if p_to_run is not None else \
+            self._connection.execute('SELECT MAX(run_id) FROM runs').fetchone()[0]
+        l_from_run = p_from_run
+        if l_from_run is None and l_to_run is not None:
+            l_series = self._connection.execute('SELECT source, rule_set FROM runs WHERE run_id = ?',
+                                                (l_to_run,)).fetchone()
+            l_from_run = self._previous_run(p_source=l_series[0], p_rule_set=l_series[1],
+                                            p_before=l_to_run) if l_series else None
+
+        l_from = self.records_at(l_from_run) if l_from_run is not None \
+            else pd.DataFrame(columns=['title_id'] + STORE_COLUMNS)
+        l_to = self.records_at(l_to_run)
+
+        df = l_to.merge(l_from, on='title_id', how='left', suffixes=('_to', '_from'))
+        df['rank_delta'] = df['rank_from'] - df['rank_to']
+        df['adjusted_rating_delta'] = (df['adjusted_rating_to'] - df['adjusted_rating_from']).round(1)
+
+        return df[['title_id', 'name_to', 'rank_from', 'rank_to', 'rank_delta', 'adjusted_rating_delta']] \
+            .rename(columns={'name_to': 'name'})
@@ -1,13 +1,16 @@
-import csv
 from datetime import datetime
+import numpy as np
 import pandas as pd
-import argparse
-import imdb_scraper
-import os
+import imdb_rules
+import imdb_writers
+import imdb_store
+import imdb_metrics
 import logging
 import config as c
 
-logging.basicConfig(format=c.log_format)
+# Oscars adjustment tiers, OSCARS_ADJUSTMENT_VALUES[i] applies from OSCARS_ADJUSTMENT_BOUNDS[i - 1] Oscars
+OSCARS_ADJUSTMENT_BOUNDS = np.array([1, 3, 6, 11])
+OSCARS_ADJUSTMENT_VALUES = np.array([0, 0.3, 0.5, 1, 1.5])
 
 
 def oscars_adjustment(p_num_of_oscars: int) -> float:
@@ -33,7 +36,50 @@ def oscars_adjustment(p_num_of_oscars: int) -> float:
         return 1.5
 
 
-def adjust_dataframe(p_df: pd.DataFrame, p_log_level: str = 'INFO'):
+def oscars_adjustments(p_oscars) -> np.ndarray:
+    """
+    Vectorized oscars_adjustment, looks up the adjustment tier of every value with a single binary search.
+    :param p_oscars: array-like
+        Number of Oscars won by the movies.
+    :return: numpy.ndarray
+        Adjustment values as floats
+    """
+    return imdb_rules.tier_adjustments(p_oscars, OSCARS_ADJUSTMENT_BOUNDS, OSCARS_ADJUSTMENT_VALUES)
+
+
+def descending_order(p_values: np.ndarray, p_decimals: int = 1) -> np.ndarray:
+    """
+    Stable descending sort order of rounded values.
+    When the values fit, they are sorted as 16 bit integers ( e.g. tenths ), which numpy sorts with a radix sort.
+    :param p_values: numpy.ndarray
+        Values rounded to p_decimals.
+    :param p_decimals: int
+        Number of decimals the values are rounded to.
+    :return: numpy.ndarray
+        Indices sorting the values in descending order, ties keep their original order
+    """
+    l_keys = -np.rint(p_values * 10 ** p_decimals)
+
+    if l_keys.size and np.isfinite(l_keys).all() and np.iinfo(np.int16).min <= l_keys.min() \
+            and l_keys.max() <= np.iinfo(np.int16).max:
+        return np.argsort(l_keys.astype(np.int16), kind='stable')
+
+    return np.argsort(-p_values, kind='stable')
+
+
+def adjust_dataframe(p_df: pd.DataFrame, p_log_level: str = 'INFO', p_rule_set: imdb_rules.RuleSet = None):
+    """
+    Adjusts the ratings with the review penalty and the Oscars adjustment, ranks the movies by adjusted rating.
+    Works on whole columns at once, the input DataFrame is not modified.
+    :param p_df: pandas.DataFrame
+        Scraped movie data: "name", "release_date", "rating", "votes", "oscars"
+    :param p_log_level: str
+        Log level to logging
+    :param p_rule_set: imdb_rules.RuleSet
+        Adjustment rules, the rule set named in config.adjustment_rule_set when not given
+    :return: pandas.DataFrame
+        Movie data sorted by adjusted rating with "rank" and "adjusted_rating" columns, index starts at 1
+    """
 
     # Initiate logging for this function, pad function name to 30 characters
     logger = logging.getLogger(__name__.ljust(30, ' '))
@@ -41,41 +87,46 @@ def adjust_dataframe(p_df: pd.DataFrame, p_log_level: str = 'INFO'):
 
     logger.info('Started')
 
-    # Get maximum amount of votes for all 250 movies
-    l_max_votes = p_df.sort_values('rating', ascending=False).head(20).max(axis=0)['votes']
+    l_rule_set = p_rule_set if p_rule_set is not None else imdb_rules.get_rule_set()
 
-    logger.info(f'Maximum number of votes in the set: {l_max_votes}')
+    # Vote/Review penalties and award adjustments of the rule set, final adjusted rating
+    l_adjusted_rating = imdb_rules.evaluate_rule_sets(p_df=p_df,
+                                                      p_rule_sets=[l_rule_set],
+                                                      p_log_level=p_log_level)[l_rule_set.name].to_numpy()
 
-    # Adjust rating - 0.1 penalty for each 100k deviation from l_max_votes and create new column with adjusted value
-    p_df['review_penalty'] = ((l_max_votes - p_df['votes']) // 100000 * -0.1)
+    logger.info(f'Final adjustments are calculated with rule set: {l_rule_set.name}')
 
-    logger.info('Vote/Review penalties are calculated')
+    sorted_df = rank_adjusted(p_df=p_df, p_adjusted_rating=l_adjusted_rating, p_decimals=l_rule_set.decimals)
 
-    # Adjust rating - apply oscars adjustment and create new column
-    p_df['oscars_adjustment'] = [oscars_adjustment(x) for x in p_df['oscars']]
+    logger.info('DataFrame adjustment is done.')
 
-    logger.info('Oscars adjustments are calculated')
+    return sorted_df
 
-    # Calculate final adjusted rating
-    p_df['adjusted_rating'] = round(p_df['rating'] + p_df['review_penalty'] + p_df['oscars_adjustment'], 1)
 
-    logger.info('Final adjustments are calculated')
+def rank_adjusted(p_df: pd.DataFrame, p_adjusted_rating: np.ndarray, p_decimals: int = 1) -> pd.DataFrame:
+    """
+    Ranks the movies by their adjusted rating, e.g. one column of imdb_rules.evaluate_rule_sets.
+    The input DataFrame is not modified.
+    :param p_df: pandas.DataFrame
+        Scraped movie data
+    :param p_adjusted_rating: numpy.ndarray
+        Adjusted rating of every row of p_df, rounded to p_decimals
+    :param p_decimals: int
+        Number of decimals the adjusted ratings are rounded to
+    :return: pandas.DataFrame
+        Movie data sorted by adjusted rating with "rank" and "adjusted_rating" columns, index starts at 1
+    """
 
-    # Drop adjustment column - no need for them now
-    l_df = p_df.drop("oscars_adjustment", axis='columns')
-    l_df = l_df.drop("review_penalty", axis='columns')
+    # Sort movie list based on adjusted ratings, ties keep their original order
+    l_order = descending_order(p_adjusted_rating, p_decimals)
 
-    # Sort movie list based on adjusted ratings, get top 20, reset index on DataFrame
-    sorted_df = l_df.sort_values('adjusted_rating', ascending=False).reindex().reset_index(drop=True)
+    sorted_df = p_df.take(l_order)  # The only copy of the data
+    sorted_df['adjusted_rating'] = p_adjusted_rating[l_order]
 
     # New index starts at 1
-    sorted_df.index += 1
-
-    sorted_df.insert(loc=0, column='rank', value=sorted_df.index)
+    sorted_df.index = pd.RangeIndex(1, len(sorted_df) + 1)
 
-    sorted_df['rank'] = sorted_df.index
-
-    logger.info('DataFrame adjustment is done.')
+    sorted_df.insert(loc=0, column='rank', value=np.arange(1, len(sorted_df) + 1, dtype=np.int64))
 
     return sorted_df
 
@@ -85,7 +136,7 @@ def write_imdb_data_to_csv(p_df: pd.DataFrame,
                            p_sep: str = ';',
                            p_log_level: str = 'INFO'):
     """
-    Writes IMDB data DataFrame to CSV file.
+    Writes IMDB data DataFrame to CSV file, atomically with imdb_writers.write_dataframe.
     Raises error when file already exists.
     :param p_df: pandas.DataFrame
         Source data for the file.
@@ -98,39 +149,224 @@ def write_imdb_data_to_csv(p_df: pd.DataFrame,
     :return: None
     """
 
-    # Initiate logging for this function, pad it to 30 characters
-    logger = logging.getLogger(__name__.ljust(30, ' '))
-    logger.setLevel(p_log_level)
-
-    logger.info(f'Started writing file: {p_file}')
-
-    if os.path.isfile(p_file):  # Check if target file already exists.
-        l_already_exists = f'File already exists: {p_file}'
-        logger.error(l_already_exists)
-        raise Exception(l_already_exists)  # Log error and raise exception - don't want to omit this error
-    else:
-        p_df.to_csv(path_or_buf=p_file, sep=p_sep, index=False, header=True, quoting=csv.QUOTE_NONNUMERIC)
-
-    logger.info(f'Finished writing file: {p_file}')
+    imdb_writers.write_dataframe(p_df=p_df, p_file=p_file, p_format='csv', p_log_level=p_log_level, p_sep=p_sep)
+
+
+def extract_and_adjust(p_log_level: str = 'INFO',
+                       p_max_workers: int = c.max_workers,
+                       p_cache_dir: str = None,
+                       p_offline: bool = False,
+                       p_record_file: str = None,
+                       p_replay_file: str = None,
+                       p_parser: str = c.parser_backend,
+                       p_parse_workers: int = c.parse_workers,
+                       p_in_process: bool = c.parse_in_process,
+                       p_incremental: bool = False,
+                       p_snapshot_file: str = None,
+                       p_freshness_hours: float = c.freshness_hours,
+                       p_rule_set: str = c.adjustment_rule_set,
+                       p_output_format: str = c.output_format,
+                       p_dataset_dir: str = c.dataset_dir,
+                       p_store_file: str = c.store_file,
+                       p_report_file: str = c.report_file,
+                       p_source: str = c.list_source,
+                       p_checkpoint: bool = False,
+                       p_checkpoint_dir: str = c.checkpoint_dir):
+
+    # Scraping modules pull in requests and BeautifulSoup, imported here so adjusting alone stays light
+    import imdb_scraper
+    import imdb_http_client
+    import imdb_incremental
+    import imdb_checkpoint
+    import imdb_lists
+
+    l_metrics = imdb_metrics.start_run()  # Stage timings of this run
+
+    # HTTP client shared by every fetch of the run, replays the response cache in offline mode,
+    # records the responses into an archive or serves them from one with p_record_file / p_replay_file
+    l_client = imdb_http_client.create_client(p_cache_dir=p_cache_dir, p_offline=p_offline, p_record_file=p_record_file,
+                                              p_replay_file=p_replay_file, p_log_level=p_log_level)
+
+    l_scrape_args = {'p_log_level': p_log_level,
+                     'p_max_workers': p_max_workers,
+                     'p_client': l_client,
+                     'p_parser': p_parser,
+                     'p_parse_workers': p_parse_workers,
+                     'p_in_process': p_in_process,
+                     'p_title_ids': True,
+                     'p_source': p_source}
+
+    # Get IMDB top 250 movie data, in incremental mode only new, moved or stale titles are scraped,
+    # checkpointed runs go on after failed titles and resume after a crash
+    try:
+        if p_checkpoint:
+            df = imdb_checkpoint.extract_imdb_top_250_data_checkpointed(p_checkpoint_dir=p_checkpoint_dir,
+                                                                        **l_scrape_args)
+        elif p_incremental:
+            df = imdb_incremental.extract_imdb_top_250_data_incremental(p_snapshot_file=p_snapshot_file,
+                                                                        p_freshness_hours=p_freshness_hours,
+                                                                        **l_scrape_args)
+        else:
+            df = imdb_scraper.extract_imdb_top_250_data(**l_scrape_args)
+    finally:
+        l_client.close()  # Writes the archive when recording, the request stats stay available for the report
+
+    adjust_and_write(p_df=df,
+                     p_log_level=p_log_level,
+                     p_rule_set=p_rule_set,
+                     p_output_format=p_output_format,
+                     p_dataset_dir=p_dataset_dir,
+                     p_store_file=p_store_file,
+                     p_source_url=imdb_lists.get_list_source(p_source).url)
+
+    # Machine readable report of the stage and per-title timings, network usage
+    if p_report_file:
+        imdb_metrics.write_report(p_report=l_metrics.report(p_client=l_client), p_file=p_report_file,
+                                  p_log_level=p_log_level)
+
+
+def adjust_and_write(p_df: pd.DataFrame,
+                     p_log_level: str = 'INFO',
+                     p_rule_set: str = c.adjustment_rule_set,
+                     p_output_format: str = c.output_format,
+                     p_output_file: str = None,
+                     p_dataset_dir: str = c.dataset_dir,
+                     p_store_file: str = c.store_file,
+                     p_source_url: str = c.top_250_url,
+                     p_overwrite: bool = False) -> str:
+    """
+    Adjusts scraped movie data, stores the run in the history store and writes the result file.
+    Needs no network access, so it also re-adjusts saved raw data, e.g. a snapshot of an incremental run.
+    :param p_df: pandas.DataFrame
+        Scraped movie data: "title_id" and imdb_records.MOVIE_COLUMNS
+    :param p_log_level: str
+        Log level to logging
+    :param p_rule_set: str
+        Name of the adjustment rule set in config.adjustment_rule_sets
+    :param p_output_format: str
+        Format of the result file, key of imdb_writers.WRITERS
+    :param p_output_file: str
+        Result file name / path, imdb_top_250_adjusted_<run time>.<extension> when not given
+    :param p_dataset_dir: str
+        Also append the result to the dataset partitioned by run timestamp in this directory
+    :param p_store_file: str
+        SQLite history store of the runs, not stored when empty
+    :param p_source_url: str
+        URL of the scraped list, stored with the run
+    :param p_overwrite: bool
+        Replace an existing result file instead of raising an error
+    :return: str
+        Result file name / path
+    """
 
+    # Adjust rating and sort DataFrame, ratings are rounded to the decimals of the rule set
+    with imdb_metrics.timed('adjust'):
+        sorted_df = adjust_dataframe(p_df=p_df,
+                                     p_log_level=p_log_level,
+                                     p_rule_set=imdb_rules.get_rule_set(p_rule_set))
+
+    # Store raw and adjusted records of the run in the history store
+    l_run_time = datetime.now()
+    if p_store_file:
+        store_run(p_df=sorted_df, p_store_file=p_store_file, p_run_time=l_run_time, p_rule_set=p_rule_set,
+                  p_source_url=p_source_url, p_log_level=p_log_level)
+
+    return write_adjusted(p_df=sorted_df,
+                          p_run_time=l_run_time,
+                          p_output_format=p_output_format,
+                          p_output_file=p_output_file,
+                          p_dataset_dir=p_dataset_dir,
+                          p_overwrite=p_overwrite,
+                          p_log_level=p_log_level)
+
+
+def store_run(p_df: pd.DataFrame,
+              p_store_file: str,
+              p_run_time: datetime,
+              p_rule_set: str = c.adjustment_rule_set,
+              p_source_url: str = c.top_250_url,
+              p_log_level: str = 'INFO'):
+    """
+    Stores an adjusted run in the history store.
+    :param p_df: pandas.DataFrame
+        Adjusted movie data with "title_id", see adjust_dataframe
+    :param p_store_file: str
+        SQLite history store of the runs
+    :param p_run_time: datetime
+        Time of the run
+    :param p_rule_set: str
+        Name of the adjustment rule set of the run
+    :param p_source_url: str
+        URL of the scraped list
+    :param p_log_level: str
+        Log level to logging
+    :return: None
+    """
+    with imdb_metrics.timed('store'):
+        l_store = imdb_store.SnapshotStore(p_db_file=p_store_file, p_log_level=p_log_level)
+        try:
+            l_store.add_run(p_df=p_df, p_run_time=p_run_time.timestamp(), p_rule_set=p_rule_set, p_source=p_source_url)
+        finally:
+            l_store.close()
+
+
+def write_adjusted(p_df: pd.DataFrame,
+                   p_run_time: datetime,
+                   p_output_format: str = c.output_format,
+                   p_output_file: str = None,
+                   p_dataset_dir: str = c.dataset_dir,
+                   p_overwrite: bool = False,
+                   p_partition: dict = None,
+                   p_log_level: str = 'INFO') -> str:
+    """
+    Writes adjusted movie data to the result file, optionally appends it to the partitioned dataset.
+    :param p_df: pandas.DataFrame
+        Adjusted movie data with "title_id", see adjust_dataframe
+    :param p_run_time: datetime
+        Time of the run, names the result file and the dataset partition
+    :param p_output_format: str
+        Format of the result file, key of imdb_writers.WRITERS
+    :param p_output_file: str
+        Result file name / path, imdb_top_250_adjusted_<run time>.<extension> when not given
+    :param p_dataset_dir: str
+        Also append the result to the dataset partitioned by run timestamp in this directory
+    :param p_overwrite: bool
+        Replace an existing result file instead of raising an error
+    :param p_partition: dict
+        Column name -> value added to the rows of the dataset, e.g. job and rule set of a batch run.
+        The values also name the part file, so several results of the same second do not collide.
+    :param p_log_level: str
+        Log level to logging
+    :return: str
+        Result file name / path
+    """
+    sorted_df = p_df.drop(columns='title_id')  # Result files keep their columns
 
-def extract_and_adjust(p_log_level: str = 'INFO'):
+    # Write adjusted movie data in the chosen format, optionally append it to the partitioned dataset
+    with imdb_metrics.timed('write'):
+        l_output_file = p_output_file or f'imdb_top_250_adjusted_{p_run_time.strftime("%Y%m%d_%H%M%S")}.' \
+                                         f'{imdb_writers.file_extension(p_output_format)}'
 
-    # Get IMDB top 250 movie data
-    df = imdb_scraper.extract_imdb_top_250_data(p_log_level=p_log_level)
+        imdb_writers.write_dataframe(p_df=sorted_df,
+                                     p_file=l_output_file,
+                                     p_format=p_output_format,
+                                     p_overwrite=p_overwrite,
+                                     p_log_level=p_log_level)
 
-    # Adjust rating and sort DataFrame, round ratings to 1 decimal
-    sorted_df = adjust_dataframe(p_df=df, p_log_level=p_log_level).round(1)
+        if p_dataset_dir:
+            l_partition = p_partition or {}
+            imdb_writers.append_partition(p_df=sorted_df.assign(**l_partition),
+                                          p_dataset_dir=p_dataset_dir,
+                                          p_run_time=p_run_time,
+                                          p_format=p_output_format,
+                                          p_part='-'.join(str(x) for x in l_partition.values()) or '0',
+                                          p_log_level=p_log_level)
 
-    # Write adjusted movie data into CSV
-    write_imdb_data_to_csv(p_df=sorted_df,
-                           p_file=f'imdb_top_250_adjusted_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                           p_log_level=p_log_level)
+    return l_output_file
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--log_level", required=False, default='INFO',
-                        help="Initiates log level, default='INFO'")
-    input_args = parser.parse_args()
-    extract_and_adjust(input_args.log_level)
+    import sys
+    import imdb_cli
+
+    imdb_cli.main(['run'] + sys.argv[1:])  # Same options as "imdb-top-250 run"
@@ -0,0 +1,260 @@
+"""
+Transports of the HTTP client: record the responses of a real run into a compressed archive, replay them later.
+
+The transports are requests adapters mounted by imdb_http_client.HttpClient in place of the network adapter, so the
+rest of the client ( rate limiting, retries, streamed bodies ) works the same in every mode. A replayed run needs no
+network and no server, runs at memory speed and returns the same data, which makes the end to end pipeline
+testable and its stage timings comparable across commits.
+
+Archive: a zip file with index.json ( URL -> recorded responses in request order ) and one deflated member per
+distinct body, bodies shared by several URLs are stored once.
+"""
+import io
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import zipfile
+from collections import defaultdict
+from http.client import responses as http_reasons
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+import logging
+import config as c
+
+# Headers describing the recorded transfer, not the content: the archive holds decoded bodies
+_TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+class ReplayMissError(requests.RequestException):
+    """
+    Raised in replay mode when the requested URL was not recorded, the request is not retried.
+    """
+
+
+class TransportArchive:
+    """
+    Thread safe, in-memory collection of recorded responses, saved to and loaded from a compressed file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = defaultdict(list)  # URL -> [ ( status code, headers, body ) ] in request order
+
+    def add(self, p_url: str, p_status_code: int, p_headers: dict, p_body: bytes):
+        """
+        :param p_url: str
+            URL of the request.
+        :param p_status_code: int
+            Status code of the response.
+        :param p_headers: dict
+            Headers of the response, the transfer headers are dropped.
+        :param p_body: bytes
+            Decoded body of the response.
+        :return: None
+        """
+        l_headers = {k: v for k, v in p_headers.items() if k.lower() not in _TRANSFER_HEADERS}
+
+        with self._lock:
+            self.responses[p_url].append((p_status_code, l_headers, p_body))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(x) for x in self.responses.values())
+
+    def save(self, p_file: str):
+        """
+        Writes the archive atomically, through a temporary file in the target directory.
+        :param p_file: str
+            Archive file name / path.
+        :return: None
+        """
+        with self._lock:
+            l_responses = {k: list(v) for k, v in self.responses.items()}
+
+        l_dir = os.path.dirname(os.path.abspath(p_file))
+        os.makedirs(l_dir, exist_ok=True)
+        l_tmp_file = os.path.join(l_dir, f'.{os.path.basename(p_file)}.{os.getpid()}.tmp')
+
+        l_index = {}
+        l_members = set()
+        with zipfile.ZipFile(l_tmp_file, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as l_zip:
+            for l_url, l_entries in l_responses.items():
+                l_index[l_url] = []
+                for l_status_code, l_headers, l_body in l_entries:
+                    l_member = f'bodies/{hashlib.sha1(l_body).hexdigest()}'
+                    if l_member not in l_members:  # Identical bodies are stored once
+                        l_zip.writestr(l_member, l_body)
+                        l_members.add(l_member)
+                    l_index[l_url].append({'status_code': l_status_code, 'headers': l_headers, 'body': l_member})
+
+            l_zip.writestr('index.json', json.dumps(l_index, indent=1))
+
+        os.replace(l_tmp_file, p_file)
+
+    @classmethod
+    def load(cls, p_file: str) -> 'TransportArchive':
+        """
+        Reads a saved archive, every body is decompressed into memory once.
+        :param p_file: str
+            Archive file name / path.
+        :return: TransportArchive
+            The recorded responses
+        """
+        l_archive = cls()
+
+        with zipfile.ZipFile(p_file) as l_zip:
+            l_bodies = {}
+            for l_url, l_entries in json.loads(l_zip.read('index.json')).items():
+                for l_entry in l_entries:
+                    if l_entry['body'] not in l_bodies:
+                        l_bodies[l_entry['body']] = l_zip.read(l_entry['body'])
+                    l_archive.responses[l_url].append((l_entry['status_code'], l_entry['headers'],
+                                                       l_bodies[l_entry['body']]))
+
+        return l_archive
+
+
+def _raw_response(p_status_code: int, p_headers: dict, p_body) -> HTTPResponse:
+    """
+    Wraps a body ( bytes or a binary file positioned at its start ) in a streamable urllib3 response,
+    read in chunks like one from the network.
+    """
+    if isinstance(p_body, bytes):
+        p_body = io.BytesIO(p_body)
+
+    l_length = p_body.seek(0, io.SEEK_END)
+    p_body.seek(0)
+
+    return HTTPResponse(body=p_body,
+                        headers=dict(p_headers, **{'Content-Length': str(l_length)}),
+                        status=p_status_code,
+                        reason=http_reasons.get(p_status_code, ''),
+                        preload_content=False,
+                        decode_content=False)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Network adapter that records every response into an archive, completed in p_file when the session is closed.
+    Bodies are recorded in full, also when the caller stops reading early. A body is streamed to a temporary file
+    and from there into the archive, then served to the caller from the temporary file: only a chunk of it is in
+    memory at a time, the archive itself is written to disk as the run goes on.
+    """
+
+    def __init__(self, p_file: str, p_log_level: str = 'INFO', **kwargs):
+        """
+        :param p_file: str
+            Archive file name / path.
+        :param p_log_level: str
+            Log level to logging
+        :param kwargs:
+            Further keyword arguments of requests.adapters.HTTPAdapter ( pool_connections, pool_maxsize, ... )
+        """
+        super().__init__(**kwargs)
+
+        # Initiate logging for this class, pad class name to 30 characters
+        self.logger = logging.getLogger(__name__.ljust(30, ' '))
+        self.logger.setLevel(p_log_level)
+
+        self.file = p_file
+        self._lock = threading.Lock()
+        self._zip = None  # Archive being written, opened with the first response
+        self._tmp_file = None
+        self._index = defaultdict(list)  # URL -> recorded responses in request order, index.json of the archive
+        self._members = set()  # Bodies in the archive
+        self._count = 0  # Number of recorded responses
+
+    def _add(self, p_url: str, p_status_code: int, p_headers: dict, p_body, p_digest: str):
+        """
+        Adds a response to the archive, the body is copied from the file p_body, identical bodies are stored once.
+        """
+        l_member = f'bodies/{p_digest}'
+
+        with self._lock:
+            if self._zip is None:
+                if self._count:
+                    raise ValueError(f'Recording to archive is closed: {self.file}')
+
+                l_dir = os.path.dirname(os.path.abspath(self.file))
+                os.makedirs(l_dir, exist_ok=True)
+                self._tmp_file = os.path.join(l_dir, f'.{os.path.basename(self.file)}.{os.getpid()}.tmp')
+                self._zip = zipfile.ZipFile(self._tmp_file, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9)
+
+            if l_member not in self._members:
+                with self._zip.open(l_member, 'w') as l_entry:
+                    shutil.copyfileobj(p_body, l_entry, c.stream_chunk_bytes)
+                self._members.add(l_member)
+
+            self._index[p_url].append({'status_code': p_status_code, 'headers': p_headers, 'body': l_member})
+            self._count += 1
+
+    def send(self, request, **kwargs):
+        l_response = super().send(request, **kwargs)
+
+        l_headers = {k: v for k, v in l_response.headers.items() if k.lower() not in _TRANSFER_HEADERS}
+
+        # Whole body, decoded, streamed to a temporary file
+        l_body = tempfile.TemporaryFile()
+        try:
+            l_hash = hashlib.sha1()
+            for l_chunk in l_response.iter_content(c.stream_chunk_bytes):
+                l_hash.update(l_chunk)
+                l_body.write(l_chunk)
+
+            l_body.seek(0)
+            self._add(request.url, l_response.status_code, l_headers, l_body, l_hash.hexdigest())
+        except BaseException:
+            l_body.close()
+            raise
+
+        return self.build_response(request, _raw_response(l_response.status_code, l_headers, l_body))
+
+    def close(self):
+        super().close()
+
+        with self._lock:
+            if self._zip is None:  # The session closes the adapter once per mounted prefix
+                return
+
+            self._zip.writestr('index.json', json.dumps(self._index, indent=1))
+            self._zip.close()
+            self._zip = None
+            os.replace(self._tmp_file, self.file)
+
+        self.logger.info(f'Recorded {self._count} responses to archive: {self.file}')
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    Adapter serving the responses of an archive from memory, without network access.
+    A URL requested more often than it was recorded gets its last recorded response again.
+    """
+
+    def __init__(self, p_archive: TransportArchive, **kwargs):
+        """
+        :param p_archive: TransportArchive
+            Recorded responses, see TransportArchive.load.
+        :param kwargs:
+            Further keyword arguments of requests.adapters.HTTPAdapter
+        """
+        super().__init__(**kwargs)
+
+        self.archive = p_archive
+        self._lock = threading.Lock()
+        self._served = defaultdict(int)  # URL -> number of responses served
+
+    def send(self, request, **kwargs):
+        l_entries = self.archive.responses.get(request.url)
+
+        if not l_entries:
+            raise ReplayMissError(f'URL is not in the replay archive: {request.url}', request=request)
+
+        with self._lock:
+            l_index = min(self._served[request.url], len(l_entries) - 1)
+            self._served[request.url] += 1
+
+        return self.build_response(request, _raw_response(*l_entries[l_index]))
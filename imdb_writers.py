@@ -0,0 +1,236 @@
+import os
+import csv
+import glob
+import importlib.util
+from datetime import datetime
+import pandas as pd
+import logging
+import config as c
+
+# Partition directories of a dataset are named PARTITION_KEY=<run timestamp>, readable as a hive style dataset
+PARTITION_KEY = 'run_ts'
+PARTITION_FORMAT = '%Y%m%dT%H%M%S'
+
+
+def _write_csv(p_df: pd.DataFrame, p_file: str, p_sep: str = ';'):
+    p_df.to_csv(path_or_buf=p_file, sep=p_sep, index=False, header=True, quoting=csv.QUOTE_NONNUMERIC)
+
+
+def _read_csv(p_file: str) -> pd.DataFrame:
+    return pd.read_csv(p_file, sep=';', keep_default_na=False)
+
+
+def _write_parquet(p_df: pd.DataFrame, p_file: str):
+    p_df.to_parquet(p_file, index=False)
+
+
+def _write_feather(p_df: pd.DataFrame, p_file: str):
+    p_df.reset_index(drop=True).to_feather(p_file)  # Feather stores no index
+
+
+def _write_ndjson(p_df: pd.DataFrame, p_file: str):
+    p_df.to_json(p_file, orient='records', lines=True, force_ascii=False)
+
+
+def _read_ndjson(p_file: str) -> pd.DataFrame:
+    return pd.read_json(p_file, orient='records', lines=True, dtype=False)
+
+
+# Output format -> ( file extension, writer, reader, required optional module )
+WRITERS = {
+    'csv': ('csv', _write_csv, _read_csv, None),
+    'parquet': ('parquet', _write_parquet, pd.read_parquet, 'pyarrow'),
+    'feather': ('feather', _write_feather, pd.read_feather, 'pyarrow'),
+    'ndjson': ('ndjson', _write_ndjson, _read_ndjson, None),
+}
+
+
+def writer_available(p_format: str) -> bool:
+    """
+    :param p_format: str
+        Output format, key of WRITERS.
+    :return: bool
+        True if the optional module the format needs is installed
+    """
+    l_module = WRITERS[p_format][3]
+
+    return l_module is None or importlib.util.find_spec(l_module) is not None
+
+
+def file_extension(p_format: str) -> str:
+    """
+    :param p_format: str
+        Output format, key of WRITERS.
+    :return: str
+        File extension of the format, without dot
+    """
+    return WRITERS[p_format][0]
+
+
+def _check_format(p_format: str):
+    if p_format not in WRITERS:
+        raise ValueError(f'Unknown output format: "{p_format}", available: {list(WRITERS)}')
+
+    if not writer_available(p_format):
+        raise ImportError(f'Output format "{p_format}" needs the "{WRITERS[p_format][3]}" package')
+
+
+def write_dataframe(p_df: pd.DataFrame,
+                    p_file: str,
+                    p_format: str = c.output_format,
+                    p_overwrite: bool = False,
+                    p_log_level: str = 'INFO',
+                    **kwargs) -> str:
+    """
+    Writes a DataFrame atomically: the data goes to a temporary file in the target directory first,
+    which is then linked ( no overwrite ) or renamed ( overwrite ) to the target name.
+    Readers never see a half written file and two runs can not clobber each other's output.
+    :param p_df: pandas.DataFrame
+        Source data for the file.
+    :param p_file: str
+        Target file name / path.
+    :param p_format: str
+        Output format, key of WRITERS.
+    :param p_overwrite: bool
+        Replace an existing file instead of raising an error.
+    :param p_log_level: str
+        Log level to logging
+    :param kwargs:
+        Further keyword arguments of the format's writer ( e.g. p_sep of csv )
+    :return: str
+        Target file name / path
+    """
+
+    # Initiate logging for this function, pad function name to 30 characters
+    logger = logging.getLogger(__name__.ljust(30, ' '))
+    logger.setLevel(p_log_level)
+
+    _check_format(p_format)
+
+    logger.info(f'Started writing {p_format} file: {p_file}')
+
+    l_dir, l_name = os.path.split(os.path.abspath(p_file))
+    os.makedirs(l_dir, exist_ok=True)
+    l_tmp_file = os.path.join(l_dir, f'.{l_name}.{os.getpid()}.tmp')
+
+    try:
+        WRITERS[p_format][1](p_df, l_tmp_file, **kwargs)
+
+        if p_overwrite:
+            os.replace(l_tmp_file, p_file)
+        else:
+            try:
+                os.link(l_tmp_file, p_file)  # Fails if the target exists, no check-then-write race
+            except FileExistsError:
+                l_already_exists = f'File already exists: {p_file}'
+                logger.error(l_already_exists)
+                raise Exception(l_already_exists)  # Log error and raise exception - don't want to omit this error
+    finally:
+        if os.path.exists(l_tmp_file):
+            os.remove(l_tmp_file)
+
+    logger.info(f'Finished writing file: {p_file}')
+
+    return p_file
+
+
+def format_of_file(p_file: str) -> str:
+    """
+    :param p_file: str
+        File name / path with the extension of one of the WRITERS.
+    :return: str
+        Output format of the file
+    """
+    l_extension = os.path.splitext(p_file)[1].lstrip('.').lower()
+
+    for l_format, l_writer in WRITERS.items():
+        if l_writer[0] == l_extension:
+            return l_format
+
+    raise ValueError(f'Unknown file extension: "{l_extension}" of {p_file}, '
+                     f'available: {[x[0] for x in WRITERS.values()]}')
+
+
+def read_dataframe(p_file: str, p_format: str = None) -> pd.DataFrame:
+    """
+    Reads a file written by write_dataframe.
+    :param p_file: str
+        File name / path.
+    :param p_format: str
+        Format of the file, inferred from the file extension when not given.
+    :return: pandas.DataFrame
+        Content of the file
+    """
+    l_format = p_format if p_format is not None else format_of_file(p_file)
+
+    _check_format(l_format)
+
+    return WRITERS[l_format][2](p_file)
+
+
+def append_partition(p_df: pd.DataFrame,
+                     p_dataset_dir: str,
+                     p_run_time: datetime = None,
+                     p_format: str = c.output_format,
+                     p_part: str = '0',
+                     p_log_level: str = 'INFO') -> str:
+    """
+    Appends the data of a run to a dataset partitioned by run timestamp: <dataset>/run_ts=<timestamp>/part-<part>.<ext>
+    :param p_df: pandas.DataFrame
+        Data of the run.
+    :param p_dataset_dir: str
+        Root directory of the dataset, created when missing.
+    :param p_run_time: datetime
+        Timestamp of the run, datetime.now() when not given.
+    :param p_format: str
+        Output format, key of WRITERS.
+    :param p_part: str
+        Name of the part file, parts of one run written at the same time need different names.
+    :param p_log_level: str
+        Log level to logging
+    :return: str
+        File name / path of the new partition
+    """
+    l_run_time = datetime.now() if p_run_time is None else p_run_time
+
+    l_file = os.path.join(p_dataset_dir, f'{PARTITION_KEY}={l_run_time.strftime(PARTITION_FORMAT)}',
+                          f'part-{p_part}.{file_extension(p_format)}')
+
+    return write_dataframe(p_df=p_df, p_file=l_file, p_format=p_format, p_log_level=p_log_level)
+
+
+def read_dataset(p_dataset_dir: str,
+                 p_format: str = c.output_format,
+                 p_since: datetime = None,
+                 p_until: datetime = None) -> pd.DataFrame:
+    """
+    Reads the partitions of a dataset written by append_partition.
+    Partitions out of the time range are skipped by their directory name, without opening the files.
+    :param p_dataset_dir: str
+        Root directory of the dataset.
+    :param p_format: str
+        Output format of the partitions.
+    :param p_since: datetime
+        Earliest run to read, inclusive.
+    :param p_until: datetime
+        Latest run to read, inclusive.
+    :return: pandas.DataFrame
+        Data of the runs in run order, with a "run_ts" datetime column
+    """
+    _check_format(p_format)
+
+    l_frames = []
+    for l_file in sorted(glob.glob(os.path.join(p_dataset_dir, f'{PARTITION_KEY}=*', f'*.{file_extension(p_format)}'))):
+        l_run_time = datetime.strptime(os.path.basename(os.path.dirname(l_file)).split('=', 1)[1], PARTITION_FORMAT)
+
+        if (p_since is not None and l_run_time < p_since) or (p_until is not None and l_run_time > p_until):
+            continue
+
+        l_df = WRITERS[p_format][2](l_file)
+        l_df.insert(loc=0, column=PARTITION_KEY, value=pd.Timestamp(l_run_time))
+        l_frames.append(l_df)
+
+    if not l_frames:
+        return pd.DataFrame(columns=[PARTITION_KEY])
+
+    return pd.concat(l_frames, ignore_index=True)
@@ -3,7 +3,11 @@ from setuptools import setup
 setup(
     name='DP-imdb_top_250',
     version='0.7',
-    packages=[''],
+    py_modules=['config', 'imdb_awards', 'imdb_batch', 'imdb_cache', 'imdb_checkpoint', 'imdb_cli', 'imdb_fetcher',
+                'imdb_http_client', 'imdb_incremental', 'imdb_lists', 'imdb_logs', 'imdb_metrics', 'imdb_parser',
+                'imdb_pipeline', 'imdb_records', 'imdb_rules', 'imdb_scraper', 'imdb_service', 'imdb_store',
+                'imdb_top_250_adjustment', 'imdb_transport', 'imdb_writers'],
+    entry_points={'console_scripts': ['imdb-top-250=imdb_cli:main']},
     url='',
     license='',
     author='komlosi1lasb16',